@@ -1,39 +1,23 @@
 import yfinance as yf
 import pandas as pd
 import twstock
-import json
 import os
-import glob
-import math
 import time
 from datetime import datetime, timedelta
+from history_store import read_day, stored_dates
+from index_cache import get_index_series
+from json_output import write_json
+from main import rebuild_history_file
+from yf_limiter import yf_history
 
 DATA_DIR = "data"
 OUTPUT_FILE = "data.json"
 
-def clean_for_json(obj):
-    if isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj): return None
-        return obj
-    elif isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(v) for v in obj]
-    return obj
-
 def get_market_ret_at_date(target_date_str):
     try:
-        market = yf.Ticker("0050.TW")
         target_dt = datetime.strptime(target_date_str, "%Y-%m-%d")
-        end_dt = target_dt + timedelta(days=5)
-        start_dt = target_dt - timedelta(days=60)
-        df = market.history(start=start_dt, end=end_dt)
-        if target_date_str in df.index:
-            target_idx = df.index.get_loc(target_date_str)
-            if target_idx >= 20:
-                latest = df.iloc[target_idx]['Close']
-                past_20 = df.iloc[target_idx-20]['Close']
-                return (latest - past_20) / past_20
+        series = get_index_series("0050.TW", target_dt - timedelta(days=60), target_dt + timedelta(days=5))
+        return series.return_20d_at(target_date_str, exact=True)
     except: pass
     return None
 
@@ -109,17 +93,16 @@ def get_stock_name(ticker):
 
 def main():
     print("🐢 啟動 V5 回補 (移除舊葛蘭碧)...")
-    files = sorted(glob.glob(os.path.join(DATA_DIR, "*.json")))
-    target_files = [f for f in files if "2026-01-16" in f] 
-    if not target_files: return
+    target_dates = stored_dates(DATA_DIR, "2026-01-16", "2026-01-16")
+    if not target_dates: return
     stock_list = get_tw_stock_list()
     
-    for file_path in target_files:
-        target_date_str = os.path.basename(file_path).replace(".json", "")
+    for target_date_str in target_dates:
+        file_path = os.path.join(DATA_DIR, f"{target_date_str}.json")
         print(f"\n📅 修復: {target_date_str}")
         market_ret = get_market_ret_at_date(target_date_str)
         
-        with open(file_path, 'r', encoding='utf-8') as f: record = json.load(f)
+        record = read_day(target_date_str, DATA_DIR)
         
         # [重要] 清空舊的 granville 欄位 (如果有的話)，避免殘留
         if "strategies" in record:
@@ -131,7 +114,7 @@ def main():
             if i % 100 == 0: print(f"   {i}/{len(stock_list)}...")
             try:
                 stock = yf.Ticker(ticker)
-                df = stock.history(period="1y") 
+                df = yf_history(stock, period="1y")
                 if df.empty or len(df) < 205: continue
                 df = df[df.index.strftime('%Y-%m-%d') <= target_date_str]
                 if df.empty: continue
@@ -148,17 +131,12 @@ def main():
         
         new_list.sort(key=lambda x: -x.get('score_val', 0))
         if "strategies" not in record: record["strategies"] = {}
-        record["strategies"]["low_volatility"] = clean_for_json(new_list)
+        record["strategies"]["low_volatility"] = new_list
         
-        with open(file_path, 'w', encoding='utf-8') as f: json.dump(record, f, ensure_ascii=False, indent=2)
+        write_json(file_path, record)
         print(f"完成，找到 {len(new_list)} 檔。")
 
-    final_history = []
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f: final_history.append(json.load(f))
-        except: pass
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f: json.dump(clean_for_json(final_history), f, ensure_ascii=False, indent=2)
+    rebuild_history_file(DATA_DIR, OUTPUT_FILE)
     print("🎉 Done!")
 
 if __name__ == "__main__":
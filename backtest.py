@@ -0,0 +1,205 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from main import DATA_DIR, get_tw_ticker_candidates
+from history_store import iter_records
+from json_output import write_json
+from price_panel import adjusted_close, adjusted_low, load_panel, update_panel_store
+from regime import REGIME_FILE, load_timeline
+from signals import extract_signals
+
+
+HORIZONS = (1, 5, 20, 60)
+PRICE_STORE = os.path.join("cache", "prices.pkl.gz")
+SCORE_BUCKETS = 4
+
+
+def load_records(data_dir=DATA_DIR, start=None, end=None):
+    return list(iter_records(data_dir, start, end))
+
+
+def resolve_symbol(code, symbol=None):
+    if symbol:
+        return symbol
+    return get_tw_ticker_candidates(code)[0]
+
+
+def signal_frame(records, strategies=None):
+    rows = [signal for record in records for signal in extract_signals(record)]
+    frame = pd.DataFrame(rows, columns=["record_date", "date", "strategy", "code", "symbol", "name", "price", "score", "bucket", "metrics"])
+    if strategies:
+        frame = frame[frame["strategy"].isin(strategies)]
+    if frame.empty:
+        return frame
+    frame = frame.copy()
+    symbols = {(code, symbol) for code, symbol in zip(frame["code"], frame["symbol"])}
+    resolved = {key: resolve_symbol(*key) for key in symbols}
+    frame["symbol"] = [resolved[(code, symbol)] for code, symbol in zip(frame["code"], frame["symbol"])]
+    frame["score"] = pd.to_numeric(frame["score"], errors="coerce")
+    return assign_score_buckets(frame.reset_index(drop=True))
+
+
+def assign_score_buckets(frame):
+    missing = frame["bucket"].isna() & frame["score"].notna()
+    if missing.any():
+        pct = frame.loc[missing].groupby("strategy")["score"].rank(method="first", pct=True)
+        quantile = np.ceil(pct * SCORE_BUCKETS).clip(1, SCORE_BUCKETS).astype(int)
+        frame.loc[missing, "bucket"] = "score Q" + quantile.astype(str)
+    frame["bucket"] = frame["bucket"].fillna("all")
+    return frame
+
+
+def price_matrices(panel):
+    # 用還原權息的價格：除息缺口與分割不會被算成虧損或回撤。
+    close = pd.DataFrame({symbol: adjusted_close(df) for symbol, df in panel.items()}).sort_index()
+    low = pd.DataFrame({symbol: adjusted_low(df) for symbol, df in panel.items()}).reindex(index=close.index, columns=close.columns)
+    return close.astype(float), low.astype(float)
+
+
+def forward_matrices(close, low, horizon):
+    future_close = close.shift(-horizon)
+    returns = future_close / close - 1
+    future_low = low.iloc[::-1].rolling(horizon, min_periods=1).min().iloc[::-1].shift(-1)
+    adverse = (future_low / close - 1).clip(upper=0)
+    return returns, adverse.where(returns.notna())
+
+
+def join_forward_returns(signals, panel, horizons=HORIZONS):
+    joined = signals.copy()
+    if joined.empty or not panel:
+        for horizon in horizons:
+            joined[f"ret_{horizon}d"] = np.nan
+            joined[f"mae_{horizon}d"] = np.nan
+        joined["entry"] = np.nan
+        return joined
+
+    close, low = price_matrices(panel)
+    date_idx = close.index.get_indexer(pd.to_datetime(joined["date"]))
+    symbol_idx = close.columns.get_indexer(joined["symbol"])
+    valid = (date_idx >= 0) & (symbol_idx >= 0)
+
+    def take(matrix):
+        values = np.full(len(joined), np.nan)
+        values[valid] = matrix.to_numpy()[date_idx[valid], symbol_idx[valid]]
+        return values
+
+    joined["entry"] = take(close)
+    for horizon in horizons:
+        returns, adverse = forward_matrices(close, low, horizon)
+        joined[f"ret_{horizon}d"] = take(returns)
+        joined[f"mae_{horizon}d"] = take(adverse)
+    return joined
+
+
+def summarize(joined, horizons=HORIZONS, by=("strategy",)):
+    frames = []
+    keys = list(by)
+    for horizon in horizons:
+        ret = f"ret_{horizon}d"
+        mae = f"mae_{horizon}d"
+        rows = joined.loc[joined[ret].notna(), keys + [ret, mae]].copy()
+        if rows.empty:
+            continue
+        rows["hit"] = (rows[ret] > 0).astype(float)
+        summary = rows.groupby(keys).agg(
+            signals=(ret, "size"),
+            hit_rate=("hit", "mean"),
+            mean_return=(ret, "mean"),
+            median_return=(ret, "median"),
+            mean_mae=(mae, "mean"),
+            worst_mae=(mae, "min"),
+        ).reset_index()
+        summary.insert(len(keys), "horizon", horizon)
+        frames.append(summary)
+    if not frames:
+        return pd.DataFrame(columns=keys + ["horizon", "signals", "hit_rate", "mean_return", "median_return", "mean_mae", "worst_mae"])
+    return pd.concat(frames, ignore_index=True).sort_values(keys + ["horizon"]).reset_index(drop=True)
+
+
+def run_backtest(records, panel, horizons=HORIZONS, strategies=None):
+    signals = signal_frame(records, strategies)
+    joined = join_forward_returns(signals, panel, horizons)
+    return {
+        "signals": joined,
+        "by_strategy": summarize(joined, horizons),
+        "by_bucket": summarize(joined, horizons, by=("strategy", "bucket")),
+    }
+
+
+def attach_regime(joined, timeline):
+    joined = joined.copy()
+    if not timeline or joined.empty:
+        joined["regime"] = "Unknown"
+        return joined
+    states = dict(zip(timeline.get("dates", []), timeline.get("indexState", [])))
+    joined["regime"] = joined["date"].map(states).fillna("Unknown")
+    return joined
+
+
+def format_table(summary):
+    table = summary.copy()
+    for column in ("hit_rate", "mean_return", "median_return", "mean_mae", "worst_mae"):
+        table[column] = (table[column] * 100).map(lambda value: f"{value:.2f}%")
+    return table.to_string(index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以本地價格資料回測歷史訊號的 1/5/20/60 日後續報酬")
+    parser.add_argument("--start", help="訊號起始日期 YYYY-MM-DD（含）。")
+    parser.add_argument("--end", help="訊號結束日期 YYYY-MM-DD（含）。")
+    parser.add_argument("--strategy", nargs="+", help="只回測指定策略。")
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(HORIZONS), help="持有天數 (交易日)。")
+    parser.add_argument("--prices", default=PRICE_STORE, help="本地價格資料檔路徑。")
+    parser.add_argument("--fetch", action="store_true", help="先用 yfinance 增量更新本地價格資料。")
+    parser.add_argument("--regime", nargs="?", const=REGIME_FILE, help="依 regime.json 的大盤狀態分組統計。")
+    parser.add_argument("--output", help="將統計結果輸出為 JSON 檔。")
+    args = parser.parse_args()
+
+    records = load_records(start=args.start, end=args.end)
+    signals = signal_frame(records, args.strategy)
+    if signals.empty:
+        raise SystemExit("指定區間沒有任何訊號。")
+
+    if args.fetch:
+        start_dt = datetime.strptime(signals["date"].min(), "%Y-%m-%d") - timedelta(days=7)
+        panel = update_panel_store(args.prices, sorted(signals["symbol"].unique()), start_dt, datetime.now() + timedelta(days=1))
+    else:
+        panel = load_panel(args.prices)
+    if not panel:
+        raise SystemExit(f"找不到本地價格資料 {args.prices}，請加上 --fetch。")
+
+    joined = join_forward_returns(signals, panel, args.horizons)
+    by_strategy = summarize(joined, args.horizons)
+    by_bucket = summarize(joined, args.horizons, by=("strategy", "bucket"))
+    print(f"訊號數：{len(joined)}，可計算報酬：{int(joined['entry'].notna().sum())}")
+    print("\n=== 各策略 ===")
+    print(format_table(by_strategy))
+    print("\n=== 各分數/分組 ===")
+    print(format_table(by_bucket))
+    by_regime = None
+    if args.regime:
+        timeline = load_timeline(args.regime)
+        if timeline is None:
+            raise SystemExit(f"找不到大盤狀態檔 {args.regime}，請先執行 regime.py。")
+        by_regime = summarize(attach_regime(joined, timeline), args.horizons, by=("strategy", "regime"))
+        print("\n=== 各大盤狀態 ===")
+        print(format_table(by_regime))
+
+    if args.output:
+        # 期間超出資料尾端的報酬為 NaN，write_json 會輸出成 null。
+        write_json(args.output, {
+            "generatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "horizons": args.horizons,
+            "byStrategy": by_strategy.to_dict(orient="records"),
+            "byBucket": by_bucket.to_dict(orient="records"),
+            "byRegime": by_regime.to_dict(orient="records") if by_regime is not None else [],
+        }, indent=2, report=False)
+        print(f"已輸出：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from cb_valuation import cb_frame, cbas_rows, close_frame, quote_frame, valuation_table
+from druckenmiller import generate_druckenmiller_report
+from holy_grail import US_INDUSTRY_ETFS, build_us_industry_rows, classify_taiwan_industry, dataframe_to_bars, generate_holy_grail_report_from_bars, generate_taiwan_holy_grail_report
+from json_output import write_json
+from key_branches import aggregate_branch_rows, strategy_contexts
+from main import STOCK_STRATEGY_KEYS, empty_financial_details, fetch_active_etfs, parse_active_cbs, parse_cb_quote_rows, rebuild_history_file, revive_nuxt_payload, run_stock_strategies, sort_strategy_results, strategy_day_trading, strategy_doji_rise, strategy_macd_turn_red, strategy_momentum
+from market_provider import install_provider
+from synthetic_market import SyntheticMarket
+
+
+BENCH_SEED = 20260618
+BENCH_END_DATE = "2026-06-18"
+BASELINE_FILE = "bench_baseline.json"
+OUTPUT_FILE = "bench_output.txt"
+REGRESSION_THRESHOLD = 0.25
+MIN_SAMPLE_SECONDS = 0.05
+MAX_NUMBER = 10000
+
+# 完整規模與 --quick 規模；兩者的案例名稱不同，基準檔也會記錄是哪一種規模。
+SCALES = {
+    "full": {"symbols": 2200, "holy_grail": (200, 1000, 2000), "strategy_items": 5000, "branch_rows": 100_000, "nuxt_flows": 20_000, "history_days": 20, "history_items": 300},
+    "quick": {"symbols": 240, "holy_grail": (50, 200), "strategy_items": 500, "branch_rows": 10_000, "nuxt_flows": 2_000, "history_days": 8, "history_items": 60},
+}
+
+
+class Case:
+    def __init__(self, name, run, before=None, number=None):
+        self.name = name
+        self.run = run
+        # before 在每次取樣前執行且不計時 (例如清空輸出目錄)；有 before 的案例每次取樣只跑一次。
+        self.before = before
+        self.number = 1 if before else number
+
+
+def calibrate(run, min_seconds=MIN_SAMPLE_SECONDS):
+    # 與 timeit 相同：1、2、5、10… 逐步放大，直到一次取樣至少 min_seconds。
+    power = 1
+    while True:
+        for number in (power, power * 2, power * 5):
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            if time.perf_counter() - start >= min_seconds or number >= MAX_NUMBER:
+                return number
+        power *= 10
+
+
+def measure(case, repeat=5, min_seconds=MIN_SAMPLE_SECONDS):
+    if case.before:
+        case.before()
+    case.run()
+    number = case.number or calibrate(case.run, min_seconds)
+    samples = []
+    for _ in range(repeat):
+        if case.before:
+            case.before()
+        start = time.perf_counter()
+        for _ in range(number):
+            case.run()
+        samples.append((time.perf_counter() - start) / number)
+    return {"min": min(samples), "median": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # 以最小值比較：最小值最不受背景負載干擾，中位數只列出來參考。
+    rows = []
+    for name, result in results.items():
+        base = (baseline or {}).get(name)
+        change = None
+        status = "新案例"
+        if base and base.get("min"):
+            change = result["min"] / base["min"] - 1
+            status = "退步" if change > threshold else "進步" if change < -threshold else "持平"
+        rows.append({"name": name, "min": result["min"], "median": result["median"], "baseline": base["min"] if base else None, "change": change, "status": status})
+    return rows
+
+
+def regressions(rows):
+    return [row for row in rows if row["status"] == "退步"]
+
+
+def format_table(rows, threshold=REGRESSION_THRESHOLD):
+    width = max([len(row["name"]) for row in rows] + [4])
+    lines = [f"{'案例':<{width - 2}}  {'最小 ms':>10}  {'中位 ms':>10}  {'基準 ms':>10}  {'變化':>8}  狀態"]
+    for row in rows:
+        baseline = f"{row['baseline'] * 1000:10.2f}" if row["baseline"] else f"{'-':>10}"
+        change = f"{row['change'] * 100:+7.1f}%" if row["change"] is not None else f"{'-':>8}"
+        lines.append(f"{row['name']:<{width}}  {row['min'] * 1000:10.2f}  {row['median'] * 1000:10.2f}  {baseline}  {change}  {row['status']}")
+    lines.append(f"退步門檻：最小值比基準慢 {threshold:.0%} 以上")
+    return "\n".join(lines)
+
+
+def load_baseline(path, scale):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        payload = json.load(file)
+    if payload.get("scale") != scale or payload.get("seed") != BENCH_SEED:
+        print(f"基準檔 {path} 的規模或種子不同，略過比較。")
+        return None
+    return payload.get("cases") or {}
+
+
+def save_baseline(path, results, scale):
+    cases = {name: {"min": result["min"], "median": result["median"]} for name, result in results.items()}
+    write_json(path, {"scale": scale, "seed": BENCH_SEED, "createdAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "cases": cases}, indent=2, report=False)
+
+
+def tile_items(items, count):
+    # 把真實策略輸出複製到指定筆數，每一輪換一組不重複的代碼，模擬大量訊號的一天。
+    if not items:
+        return []
+    rows = []
+    for index in range(count):
+        item = dict(items[index % len(items)])
+        round_index = index // len(items)
+        if round_index:
+            code, _, suffix = str(item.get("code") or "").partition(".")
+            item["code"] = f"{code}{round_index:03d}" + (f".{suffix}" if suffix else "")
+        rows.append(item)
+    return rows
+
+
+def nuxt_payload(root):
+    # 與 ETFInfo 頁面相同的 devalue 格式：所有值攤平成陣列，以索引互相參照，外層包 ShallowReactive。
+    values = []
+
+    def add(value):
+        index = len(values)
+        values.append(None)
+        if isinstance(value, dict):
+            values[index] = {key: add(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            values[index] = [add(item) for item in value]
+        else:
+            values[index] = value
+        return index
+
+    values.append({"data": 1})
+    values.append(["ShallowReactive", 2])
+    add(root)
+    return values
+
+
+def branch_rows(count, seed=BENCH_SEED):
+    rng = np.random.default_rng([seed, 100])
+    branch_ids = rng.integers(0, max(count // 100, 1), count)
+    prices = np.round(rng.uniform(20, 800, count), 2)
+    buys = rng.integers(0, 300, count) * 1000
+    sells = rng.integers(0, 300, count) * 1000
+    return [
+        {"securities_trader_id": f"{branch:04d}", "securities_trader": f"合成證券{branch:04d}", "price": float(price), "buy": int(buy), "sell": int(sell)}
+        for branch, price, buy, sell in zip(branch_ids, prices, buys, sells)
+    ]
+
+
+class BenchData:
+    def __init__(self, scale="full", seed=BENCH_SEED):
+        self.scale = scale
+        self.sizes = SCALES[scale]
+        self.market = SyntheticMarket(seed=seed, symbols=self.sizes["symbols"], bars=600, end_date=BENCH_END_DATE)
+        self._frames = None
+        self._holy_stocks = None
+        self._strategies = None
+
+    def frames(self):
+        # 與 analyze_stock 相同：2 年日線、至少 205 根才進策略。
+        if self._frames is None:
+            frames = {}
+            for code, symbol in self.market.symbols.items():
+                df = self.market.history(symbol, period="2y")
+                if len(df) >= 205:
+                    frames[code] = df
+            self._frames = frames
+        return self._frames
+
+    def ticker_frame(self):
+        frames = self.frames()
+        return max(frames.items(), key=lambda item: (len(item[1]), item[1]["Volume"].iloc[-20:].mean()))
+
+    def holy_inputs(self):
+        if self._holy_stocks is None:
+            end = pd.Timestamp(BENCH_END_DATE)
+            start = end - timedelta(days=520)
+            window = {"start": start, "end": end + timedelta(days=7), "auto_adjust": False}
+            stocks = []
+            for code, symbol in self.market.symbols.items():
+                info = self.market.codes[code]
+                bars = dataframe_to_bars(self.market.history(symbol, **window))
+                if len(bars) < 120:
+                    continue
+                industry = classify_taiwan_industry(code, info.name, info.group)
+                stocks.append({"code": symbol, "name": info.name, "industry": industry, "baseIndustry": info.group, "bars": bars})
+            market_bars = dataframe_to_bars(self.market.history("^TWII", **window))
+            us_bars = {spec["symbol"]: dataframe_to_bars(self.market.history(spec["symbol"], **window)) for spec in US_INDUSTRY_ETFS}
+            spy_bars = dataframe_to_bars(self.market.history("SPY", **window))
+            self._holy_stocks = (market_bars, stocks, build_us_industry_rows(us_bars, spy_bars))
+        return self._holy_stocks
+
+    def holy_grail_data(self, count):
+        market_bars, stocks, us_industries = self.holy_inputs()
+        loaded = stocks[:count]
+        industries = {}
+        for stock in loaded:
+            industries.setdefault(stock["industry"], []).append(stock)
+        return {"marketBars": market_bars, "industries": industries, "stocks": loaded, "usIndustries": us_industries, "targetDate": BENCH_END_DATE}
+
+    def cbas_items(self):
+        cbs = parse_active_cbs(self.market.cb_rows())
+        quotes = {cb["cb_id"]: (parse_cb_quote_rows(self.market.cb_quote_table(cb["cb_id"])) or [None])[-1] for cb in cbs}
+        closes = self.market.last_closes()
+        table = valuation_table(cb_frame(cbs), quote_frame(quotes), close_frame(closes))
+        # 每檔發行公司都當成突破，讓 CBAS 清單有足夠的筆數。
+        breakouts = []
+        for stock_id in sorted({cb["stock_id"] for cb in cbs}):
+            close = self.market.full_history(self.market.symbols[stock_id])["Close"]
+            breakouts.append({"symbol": self.market.symbols[stock_id], "stock_id": stock_id, "price": round(float(close.iloc[-1]), 2), "pct_change": round(float(close.iloc[-1] / close.iloc[-2] * 100 - 100), 2), "vol_ratio": 2.5})
+        names = {row["symbol"]: self.market.codes[row["stock_id"]].name for row in breakouts}
+        return cbas_rows(table, pd.DataFrame(breakouts), names)
+
+    def strategies(self):
+        # 先用真實的策略函式在合成全市場上產生一天的結果，再放大成大量訊號的一天。
+        if self._strategies is None:
+            res = {key: [] for key in STOCK_STRATEGY_KEYS}
+            fin_data = empty_financial_details()
+            for code, df in self.frames().items():
+                latest = df.iloc[-1]
+                base = {"code": self.market.symbols[code], "name": self.market.codes[code].name, "region": "TW", "price": round(float(latest["Close"]), 2), "date": df.index[-1].strftime("%Y-%m-%d"), "fundamentals": fin_data}
+                for key, item in run_stock_strategies(df, base["code"], "TW", fin_data, base).items():
+                    res[key].append(item)
+            install_provider(self.market)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    res["active_etf"] = fetch_active_etfs()
+            finally:
+                install_provider(None)
+            res["cbas"] = self.cbas_items()
+            count = self.sizes["strategy_items"]
+            for key in list(res):
+                res[key] = tile_items(res[key], count)
+            sort_strategy_results(res)
+            market_bars, stocks, us_industries = self.holy_inputs()
+            holy = generate_holy_grail_report_from_bars(market_bars, stocks, us_industries, BENCH_END_DATE)
+            holy["candidates"] = {bucket: tile_items(rows, count) for bucket, rows in holy["candidates"].items()}
+            res["holy_grail"] = holy
+            self._strategies = res
+        return self._strategies
+
+    def nuxt_values(self):
+        summary = self.market.active_etf_summary()
+        summary = {**summary, "flowRankings": tile_items([{**flow, "code": flow["stockCode"]} for flow in summary["flowRankings"]], self.sizes["nuxt_flows"])}
+        return nuxt_payload({"active-summary-weekly-0": summary, "active-etf-list": summary["etfs"]})
+
+    def daily_record(self, date_text):
+        # 歷史檔案用一般交易日的訊號量，而不是放大後的策略字典，重建一次才不會跑上好幾分鐘。
+        count = self.sizes["history_items"]
+        strategies = {key: value[:count] for key, value in self.strategies().items() if isinstance(value, list)}
+        holy = self.strategies()["holy_grail"]
+        strategies["holy_grail"] = {**holy, "candidates": {bucket: rows[:count] for bucket, rows in holy["candidates"].items()}}
+        return {"date": date_text, "market_breadth": 12.5, "strategies": strategies, "run_metrics": {"scanned": len(self.frames())}}
+
+
+def strategy_case(key, df, ticker, fin_data):
+    latest = df.iloc[-1]
+    prev = df.iloc[-2]
+    if key == "momentum":
+        return lambda: strategy_momentum(df, ticker, "TW", latest, prev, fin_data)
+    if key == "day_trading":
+        return lambda: strategy_day_trading(df, ticker, "TW", latest)
+    if key == "doji_rise":
+        return lambda: strategy_doji_rise(df, ticker, "TW", latest)
+    return lambda: strategy_macd_turn_red(df)
+
+
+def universe_case(key, frames, fin_data):
+    runs = [strategy_case(key, df, code, fin_data) for code, df in frames.items()]
+
+    def run():
+        for item in runs:
+            item()
+    return run
+
+
+def history_cases(data, workdir):
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    record = data.daily_record(BENCH_END_DATE)
+    days = pd.bdate_range(end=BENCH_END_DATE, periods=data.sizes["history_days"])
+    for day in days:
+        write_json(os.path.join(data_dir, f"{day:%Y-%m-%d}.json"), {**record, "date": day.strftime("%Y-%m-%d")}, report=False)
+    out_dir = os.path.join(workdir, "out")
+
+    def paths():
+        return os.path.join(out_dir, "data.json"), os.path.join(out_dir, "history"), os.path.join(out_dir, "signals.db")
+
+    def clean():
+        shutil.rmtree(out_dir, ignore_errors=True)
+        shutil.rmtree(os.path.join(workdir, "cache"), ignore_errors=True)
+        os.makedirs(out_dir)
+
+    def rebuild():
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuild_history_file(data_dir, *paths())
+
+    day_file = os.path.join(workdir, "day.json")
+    large_record = {**record, "strategies": data.strategies()}
+    return [
+        Case(f"history/write_json_day/{data.sizes['strategy_items']}", lambda: write_json(day_file, large_record, report=False)),
+        Case(f"history/rebuild_cold/{len(days)}d", rebuild, before=clean),
+        Case(f"history/rebuild_noop/{len(days)}d", rebuild),
+    ]
+
+
+def build_cases(data, workdir):
+    cases = []
+    fin_data = empty_financial_details()
+    code, df = data.ticker_frame()
+    ticker = data.market.symbols[code]
+    frames = data.frames()
+    for key in STOCK_STRATEGY_KEYS:
+        cases.append(Case(f"strategy/{key}/ticker", strategy_case(key, df, ticker, fin_data)))
+    for key in STOCK_STRATEGY_KEYS:
+        cases.append(Case(f"strategy/{key}/universe/{len(frames)}", universe_case(key, frames, fin_data)))
+    for count in data.sizes["holy_grail"]:
+        holy = data.holy_grail_data(count)
+        cases.append(Case(f"holy_grail/{len(holy['stocks'])}", lambda holy=holy: generate_taiwan_holy_grail_report(holy)))
+    strategies = data.strategies()
+    count = data.sizes["strategy_items"]
+    cases.append(Case(f"druckenmiller/{count}", lambda: generate_druckenmiller_report(strategies, market_breadth=12.5, target_date=BENCH_END_DATE)))
+    cases.append(Case(f"strategy_contexts/{count}", lambda: strategy_contexts(strategies)))
+    rows = branch_rows(data.sizes["branch_rows"])
+    cases.append(Case(f"aggregate_branch_rows/{len(rows)}", lambda: aggregate_branch_rows(rows)))
+    values = data.nuxt_values()
+    cases.append(Case(f"revive_nuxt_payload/{len(values)}", lambda: revive_nuxt_payload(values)))
+    cases.extend(history_cases(data, workdir))
+    return cases
+
+
+def run_bench(scale="full", patterns=None, repeat=5, min_seconds=MIN_SAMPLE_SECONDS, progress=print):
+    started = time.perf_counter()
+    data = BenchData(scale)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="twstock-bench-") as workdir:
+        cases = build_cases(data, workdir)
+        progress(f"準備測試資料：{time.perf_counter() - started:.1f} 秒，{len(cases)} 個案例")
+        for case in cases:
+            if patterns and not any(pattern in case.name for pattern in patterns):
+                continue
+            results[case.name] = measure(case, repeat, min_seconds)
+            progress(f"  {case.name}: {results[case.name]['min'] * 1000:.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以固定種子的合成市場量測掃描各階段的效能，並與基準比較。")
+    parser.add_argument("--quick", action="store_true", help="使用縮小的資料規模，快速確認流程。")
+    parser.add_argument("--filter", nargs="+", help="只跑名稱包含任一字串的案例，例如 holy_grail strategy/macd。")
+    parser.add_argument("--repeat", type=int, default=5, help="每個案例的取樣次數。")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基準檔路徑。")
+    parser.add_argument("--save-baseline", action="store_true", help="把這次的結果存成新的基準。")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="最小值比基準慢多少比例算退步，預設 0.25。")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="結果表輸出路徑。")
+    args = parser.parse_args()
+
+    scale = "quick" if args.quick else "full"
+    results = run_bench(scale, args.filter, args.repeat)
+    rows = compare_results(results, load_baseline(args.baseline, scale), args.threshold)
+    table = format_table(rows, args.threshold)
+    print(table)
+    with open(args.output, "w", encoding="utf-8") as file:
+        file.write(table + "\n")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, scale)
+        print(f"已儲存基準：{args.baseline}")
+        return
+    slow = regressions(rows)
+    if slow:
+        print(f"{len(slow)} 個案例退步超過 {args.threshold:.0%}：{', '.join(row['name'] for row in slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
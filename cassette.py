@@ -0,0 +1,229 @@
+import atexit
+import base64
+import builtins
+import gzip
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from json_output import atomic_write
+
+
+# 第 2 版起改存 gzip JSON：重播外來的 cassette 只會還原資料，不會像 pickle 一樣執行任意程式碼。
+CASSETTE_VERSION = 2
+# 重播時只還原這些模組裡的例外類別，其餘一律轉成 RuntimeError。
+ERROR_MODULES = {"builtins", "requests.exceptions", "urllib3.exceptions", "yfinance.exceptions", "cassette"}
+
+
+class CassetteMiss(ConnectionError):
+    pass
+
+
+def cassette_key(kind, *parts):
+    # 日期時間只取到日；重播時 clock_now() 停在錄製當下，推算出的區間與錄製時相同。
+    normalized = tuple(
+        value.strftime("%Y-%m-%d") if isinstance(value, (datetime, date)) else value
+        for value in parts
+    )
+    return repr((kind, *normalized))
+
+
+def encode_axis(index):
+    if isinstance(index, pd.DatetimeIndex):
+        return {"name": index.name, "dates": [value.isoformat() for value in index.tz_localize(None)], "tz": str(index.tz) if index.tz else None}
+    return {"name": index.name, "values": index.tolist()}
+
+
+def decode_axis(axis):
+    if "dates" in axis:
+        index = pd.DatetimeIndex(pd.to_datetime(axis["dates"]), name=axis["name"])
+        return index.tz_localize(axis["tz"]) if axis["tz"] else index
+    return pd.Index(axis["values"], name=axis["name"])
+
+
+def encode_value(value):
+    if isinstance(value, requests.Response):
+        return {"type": "response", "url": value.url, "status": value.status_code, "headers": dict(value.headers), "body": base64.b64encode(value.content).decode("ascii")}
+    if isinstance(value, pd.DataFrame):
+        return {
+            "type": "frame", "index": encode_axis(value.index), "columns": encode_axis(value.columns),
+            "dtypes": [str(dtype) for dtype in value.dtypes], "data": value.astype(object).where(value.notna(), None).to_numpy().tolist(),
+        }
+    return {"type": "json", "value": value}
+
+
+def decode_value(entry):
+    if entry["type"] == "response":
+        response = requests.Response()
+        response.url = entry["url"]
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["body"])
+        return response
+    if entry["type"] == "frame":
+        frame = pd.DataFrame(entry["data"], index=decode_axis(entry["index"]), columns=decode_axis(entry["columns"]))
+        for position, dtype in enumerate(entry["dtypes"]):
+            if dtype != "object":
+                frame.isetitem(position, frame.iloc[:, position].astype(dtype))
+        return frame
+    return entry["value"]
+
+
+def encode_error(exc):
+    return {"module": type(exc).__module__, "name": type(exc).__qualname__, "message": str(exc)}
+
+
+def decode_error(error):
+    cls = None
+    if error["module"] in ERROR_MODULES:
+        module = builtins if error["module"] == "builtins" else importlib.import_module(error["module"])
+        cls = getattr(module, error["name"], None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        for args in ((error["message"],), ()):
+            try:
+                return cls(*args)
+            except TypeError:
+                continue
+    return RuntimeError(f"{error['name']}: {error['message']}")
+
+
+class Cassette:
+    def __init__(self, path, mode, latency=None, sleep=time.sleep):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的 cassette 模式: {mode}")
+        self.path = os.path.abspath(path)
+        self.mode = mode
+        # latency：None 不延遲、數字為固定秒數、"recorded" 依錄製時的耗時重現。
+        self.latency = latency
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.cursor = {}
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        self.recorded_at = time.time() if mode == "record" else None
+        if mode == "replay":
+            # 只接受 JSON；舊版 pickle cassette 或其他格式一律拒絕，不嘗試反序列化。
+            with open(path, "rb") as file:
+                try:
+                    payload = json.loads(gzip.decompress(file.read()))
+                except (OSError, ValueError) as exc:
+                    raise ValueError(f"無法讀取 cassette (需為 gzip JSON): {exc}") from exc
+            if not isinstance(payload, dict) or payload.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"不支援的 cassette 版本: {payload.get('version') if isinstance(payload, dict) else None}")
+            self.entries = payload["entries"]
+            self.recorded_at = payload.get("recordedAt")
+
+    def play(self, key, fetch):
+        if self.mode == "record":
+            return self.record(key, fetch)
+        return self.replay(key)
+
+    def record(self, key, fetch):
+        start = time.perf_counter()
+        try:
+            value = fetch()
+        except Exception as exc:
+            self.add(key, {"error": encode_error(exc), "elapsed": time.perf_counter() - start})
+            raise
+        self.add(key, {"value": encode_value(value), "elapsed": time.perf_counter() - start})
+        return value
+
+    def add(self, key, entry):
+        with self.lock:
+            self.entries.setdefault(key, []).append(entry)
+            self.stats["recorded"] += 1
+
+    def replay(self, key):
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"cassette 沒有這筆回應: {key}")
+            # 同一個 key 依錄製順序回放 (例如重試前的 503)，播完後一直重複最後一筆。
+            index = self.cursor.get(key, 0)
+            self.cursor[key] = index + 1
+            entry = entries[min(index, len(entries) - 1)]
+            self.stats["replayed"] += 1
+        delay = entry["elapsed"] if self.latency == "recorded" else self.latency
+        if delay:
+            self.sleep(delay)
+        if "error" in entry:
+            raise decode_error(entry["error"])
+        # 每次都重新還原物件，呼叫端修改回傳的 DataFrame 不會影響下一次重播。
+        return decode_value(entry["value"])
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with self.lock:
+            payload = {"version": CASSETTE_VERSION, "recordedAt": self.recorded_at, "entries": {key: list(entries) for key, entries in self.entries.items()}}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write(self.path, gzip.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), compresslevel=6))
+
+
+_cassette = None
+
+
+def install(cassette):
+    global _cassette
+    _cassette = cassette
+    return cassette
+
+
+def get_cassette():
+    return _cassette
+
+
+def play(key, fetch):
+    if _cassette is None:
+        return fetch()
+    return _cassette.play(key, fetch)
+
+
+def clock_time():
+    # 以「現在」推算交易日與抓取區間的地方都走這裡；重播時固定在錄製的時間，隔天重播 key 也對得上。
+    if _cassette is not None and _cassette.mode == "replay" and _cassette.recorded_at is not None:
+        return _cassette.recorded_at
+    return time.time()
+
+
+def clock_now(tz=None):
+    return datetime.fromtimestamp(clock_time(), tz)
+
+
+def parse_latency(text):
+    if text in (None, ""):
+        return None
+    if text == "recorded":
+        return text
+    return float(text) / 1000
+
+
+def start_cassette(record=None, replay=None, latency=None):
+    # record 模式在程式結束時 (含例外中止) 寫出 cassette。
+    if record:
+        cassette = install(Cassette(record, "record"))
+        atexit.register(cassette.save)
+        print(f"錄製外部回應到 {record}")
+        return cassette
+    if replay:
+        cassette = install(Cassette(replay, "replay", latency=parse_latency(latency)))
+        recorded = f"，時間固定在錄製當下 {clock_now():%Y-%m-%d %H:%M}" if cassette.recorded_at is not None else ""
+        print(f"從 {replay} 重播外部回應 ({len(cassette.entries)} 個請求{recorded})")
+        return cassette
+    return None
+
+
+def format_cassette_stats(cassette=None):
+    cassette = cassette or _cassette
+    if cassette is None:
+        return None
+    stats = cassette.stats
+    return f"Cassette {cassette.mode}：錄製 {stats['recorded']}，重播 {stats['replayed']}，缺少 {stats['misses']}"
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+VALUATION_COLUMNS = [
+    "rank", "cb_id", "cb_name", "stock_id", "close", "conversion_price", "cb_price",
+    "conversion_value", "premium_pct", "double_low", "cb_trade_date", "cb_units", "cb_trade_value",
+]
+CB_DETAIL_FIELDS = ("maturity_date", "put_option_date", "put_option_price", "guaranteed")
+
+
+def cb_frame(cb_list):
+    frame = pd.DataFrame(cb_list).reindex(columns=["cb_id", "stock_id", "cb_name", "conversion_price", *CB_DETAIL_FIELDS])
+    return frame.drop_duplicates("cb_id", keep="last").reset_index(drop=True)
+
+
+def quote_frame(latest_quotes):
+    rows = [
+        (cb_id, quote.get("cb_price"), quote.get("trade_date"), quote.get("cb_units"), quote.get("cb_trade_value"))
+        for cb_id, quote in latest_quotes.items() if quote
+    ]
+    return pd.DataFrame(rows, columns=["cb_id", "cb_price", "cb_trade_date", "cb_units", "cb_trade_value"])
+
+
+def close_frame(closes):
+    return pd.DataFrame({"stock_id": list(closes), "close": pd.to_numeric(pd.Series(list(closes.values()), dtype=object), errors="coerce")})
+
+
+def add_valuation(frame, close_column):
+    conversion_price = pd.to_numeric(frame["conversion_price"], errors="coerce")
+    cb_price = pd.to_numeric(frame["cb_price"], errors="coerce")
+    parity = frame[close_column] / conversion_price.where(conversion_price > 0) * 100
+    parity = parity.where(parity > 0)
+    premium = (cb_price - parity) / parity * 100
+    return frame.assign(
+        conversion_price=conversion_price,
+        cb_price=cb_price,
+        conversion_value=parity.round(2),
+        premium_pct=premium.round(2),
+        double_low=(cb_price + premium).round(2),
+    )
+
+
+def valuation_table(cbs, quotes, closes):
+    table = add_valuation(cbs.merge(quotes, on="cb_id", how="left").merge(closes, on="stock_id", how="left"), "close")
+    table = table.sort_values(["double_low", "cb_id"], na_position="last", kind="mergesort").reset_index(drop=True)
+    table["rank"] = pd.Series(np.arange(1, len(table) + 1), dtype="Int64").where(table["double_low"].notna())
+    return table
+
+
+def breakout_table(panel, min_length=31):
+    # 與 cbas_breakout_signal 相同：收盤突破布林上軌，且成交量大於 5 日均量兩倍。
+    # 只需要每檔最後一天，把各檔最後 20 根 K 棒疊成矩陣一次算完。
+    columns = ["symbol", "stock_id", "price", "pct_change", "vol_ratio"]
+    symbols = [symbol for symbol, df in panel.items() if df is not None and len(df) >= min_length]
+    if not symbols:
+        return pd.DataFrame(columns=columns)
+    closes = np.vstack([panel[symbol]["Close"].to_numpy(dtype=float)[-20:] for symbol in symbols])
+    volumes = np.vstack([panel[symbol]["Volume"].to_numpy(dtype=float)[-5:] for symbol in symbols])
+    upper = closes.mean(axis=1) + 2 * closes.std(axis=1, ddof=1)
+    vol_ma5 = volumes.mean(axis=1)
+    close = closes[:, -1]
+    prev_close = closes[:, -2]
+    hits = (close > upper) & (volumes[:, -1] > vol_ma5 * 2.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_ratio = np.where(vol_ma5 > 0, volumes[:, -1] / vol_ma5, 0.0)
+    symbols = pd.Index(symbols)[hits]
+    return pd.DataFrame({
+        "symbol": symbols,
+        "stock_id": symbols.str.split(".").str[0],
+        "price": close[hits].round(2),
+        "pct_change": ((close[hits] - prev_close[hits]) / prev_close[hits] * 100).round(2),
+        "vol_ratio": vol_ratio[hits].round(1),
+    }, columns=columns)
+
+
+def cbas_rows(table, breakouts, names):
+    # 突破條件以 join 套用在整體估值表上；估值改用突破當天的收盤價，與逐檔計算的結果一致。
+    joined = add_valuation(table.drop(columns=["close"]).merge(breakouts, on="stock_id", how="inner"), "price")
+    joined = joined[joined["double_low"].notna()].sort_values(["double_low", "cb_id"], kind="mergesort")
+    rows = []
+    for row in joined.to_dict("records"):
+        rows.append({
+            "code": row["symbol"], "name": names.get(row["symbol"]) or row["symbol"], "price": row["price"], "pct_change": row["pct_change"],
+            "cb_code": row["cb_id"], "cb_name": row["cb_name"], "cb_price": row["cb_price"],
+            "conversion_price": row["conversion_price"], "conversion_value": row["conversion_value"],
+            "premium_pct": row["premium_pct"], "double_low": row["double_low"],
+            "cb_trade_date": row["cb_trade_date"], "cb_units": row["cb_units"], "cb_trade_value": row["cb_trade_value"],
+            **{field: row.get(field) for field in CB_DETAIL_FIELDS},
+            "desc": f"CB:{row['cb_name']} | 雙低:{row['double_low']}",
+        })
+    return rows
+
+
+def valuation_records(table):
+    return table[[column for column in VALUATION_COLUMNS if column in table.columns]].replace({np.nan: None}).to_dict("records")
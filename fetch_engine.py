@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# 全域與各資料來源的並行上限；各階段共用同一組名額，對每個來源的總負載才可預期。
+GLOBAL_LIMIT = 48
+HOST_LIMITS = {"yahoo": 32, "tpex": 8, "finmind": 8}
+DEFAULT_HOST_LIMIT = 8
+
+
+class FetchTimeout(TimeoutError):
+    pass
+
+
+class FetchEngine:
+    def __init__(self, global_limit=GLOBAL_LIMIT, host_limits=None, default_host_limit=DEFAULT_HOST_LIMIT):
+        self.global_limit = global_limit
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.default_host_limit = default_host_limit
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.executor = None
+        self.global_semaphore = None
+        self.host_semaphores = {}
+        self.in_flight = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "timedOut": 0, "peakInFlight": 0}
+
+    def start(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                # 等待中的請求只是事件迴圈上的 coroutine，不佔執行緒；真正發出的請求數由信號量限制。
+                self.executor = ThreadPoolExecutor(max_workers=self.global_limit, thread_name_prefix="fetch")
+                self.thread = threading.Thread(target=self.loop.run_forever, name="fetch-engine", daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def close(self):
+        with self.lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.loop = self.thread = self.executor = self.global_semaphore = None
+            self.host_semaphores = {}
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def semaphores(self, host):
+        # 只在事件迴圈執行緒上呼叫，不需要另外加鎖。
+        if self.global_semaphore is None:
+            self.global_semaphore = asyncio.Semaphore(self.global_limit)
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.default_host_limit))
+        return self.global_semaphore, self.host_semaphores[host]
+
+    async def acquire(self, semaphore, host, deadline):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), remaining)
+        except asyncio.TimeoutError:
+            raise FetchTimeout(f"{host} 等待名額超過期限") from None
+
+    async def run(self, host, func, args, deadline):
+        global_semaphore, host_semaphore = self.semaphores(host)
+        await self.acquire(host_semaphore, host, deadline)
+        try:
+            await self.acquire(global_semaphore, host, deadline)
+        except BaseException:
+            host_semaphore.release()
+            raise
+
+        def release(future):
+            if not future.cancelled():
+                future.exception()
+            global_semaphore.release()
+            host_semaphore.release()
+            self.in_flight -= 1
+
+        self.in_flight += 1
+        with self.lock:
+            self.stats["peakInFlight"] = max(self.stats["peakInFlight"], self.in_flight)
+        future = self.loop.run_in_executor(self.executor, func, *args)
+        # 逾時或取消只是放棄等待；執行緒裡的請求仍佔著名額直到真的結束，對外負載不會超過上限。
+        future.add_done_callback(release)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        done, _ = await asyncio.wait({future}, timeout=remaining)
+        if not done:
+            raise FetchTimeout(f"{host} 請求超過期限")
+        return future.result()
+
+    def record_outcome(self, future):
+        if future.cancelled():
+            self.count("cancelled")
+        elif isinstance(future.exception(), FetchTimeout):
+            self.count("timedOut")
+        elif future.exception() is not None:
+            self.count("failed")
+        else:
+            self.count("completed")
+
+    def submit(self, host, func, *args, deadline=None):
+        # deadline 為 time.monotonic() 的絕對時間；工作內不可再同步等待本引擎的其他工作，避免名額互等。
+        loop = self.start()
+        self.count("submitted")
+        future = asyncio.run_coroutine_threadsafe(self.run(host, func, args, deadline), loop)
+        future.add_done_callback(self.record_outcome)
+        return future
+
+    def map(self, host, func, items, timeout=None):
+        # 同步介面：依完成順序回傳 (item, future)，呼叫端照舊用 future.result() 取結果或例外。
+        # 呼叫端中途離開迴圈 (例外或 break) 時，尚未開始的請求一併取消。
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = {self.submit(host, func, item, deadline=deadline): item for item in items}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+_engine = FetchEngine()
+
+
+def get_engine():
+    return _engine
+
+
+def fetch_map(host, func, items, timeout=None):
+    return _engine.map(host, func, items, timeout=timeout)
+
+
+def format_engine_stats(stats=None):
+    stats = stats or _engine.stats
+    return (
+        f"抓取引擎 {stats['submitted']} 件 (完成 {stats['completed']}，失敗 {stats['failed']}，"
+        f"逾時 {stats['timedOut']}，取消 {stats['cancelled']})，最高同時 {stats['peakInFlight']}"
+    )
@@ -0,0 +1,407 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from json_output import INDENT, atomic_write, encode_json, write_compressed, write_json
+
+
+DATA_DIR = "data"
+DATA_FILE = "data.json"
+SHARD_DIR = "history"
+ARCHIVE_DIR = "archive"
+MANIFEST_VERSION = 2
+FINGERPRINT_FILE = os.path.join("cache", "history_fingerprints.json")
+
+HEADER = b"[\n"
+SEPARATOR = b",\n"
+FOOTER = b"\n]\n"
+LINE_DATE = re.compile(rb'^\{"date":"(\d{4}-\d{2}-\d{2})"')
+
+_bundles = {}
+
+
+@dataclass
+class DaySource:
+    date: str
+    path: str
+    line: int = None
+    size: int = 0
+    mtime: int = 0
+
+    def read_bytes(self):
+        if self.line is None:
+            with open(self.path, "rb") as file:
+                return file.read()
+        return read_bundle(self.path)[self.line][1]
+
+    def read_record(self):
+        return json.loads(self.read_bytes(), parse_constant=lambda _: None)
+
+    def digest(self):
+        return hashlib.sha1(self.read_bytes()).hexdigest()
+
+
+def is_weekday(date_text):
+    try:
+        return datetime.strptime(date_text, "%Y-%m-%d").weekday() < 5
+    except ValueError:
+        return False
+
+
+def day_files(data_dir=DATA_DIR):
+    entries = {}
+    if not os.path.isdir(data_dir):
+        return entries
+    for entry in os.scandir(data_dir):
+        if not entry.is_file() or not entry.name.endswith(".json"):
+            continue
+        date_text = entry.name[:-5]
+        if is_weekday(date_text):
+            entries[date_text] = entry
+    return dict(sorted(entries.items()))
+
+
+def bundle_paths(data_dir=DATA_DIR):
+    return sorted(glob.glob(os.path.join(data_dir, ARCHIVE_DIR, "*.jsonl.gz")))
+
+
+def line_date(line):
+    match = LINE_DATE.match(line)
+    if match:
+        return match.group(1).decode("ascii")
+    return json.loads(line, parse_constant=lambda _: None).get("date")
+
+
+def read_bundle(path):
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _bundles.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with gzip.open(path, "rb") as file:
+        lines = [line.rstrip(b"\n") for line in file if line.strip()]
+    rows = [(line_date(line), line) for line in lines]
+    _bundles[path] = (key, rows)
+    return rows
+
+
+def day_sources(data_dir=DATA_DIR):
+    # 月份壓縮檔與單日檔可以並存；同一天兩邊都有時以單日檔為準。
+    sources = {}
+    for path in bundle_paths(data_dir):
+        stat = os.stat(path)
+        for line, (date_text, _) in enumerate(read_bundle(path)):
+            if date_text and is_weekday(date_text):
+                sources[date_text] = DaySource(date_text, path, line, stat.st_size, stat.st_mtime_ns)
+    for date_text, entry in day_files(data_dir).items():
+        stat = entry.stat()
+        sources[date_text] = DaySource(date_text, entry.path, None, stat.st_size, stat.st_mtime_ns)
+    return dict(sorted(sources.items()))
+
+
+def stored_dates(data_dir=DATA_DIR, start=None, end=None):
+    return [date_text for date_text in day_sources(data_dir) if (not start or date_text >= start) and (not end or date_text <= end)]
+
+
+def latest_date(data_dir=DATA_DIR):
+    dates = stored_dates(data_dir)
+    return dates[-1] if dates else None
+
+
+def read_day(date_text, data_dir=DATA_DIR, default=None):
+    loose = os.path.join(data_dir, f"{date_text}.json")
+    if os.path.exists(loose):
+        return read_record(loose)
+    source = day_sources(data_dir).get(date_text)
+    return source.read_record() if source else default
+
+
+def iter_records(data_dir=DATA_DIR, start=None, end=None):
+    for date_text, source in day_sources(data_dir).items():
+        if (start and date_text < start) or (end and date_text > end):
+            continue
+        try:
+            yield source.read_record()
+        except ValueError:
+            continue
+
+
+def read_record(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file, parse_constant=lambda _: None)
+
+
+def serialize_record(record):
+    return encode_json(record)
+
+
+def file_digest(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def manifest_path(data_file=DATA_FILE):
+    return os.path.splitext(data_file)[0] + ".manifest.json"
+
+
+def load_manifest(manifest_file, data_file=DATA_FILE):
+    if not os.path.exists(manifest_file) or not os.path.exists(data_file):
+        return {}
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("indent") != INDENT:
+        return {}
+    if manifest.get("size") != os.path.getsize(data_file):
+        return {}
+    return manifest.get("days") or {}
+
+
+def save_manifest(days, size, manifest_file):
+    write_json(manifest_file, {"version": MANIFEST_VERSION, "indent": INDENT, "size": size, "days": days}, indent=False, compress=(), report=False)
+
+
+def fingerprint_path(data_dir=DATA_DIR):
+    # size/mtime 只在本機有意義，放在不提交的 cache/；提交的 manifest 只記內容雜湊。
+    return os.path.join(os.path.dirname(os.path.abspath(data_dir)), FINGERPRINT_FILE)
+
+
+def source_key(data_dir, source):
+    return f"{os.path.relpath(source.path, data_dir)}:{'' if source.line is None else source.line}"
+
+
+def load_fingerprints(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            fingerprints = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return fingerprints if isinstance(fingerprints, dict) else {}
+
+
+def scan_changes(data_dir, old_days):
+    path = fingerprint_path(data_dir)
+    old_prints = load_fingerprints(path)
+    prints = {}
+    entries = []
+    for date_text, source in day_sources(data_dir).items():
+        key = source_key(data_dir, source)
+        cached = old_prints.get(key)
+        if cached and cached[:2] == [source.size, source.mtime]:
+            digest = cached[2]
+        else:
+            digest = source.digest()
+        prints[key] = [source.size, source.mtime, digest]
+        old = old_days.get(date_text)
+        info = {"hash": digest, "line": source.line}
+        if old and old["hash"] == digest:
+            entries.append((date_text, {**old, **info}, None))
+            continue
+        try:
+            record = source.read_record()
+        except (OSError, ValueError):
+            continue
+        entries.append((date_text, info, record))
+    if prints != old_prints:
+        write_json(path, prints, indent=False, compress=(), report=False)
+    return entries
+
+
+def first_dirty_position(entries):
+    expected = len(HEADER)
+    for position, (_, info, payload) in enumerate(entries):
+        if position:
+            expected += len(SEPARATOR)
+        if payload is not None or info["offset"] != expected:
+            return position, expected - (len(SEPARATOR) if position else 0)
+        expected += info["length"]
+    return len(entries), expected
+
+
+def publish_history(data_dir=DATA_DIR, data_file=DATA_FILE):
+    manifest_file = manifest_path(data_file)
+    old_days = load_manifest(manifest_file, data_file)
+    started = time.perf_counter()
+    entries = [
+        (date_text, info, None if record is None else serialize_record(record))
+        for date_text, info, record in scan_changes(data_dir, old_days)
+    ]
+    encode_ms = (time.perf_counter() - started) * 1000
+    dirty, cut = first_dirty_position(entries) if old_days else (0, len(HEADER))
+    old_size = os.path.getsize(data_file) if old_days else 0
+    stats = {"days": len(entries), "changed": sum(payload is not None for _, _, payload in entries), "reencodedBytes": 0, "writtenBytes": 0, "encodeMs": encode_ms, "full": not old_days}
+
+    days = {}
+    for date_text, info, _ in entries[:dirty]:
+        days[date_text] = info
+    if dirty == len(entries) and cut + len(FOOTER) == old_size:
+        save_manifest(days, old_size, manifest_file)
+        return stats
+
+    head = b""
+    tail = b""
+    if old_days:
+        with open(data_file, "rb") as file:
+            head = file.read(cut)
+            tail = file.read()
+    # 未變動的前段原封不動沿用，只重新編碼後段；整份檔案仍以暫存檔 + rename 原子替換。
+    chunks = [head] if old_days else [HEADER]
+    position = cut
+    for index in range(dirty, len(entries)):
+        date_text, info, payload = entries[index]
+        if payload is None:
+            start = info["offset"] - cut
+            payload = tail[start:start + info["length"]]
+        if index:
+            chunks.append(SEPARATOR)
+            position += len(SEPARATOR)
+        days[date_text] = {**info, "offset": position, "length": len(payload)}
+        chunks.append(payload)
+        position += len(payload)
+    chunks.append(FOOTER)
+    payload = b"".join(chunks)
+    atomic_write(data_file, payload)
+    # 前段只省下重新編碼；整份檔案與壓縮檔仍會完整寫出，writtenBytes 記錄實際寫入量。
+    stats["reencodedBytes"] = len(payload) - len(head)
+    save_manifest(days, len(payload), manifest_file)
+    stats["compressed"] = write_compressed(data_file, payload)
+    stats["writtenBytes"] = len(payload) + sum(stats["compressed"].values())
+    return stats
+
+
+def strategy_count(value):
+    if isinstance(value, list):
+        return len(value)
+    if not isinstance(value, dict):
+        return 0
+    if isinstance(value.get("candidates"), dict):
+        return sum(len(rows) for rows in value["candidates"].values() if isinstance(rows, list))
+    for key in ("candidates", "items"):
+        if isinstance(value.get(key), list):
+            return len(value[key])
+    return 0
+
+
+def day_summary(record):
+    strategies = record.get("strategies") or {}
+    return {
+        "market_breadth": record.get("market_breadth"),
+        "counts": {key: strategy_count(value) for key, value in strategies.items()},
+        "sections": sorted(strategies),
+    }
+
+
+def shard_path(shard_dir, date_text, section):
+    return os.path.join(shard_dir, date_text, f"{section}.json")
+
+
+def load_shard_manifest(shard_dir=SHARD_DIR):
+    path = os.path.join(shard_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return {day["date"]: day for day in manifest.get("days") or []}
+
+
+def write_day_shards(shard_dir, date_text, record):
+    day_dir = os.path.join(shard_dir, date_text)
+    if os.path.isdir(day_dir):
+        shutil.rmtree(day_dir)
+    os.makedirs(day_dir)
+    return [
+        write_json(shard_path(shard_dir, date_text, section), value, report=False)
+        for section, value in (record.get("strategies") or {}).items()
+    ]
+
+
+def publish_shards(data_dir=DATA_DIR, shard_dir=SHARD_DIR):
+    old_days = load_shard_manifest(shard_dir)
+    days = []
+    written = []
+    changed = 0
+    for date_text, info, record in scan_changes(data_dir, old_days):
+        if record is None:
+            days.append(info)
+            continue
+        written.extend(write_day_shards(shard_dir, date_text, record))
+        days.append({"date": date_text, **day_summary(record), **info})
+        changed += 1
+
+    removed = set(old_days) - {day["date"] for day in days}
+    for date_text in removed:
+        shutil.rmtree(os.path.join(shard_dir, date_text), ignore_errors=True)
+
+    written.append(write_json(os.path.join(shard_dir, "manifest.json"), {"version": MANIFEST_VERSION, "days": days}, report=False))
+    return {
+        "days": len(days),
+        "changed": changed,
+        "removed": len(removed),
+        "bytes": sum(stats["bytes"] for stats in written),
+        "encodeMs": sum(stats["encodeMs"] for stats in written),
+    }
+
+
+def month_of(date_text):
+    return date_text[:7]
+
+
+def write_bundle(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as file:
+            for record in records:
+                file.write(encode_json({"date": record.get("date"), **record}, indent=False))
+                file.write(b"\n")
+    os.replace(temp_path, path)
+
+
+def compact_archive(data_dir=DATA_DIR, before_month=None):
+    before_month = before_month or datetime.now().strftime("%Y-%m")
+    loose = day_files(data_dir)
+    months = sorted({month_of(date_text) for date_text in loose if month_of(date_text) < before_month})
+    stats = {"months": months, "days": 0, "looseBytes": 0, "bundleBytes": 0}
+    for month in months:
+        path = os.path.join(data_dir, ARCHIVE_DIR, f"{month}.jsonl.gz")
+        records = {}
+        if os.path.exists(path):
+            for date_text, line in read_bundle(path):
+                records[date_text] = json.loads(line, parse_constant=lambda _: None)
+        month_files = {date_text: entry for date_text, entry in loose.items() if month_of(date_text) == month}
+        for date_text, entry in month_files.items():
+            records[date_text] = {**read_record(entry.path), "date": date_text}
+            stats["looseBytes"] += entry.stat().st_size
+        write_bundle(path, [records[date_text] for date_text in sorted(records)])
+        for entry in month_files.values():
+            os.remove(entry.path)
+        stats["days"] += len(month_files)
+        stats["bundleBytes"] += os.path.getsize(path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把已結束月份的每日存檔壓縮成月份檔 (JSON Lines + gzip)")
+    parser.add_argument("--before", help="只壓縮早於此月份的資料，格式 YYYY-MM；預設為本月。")
+    args = parser.parse_args()
+    stats = compact_archive(before_month=args.before)
+    print(f"壓縮完成：{len(stats['months'])} 個月、{stats['days']} 天，{stats['looseBytes'] / 1024:.0f} KB → {stats['bundleBytes'] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
 import math
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 import pandas as pd
-import twstock
 import yfinance as yf
 
+from fetch_engine import fetch_map
+from index_cache import market_bars_as_of
+from market_provider import code_tables
+from yf_limiter import yf_history
+
 
 @dataclass
 class RiskConfig:
@@ -304,7 +307,7 @@ def moving_average_map(bars):
     }
 
 
-def detect_breakout(stock_bars):
+def detect_breakout(stock_bars, volume_factor=1.5, max_change=0.07):
     if len(stock_bars) < 21:
         return False
     ma = moving_average_map(stock_bars)
@@ -312,7 +315,7 @@ def detect_breakout(stock_bars):
     volume = safe_float(stock_bars[-1].get("volume"), 0)
     high20 = max(bar["high"] for bar in stock_bars[-21:-1] if bar.get("high") is not None)
     change = latest_change(stock_bars) or 0
-    return close > high20 and ma["volumeMA20"] and volume > ma["volumeMA20"] * 1.5 and change < 0.07
+    return close > high20 and ma["volumeMA20"] and volume > ma["volumeMA20"] * volume_factor and change < max_change
 
 
 def detect_pullback_rebound(stock_bars):
@@ -676,30 +679,34 @@ def generate_taiwan_holy_grail_report(data, config=None):
 
 def fetch_history(symbol, start_dt, end_dt):
     try:
-        df = yf.Ticker(symbol).history(start=start_dt, end=end_dt, auto_adjust=False)
+        df = yf_history(yf.Ticker(symbol), start=start_dt, end=end_dt, auto_adjust=False)
         return dataframe_to_bars(df)
     except Exception:
         return []
 
 
-def fetch_us_industries(start_dt, end_dt, target_date):
-    market_bars = fetch_history("SPY", start_dt, end_dt)
-    if not market_bars:
-        market_bars = fetch_history("^GSPC", start_dt, end_dt)
-    market_bars = [bar for bar in market_bars if bar["date"] <= target_date]
+def build_us_industry_rows(bars_by_symbol, market_bars):
     rows = []
     for spec in US_INDUSTRY_ETFS:
-        bars = fetch_history(spec["symbol"], start_dt, end_dt)
-        bars = [bar for bar in bars if bar["date"] <= target_date]
+        bars = bars_by_symbol.get(spec["symbol"]) or []
         if len(bars) < 60:
             continue
         rows.append({**spec, "bars": bars})
     return rank_us_industries(rows, market_bars)
 
 
+def fetch_us_industries(start_dt, end_dt, target_date):
+    market_bars = market_bars_as_of(("SPY", "^GSPC"), start_dt, end_dt, target_date)
+    bars_by_symbol = {}
+    for spec in US_INDUSTRY_ETFS:
+        bars = fetch_history(spec["symbol"], start_dt, end_dt)
+        bars_by_symbol[spec["symbol"]] = [bar for bar in bars if bar["date"] <= target_date]
+    return build_us_industry_rows(bars_by_symbol, market_bars)
+
+
 def get_taiwan_stock_universe(max_per_industry=8):
     groups = {}
-    for code, info in twstock.codes.items():
+    for code, info in code_tables().codes.items():
         if not (len(code) == 4 and code.isdigit()):
             continue
         if info.type != "股票" or not info.group:
@@ -720,18 +727,14 @@ def get_taiwan_stock_universe(max_per_industry=8):
     return stocks
 
 
-def generate_holy_grail_report_from_yfinance(target_date=None, max_per_industry=8, max_workers=24):
+def generate_holy_grail_report_from_yfinance(target_date=None, max_per_industry=8):
     target_dt = datetime.strptime(target_date, "%Y-%m-%d") if target_date else datetime.now()
     start_dt = target_dt - timedelta(days=520)
     end_dt = target_dt + timedelta(days=7)
-    market_bars = fetch_history("^TWII", start_dt, end_dt)
-    if not market_bars:
-        market_bars = fetch_history("0050.TW", start_dt, end_dt)
     target_date_text = target_dt.strftime("%Y-%m-%d")
-    market_bars = [bar for bar in market_bars if bar["date"] <= target_date_text]
+    market_bars = market_bars_as_of(("^TWII", "0050.TW"), start_dt, end_dt, target_date_text)
 
     universe = get_taiwan_stock_universe(max_per_industry=max_per_industry)
-    industries = {}
     loaded_stocks = []
 
     def load_stock(stock):
@@ -741,24 +744,28 @@ def generate_holy_grail_report_from_yfinance(target_date=None, max_per_industry=
             return None
         return {**stock, "bars": bars}
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(load_stock, stock) for stock in universe]
-        for future in as_completed(futures):
-            stock = future.result()
-            if not stock:
-                continue
-            loaded_stocks.append(stock)
-            industries.setdefault(stock["industry"], []).append(stock)
+    for _, future in fetch_map("yahoo", load_stock, universe):
+        stock = future.result()
+        if not stock:
+            continue
+        loaded_stocks.append(stock)
 
     us_industries = fetch_us_industries(start_dt, end_dt, target_date_text)
 
+    return generate_holy_grail_report_from_bars(market_bars, loaded_stocks, us_industries, target_date_text)
+
+
+def generate_holy_grail_report_from_bars(market_bars, loaded_stocks, us_industries, target_date, data_source="twstock universe + yfinance history"):
+    industries = {}
+    for stock in loaded_stocks:
+        industries.setdefault(stock["industry"], []).append(stock)
     return generate_taiwan_holy_grail_report({
         "marketBars": market_bars,
         "industries": industries,
         "stocks": loaded_stocks,
         "usIndustries": us_industries,
-        "targetDate": target_date_text,
-        "dataSource": "twstock universe + yfinance history",
+        "targetDate": target_date,
+        "dataSource": data_source,
     })
 
 
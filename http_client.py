@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cassette import cassette_key, play
+from json_output import atomic_write
+from market_provider import get_provider
+from single_flight import SingleFlight
+
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+CACHE_DIR = os.path.join("cache", "http")
+CACHE_MAX_AGE = 14 * 86400
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+
+class HttpResponse:
+    def __init__(self, url, status_code, content, headers, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        content_type = self.headers.get("Content-Type", "")
+        charset = content_type.split("charset=")[-1].split(";")[0].strip() if "charset=" in content_type else "utf-8"
+        try:
+            return self.content.decode(charset, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8-sig"))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}: {self.url}")
+
+
+def cache_key(url, params=None):
+    full_url = f"{url}?{urlencode(sorted((params or {}).items()), doseq=True)}" if params else url
+    return full_url, hashlib.sha1(full_url.encode("utf-8")).hexdigest()
+
+
+def is_error_payload(content):
+    # 有些 API (例如 FinMind 的額度限制) 以 HTTP 200 回傳錯誤，JSON 內的 status / stat 才是真正的結果。
+    if content.lstrip()[:1] != b"{":
+        return False
+    try:
+        payload = json.loads(content.decode("utf-8-sig"))
+    except (ValueError, UnicodeDecodeError):
+        return False
+    if not isinstance(payload, dict):
+        return False
+    status = payload.get("status", payload.get("stat"))
+    if status is not None and str(status).lower() not in ("200", "ok"):
+        return True
+    return bool(payload.get("error"))
+
+
+class HttpClient:
+    def __init__(self, cache_dir=CACHE_DIR, retries=3, backoff=0.5, max_backoff=8.0, pool_size=32, sleep=time.sleep):
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        # requests 的連線池以 host 為單位，同一個 session 內對同一主機的請求會重用 keep-alive 連線。
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.stats = {"requests": 0, "retries": 0, "cacheHits": 0, "notModified": 0, "coalesced": 0, "bytes": 0}
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def backoff_seconds(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        # full jitter：避免多個工作緒在同一時間點一起重試。
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def send(self, url, params=None, headers=None, timeout=20):
+        headers = {**DEFAULT_HEADERS, **(headers or {})}
+        key = cassette_key("http", cache_key(url, params)[0])
+        for attempt in range(self.retries + 1):
+            self.count("requests")
+            try:
+                response = play(key, lambda: self.session.get(url, params=params, headers=headers, timeout=timeout))
+            except RETRY_EXCEPTIONS:
+                if attempt >= self.retries:
+                    raise
+                self.count("retries")
+                self.sleep(self.backoff_seconds(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self.count("retries")
+                self.sleep(self.backoff_seconds(attempt, response.headers.get("Retry-After")))
+                continue
+            self.count("bytes", len(response.content))
+            return HttpResponse(response.url, response.status_code, response.content, response.headers)
+
+    def cache_paths(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def read_cache(self, key):
+        meta_path, body_path = self.cache_paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(body_path, "rb") as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def write_cache(self, key, meta, body=None):
+        meta_path, body_path = self.cache_paths(key)
+        if body is not None:
+            atomic_write(body_path, body)
+        atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def prune_cache(self, max_age=CACHE_MAX_AGE):
+        # 快取會隨 CI 快取跨次保留；超過 max_age 沒再用到的項目 (以 meta 檔的寫入時間為準) 一併刪除。
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                for path in self.cache_paths(entry.name[:-5]):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                removed += 1
+        return removed
+
+    def get(self, url, params=None, headers=None, timeout=20, ttl=None):
+        # 不同階段同時要同一個網址時只發一次請求，其他呼叫共用回應。
+        full_url, _ = cache_key(url, params)
+        key = (full_url, tuple(sorted((headers or {}).items())))
+        response, shared = self.flights.do(key, lambda: self.fetch(url, params, headers, timeout, ttl))
+        if shared:
+            self.count("coalesced")
+        return response
+
+    def fetch(self, url, params=None, headers=None, timeout=20, ttl=None):
+        # ttl=None 不使用磁碟快取；ttl 秒內直接回傳快取，過期後帶 ETag / Last-Modified 做條件式請求。
+        if ttl is None:
+            return self.send(url, params, headers, timeout)
+        full_url, key = cache_key(url, params)
+        meta, body = self.read_cache(key)
+        now = time.time()
+        if meta is not None and now - meta.get("fetchedAt", 0) < ttl:
+            self.count("cacheHits")
+            return HttpResponse(full_url, 200, body, meta.get("headers") or {}, from_cache=True)
+
+        conditional = dict(headers or {})
+        if meta is not None:
+            if meta.get("etag"):
+                conditional["If-None-Match"] = meta["etag"]
+            if meta.get("lastModified"):
+                conditional["If-Modified-Since"] = meta["lastModified"]
+        response = self.send(url, params, conditional, timeout)
+        if response.status_code == 304 and meta is not None:
+            self.count("notModified")
+            self.write_cache(key, {**meta, "fetchedAt": now})
+            return HttpResponse(full_url, 200, body, meta.get("headers") or {}, from_cache=True)
+        if response.status_code == 200 and not is_error_payload(response.content):
+            self.write_cache(key, {
+                "url": full_url,
+                "fetchedAt": now,
+                "etag": response.headers.get("ETag"),
+                "lastModified": response.headers.get("Last-Modified"),
+                "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+            }, response.content)
+        return response
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def http_get(url, params=None, headers=None, timeout=20, ttl=None):
+    if (provider := get_provider()) is not None:
+        return provider.http_get(url, params=params, headers=headers)
+    return get_client().get(url, params=params, headers=headers, timeout=timeout, ttl=ttl)
+
+
+def format_http_stats(stats=None):
+    stats = stats or get_client().stats
+    return f"HTTP 請求 {stats['requests']} 次 (重試 {stats['retries']})，快取命中 {stats['cacheHits']}，未變動 {stats['notModified']}，合併 {stats['coalesced']}，下載 {stats['bytes'] / 1024:.0f} KB"
@@ -0,0 +1,219 @@
+import bisect
+import json
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import yfinance as yf
+
+from cassette import clock_now, clock_time
+from price_panel import SESSION_CLOSE, expected_session, market_of, normalize_history
+from yf_limiter import yf_history
+
+
+INDEX_SYMBOLS = ("^TWII", "0050.TW", "SPY", "^GSPC")
+CACHE_DIR = os.path.join("cache", "index")
+HISTORY_DAYS = 800
+REFRESH_OVERLAP_DAYS = 7
+MAX_AGE_SECONDS = 3600
+
+_series = {}
+_lock = threading.Lock()
+
+
+class IndexSeries:
+    def __init__(self, symbol, bars, fetched_at=0, covered_from=None):
+        self.symbol = symbol
+        self.bars = sorted(bars, key=lambda bar: bar["date"])
+        self.fetched_at = fetched_at
+        self.covered_from = covered_from or (self.bars[0]["date"] if self.bars else None)
+        self.dates = [bar["date"] for bar in self.bars]
+        self.closes = [bar["close"] for bar in self.bars]
+        self.ma = {window: rolling_mean(self.closes, window) for window in (20, 60, 120)}
+        self.return20 = [
+            (close - self.closes[index - 20]) / self.closes[index - 20] if index >= 20 and self.closes[index - 20] else None
+            for index, close in enumerate(self.closes)
+        ]
+
+    def __len__(self):
+        return len(self.bars)
+
+    def position(self, target_date, exact=False):
+        index = bisect.bisect_right(self.dates, target_date) - 1
+        if index < 0 or (exact and self.dates[index] != target_date):
+            return None
+        return index
+
+    def close_at(self, target_date, exact=False):
+        index = self.position(target_date, exact)
+        return None if index is None else self.closes[index]
+
+    def return_20d_at(self, target_date, exact=False):
+        index = self.position(target_date, exact)
+        return None if index is None else self.return20[index]
+
+    def snapshot(self, target_date, exact=False):
+        index = self.position(target_date, exact)
+        if index is None:
+            return None
+        return {
+            "symbol": self.symbol,
+            "date": self.dates[index],
+            "close": self.closes[index],
+            "return20": self.return20[index],
+            "ma20": self.ma[20][index],
+            "ma60": self.ma[60][index],
+            "ma120": self.ma[120][index],
+        }
+
+    def bars_until(self, target_date, start_date=None):
+        start = bisect.bisect_left(self.dates, start_date) if start_date else 0
+        return self.bars[start:bisect.bisect_right(self.dates, target_date)]
+
+
+def rolling_mean(values, window):
+    result = [None] * len(values)
+    total = 0.0
+    for index, value in enumerate(values):
+        total += value
+        if index >= window:
+            total -= values[index - window]
+        if index >= window - 1:
+            result[index] = total / window
+    return result
+
+
+def fetch_index_bars(symbol, start_dt, end_dt):
+    try:
+        df = normalize_history(yf_history(yf.Ticker(symbol), start=start_dt, end=end_dt, auto_adjust=False))
+    except Exception:
+        return []
+    bars = []
+    for date, row in df.iterrows():
+        close = float(row["Close"])
+        if math.isnan(close):
+            continue
+        bars.append({
+            "date": date.strftime("%Y-%m-%d"),
+            "open": none_if_nan(row.get("Open")),
+            "high": none_if_nan(row.get("High")),
+            "low": none_if_nan(row.get("Low")),
+            "close": close,
+            "volume": none_if_nan(row.get("Volume")) or 0,
+        })
+    return bars
+
+
+def none_if_nan(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) or math.isinf(number) else number
+
+
+def cache_path(symbol, cache_dir=CACHE_DIR):
+    safe = symbol.replace("^", "_").replace(".", "_")
+    return os.path.join(cache_dir, f"{safe}.json")
+
+
+def read_cached_bars(symbol, cache_dir=CACHE_DIR):
+    path = cache_path(symbol, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            payload = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not payload.get("bars"):
+        return None
+    return IndexSeries(symbol, payload["bars"], payload.get("fetchedAt") or 0, payload.get("coveredFrom"))
+
+
+def write_cached_bars(series, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path(series.symbol, cache_dir), "w", encoding="utf-8") as file:
+        json.dump({
+            "symbol": series.symbol,
+            "fetchedAt": series.fetched_at,
+            "coveredFrom": series.covered_from,
+            "bars": series.bars,
+        }, file, ensure_ascii=False)
+
+
+def merge_bars(old, new):
+    merged = {bar["date"]: bar for bar in old}
+    merged.update({bar["date"]: bar for bar in new})
+    return [merged[date] for date in sorted(merged)]
+
+
+def refresh_bars(symbol, bars, start_dt, end_dt):
+    start_text = start_dt.strftime("%Y-%m-%d")
+    fetched = []
+    if not bars:
+        return fetch_index_bars(symbol, start_dt, end_dt)
+    if bars[0]["date"] > start_text:
+        fetched.extend(fetch_index_bars(symbol, start_dt, datetime.strptime(bars[0]["date"], "%Y-%m-%d") + timedelta(days=1)))
+    since = datetime.strptime(bars[-1]["date"], "%Y-%m-%d") - timedelta(days=REFRESH_OVERLAP_DAYS)
+    fetched.extend(fetch_index_bars(symbol, since, end_dt))
+    return merge_bars(bars, fetched)
+
+
+def session_close(symbol, date_text):
+    tz, hour, minute = SESSION_CLOSE[market_of(symbol)]
+    day = datetime.strptime(date_text, "%Y-%m-%d")
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz).timestamp()
+
+
+def needs_refresh(series, start_dt, end_dt, max_age, now=None):
+    now = now or clock_time()
+    if series is None or not len(series):
+        return True
+    if series.covered_from > start_dt.strftime("%Y-%m-%d"):
+        return True
+    last = series.dates[-1]
+    # 最後一根是在收盤前抓到的盤中 K 棒：收盤後一定重抓，盤中則每 max_age 更新一次。
+    if series.fetched_at < session_close(series.symbol, last):
+        return now >= session_close(series.symbol, last) or now - series.fetched_at > max_age
+    # 缺少最近一個已收盤交易日的 K 棒，且上次抓取早於那天收盤 (之後才抓仍沒有，代表休市)。
+    expected = min(expected_session(series.symbol, now), (end_dt - timedelta(days=1)).strftime("%Y-%m-%d"))
+    return last < expected and series.fetched_at < session_close(series.symbol, expected)
+
+
+def get_index_series(symbol, start_dt=None, end_dt=None, max_age=MAX_AGE_SECONDS, cache_dir=CACHE_DIR):
+    end_dt = end_dt or clock_now() + timedelta(days=1)
+    start_dt = start_dt or end_dt - timedelta(days=HISTORY_DAYS)
+    with _lock:
+        series = _series.get(symbol)
+        if series is None:
+            series = read_cached_bars(symbol, cache_dir)
+        if needs_refresh(series, start_dt, end_dt, max_age):
+            bars = refresh_bars(symbol, series.bars if series else [], start_dt, end_dt)
+            covered_from = min(filter(None, [start_dt.strftime("%Y-%m-%d"), series.covered_from if series else None]))
+            series = IndexSeries(symbol, bars, clock_time(), covered_from if bars else None)
+            if bars:
+                write_cached_bars(series, cache_dir)
+        _series[symbol] = series
+        return series
+
+
+def first_available_series(symbols, start_dt=None, end_dt=None, **kwargs):
+    for symbol in symbols:
+        series = get_index_series(symbol, start_dt, end_dt, **kwargs)
+        if len(series):
+            return series
+    return None
+
+
+def market_bars_as_of(symbols, start_dt, end_dt, target_date):
+    series = first_available_series(symbols, start_dt, end_dt)
+    if series is None:
+        return []
+    return series.bars_until(target_date, start_dt.strftime("%Y-%m-%d"))
+
+
+def clear_memory_cache():
+    with _lock:
+        _series.clear()
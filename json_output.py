@@ -0,0 +1,157 @@
+import gzip
+import json
+import math
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# JSON_INDENT=1 產生縮排版方便除錯；JSON_COMPRESS=gz,br 另外輸出預壓縮檔給靜態主機。
+INDENT = os.getenv("JSON_INDENT", "").lower() in ("1", "true", "yes")
+COMPRESS = tuple(part.strip() for part in os.getenv("JSON_COMPRESS", "").split(",") if part.strip())
+COMPRESSED_SUFFIXES = ("gz", "br")
+
+
+def encoder_name():
+    return "orjson" if orjson is not None else "json"
+
+
+def json_default(value):
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        number = float(value)
+        return number if math.isfinite(number) else None
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        if value.hour == value.minute == value.second == value.microsecond == 0:
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def finite_float(value):
+    if math.isfinite(value):
+        return float.__repr__(value)
+    return "null"
+
+
+class SafeJSONEncoder(json.JSONEncoder):
+    # 序列化時直接把 NaN/Inf 寫成 null，不必先複製一份清理過的資料。
+    def default(self, value):
+        return json_default(value)
+
+    def iterencode(self, value, _one_shot=False):
+        return json.encoder._make_iterencode(
+            {} if self.check_circular else None,
+            self.default,
+            json.encoder.encode_basestring,
+            self.indent,
+            finite_float,
+            self.key_separator,
+            self.item_separator,
+            self.sort_keys,
+            self.skipkeys,
+            _one_shot,
+        )(value, 0)
+
+
+def stdlib_options(indent):
+    if indent:
+        return {"ensure_ascii": False, "indent": 2}
+    return {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def encode_json(data, indent=None):
+    indent = INDENT if indent is None else indent
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=json_default, option=option)
+        except TypeError:
+            pass
+    options = stdlib_options(indent)
+    try:
+        # 大多數資料沒有 NaN，先走 C 加速的編碼器，遇到非有限浮點數才改用逐項處理。
+        text = json.dumps(data, allow_nan=False, default=json_default, **options)
+    except ValueError:
+        text = SafeJSONEncoder(**options).encode(data)
+    return text.encode("utf-8")
+
+
+def compress_payload(payload, suffix):
+    if suffix == "gz":
+        return gzip.compress(payload, compresslevel=9, mtime=0)
+    if suffix == "br" and brotli is not None:
+        return brotli.compress(payload)
+    return None
+
+
+def atomic_write(path, payload):
+    # 先寫暫存檔再 rename，中途被中斷也不會留下寫到一半的檔案。
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_compressed(path, payload, compress=None):
+    compress = COMPRESS if compress is None else compress
+    sizes = {}
+    for suffix in COMPRESSED_SUFFIXES:
+        sibling = f"{path}.{suffix}"
+        data = compress_payload(payload, suffix) if suffix in compress else None
+        if data is None:
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        atomic_write(sibling, data)
+        sizes[suffix] = len(data)
+    return sizes
+
+
+def write_json(path, data, indent=None, compress=None, report=True):
+    started = time.perf_counter()
+    payload = encode_json(data, indent)
+    encode_ms = (time.perf_counter() - started) * 1000
+    atomic_write(path, payload)
+    stats = {"path": path, "bytes": len(payload), "encodeMs": encode_ms, "compressed": write_compressed(path, payload, compress)}
+    if report:
+        print(format_write_stats(stats))
+    return stats
+
+
+def format_write_stats(stats):
+    compressed = "".join(f" / {suffix} {size / 1024:.1f} KB" for suffix, size in stats["compressed"].items())
+    return f"寫入 {stats['path']}: {stats['bytes'] / 1024:.1f} KB{compressed}，編碼 {stats['encodeMs']:.1f} ms ({encoder_name()})"
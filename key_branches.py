@@ -1,11 +1,13 @@
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-import requests
+from cassette import clock_now
+from fetch_engine import fetch_map
+from http_client import http_get
 
 
 FINMIND_BRANCH_URL = "https://api.finmindtrade.com/api/v4/taiwan_stock_trading_daily_report"
+FINMIND_HISTORY_TTL = 7 * 24 * 3600
 
 
 def base_code(code):
@@ -85,11 +87,13 @@ def strategy_contexts(strategies, max_targets=36):
 
 
 def fetch_finmind_branch_rows(stock_id, date, token=None, timeout=20):
-    headers = {"User-Agent": "Mozilla/5.0"}
+    headers = {}
     if token:
         headers["Authorization"] = f"Bearer {token}"
     params = {"data_id": base_code(stock_id), "date": date}
-    response = requests.get(FINMIND_BRANCH_URL, headers=headers, params=params, timeout=timeout)
+    # 過去日期的分點資料不會再變，放進磁碟快取；當天的資料每次都重新確認。
+    ttl = FINMIND_HISTORY_TTL if date < clock_now().strftime("%Y-%m-%d") else 0
+    response = http_get(FINMIND_BRANCH_URL, headers=headers, params=params, timeout=timeout, ttl=ttl)
     payload = response.json()
     if response.status_code != 200 or payload.get("status") not in (200, "200", None):
         raise RuntimeError(payload.get("msg") or f"HTTP {response.status_code}")
@@ -195,7 +199,7 @@ def is_finmind_permission_error(errors):
     )
 
 
-def generate_key_branch_report(strategies, target_date, token=None, max_targets=36, max_workers=8):
+def generate_key_branch_report(strategies, target_date, token=None, max_targets=36):
     token = token if token is not None else os.getenv("FINMIND_TOKEN")
     if not token:
         report = empty_key_branch_report("需要在 GitHub Secrets 或本機環境設定 FINMIND_TOKEN，才能抓取券商分點資料。")
@@ -212,16 +216,13 @@ def generate_key_branch_report(strategies, target_date, token=None, max_targets=
         signal = branch_signal_for_stock(context, rows)
         return signal
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(load, context): context for context in targets}
-        for future in as_completed(futures):
-            context = futures[future]
-            try:
-                item = future.result()
-                if item:
-                    items.append(item)
-            except Exception as exc:
-                errors.append({"code": context["code"], "name": context.get("name"), "message": str(exc)})
+    for context, future in fetch_map("finmind", load, targets):
+        try:
+            item = future.result()
+            if item:
+                items.append(item)
+        except Exception as exc:
+            errors.append({"code": context["code"], "name": context.get("name"), "message": str(exc)})
 
     items.sort(key=lambda item: (item["branchScore"], abs(item["netPressureLots"])), reverse=True)
     status = "ok" if items else "no_data"
@@ -1,4 +1,4 @@
-import requests
+import argparse
 import yfinance as yf
 import pandas as pd
 import twstock
@@ -8,14 +8,28 @@ import os
 import glob
 import random
 import re
-import math
+import shutil
+import tempfile
 import time
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
+from cassette import clock_now, format_cassette_stats, start_cassette
+from cb_valuation import breakout_table, cb_frame, cbas_rows, close_frame, quote_frame, valuation_records, valuation_table
 from druckenmiller import generate_druckenmiller_report
+from fetch_engine import fetch_map, format_engine_stats
+from history_store import SHARD_DIR, publish_history, publish_shards
+from http_client import format_http_stats, get_client, http_get
 from holy_grail import generate_holy_grail_report_from_yfinance
+from json_output import write_json
+from market_provider import code_tables, install_provider
+from price_panel import update_panel_store
 from key_branches import empty_key_branch_report, generate_key_branch_report
+from signal_delta import publish_deltas
+from synthetic_market import SyntheticMarket
+from scan_journal import ScanJournal
+from signal_store import SIGNAL_DB, import_archive, open_signal_store
+from ticker_index import publish_ticker_index
+from yf_limiter import ERROR, backoff_seconds, classify_error, format_limiter_stats, get_limiter, yf_attr, yf_history
 
 # --- 全域設定 ---
 DATA_FILE = "data.json"
@@ -26,20 +40,25 @@ TWSE_FUND_URL = "https://openapi.twse.com.tw/v1/opendata/t187ap47_L"
 TWSE_QUOTE_URL = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
 TPEX_CB_ISSUE_URL = "https://www.tpex.org.tw/openapi/v1/bond_ISSBD5_data"
 TPEX_CB_QUOTE_URL = "https://www.tpex.org.tw/www/zh-tw/bond/cbDayQry"
+TPEX_CLOSE_URL = "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_daily_close_quotes"
 ETFINFO_ACTIVE_URL = "https://www.etfinfo.tw/active"
 ACTIVE_ETF_BUY_TYPES = {"added", "increased"}
 ACTIVE_ETF_SELL_TYPES = {"removed", "decreased"}
+STOCK_STRATEGY_KEYS = ("momentum", "day_trading", "doji_rise", "macd_turn_red")
+CB_QUOTE_CACHE_DIR = os.path.join("cache", "cb_quotes")
+CB_MASTER_FILE = os.path.join("cache", "cb_master.json")
+CBAS_PRICE_STORE = os.path.join("cache", "cbas_prices.pkl.gz")
+CBAS_HISTORY_DAYS = 120
+CB_VALUATION_FILE = os.path.join(SHARD_DIR, "cb_valuation.json")
 
 # --- 工具函式 ---
-def fetch_json(url, params=None, timeout=20):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    res = requests.get(url, params=params, headers=headers, timeout=timeout)
+def fetch_json(url, params=None, timeout=20, ttl=None):
+    res = http_get(url, params=params, timeout=timeout, ttl=ttl)
     res.raise_for_status()
-    return json.loads(res.content.decode("utf-8-sig"))
+    return res.json()
 
-def fetch_text(url, params=None, timeout=20):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    res = requests.get(url, params=params, headers=headers, timeout=timeout)
+def fetch_text(url, params=None, timeout=20, ttl=None):
+    res = http_get(url, params=params, timeout=timeout, ttl=ttl)
     res.raise_for_status()
     return res.text
 
@@ -61,16 +80,6 @@ def roc_or_yyyymmdd_to_iso(val):
         return f"{text[:4]}-{text[4:6]}-{text[6:8]}"
     return str(val)
 
-def clean_for_json(obj):
-    if isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj): return None
-        return obj
-    elif isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(v) for v in obj]
-    return obj
-
 def empty_holy_grail_report(error_msg=None):
     return {
         "title": "台股聖杯雷達",
@@ -103,33 +112,39 @@ def get_stock_name(ticker, region, stock_obj=None):
         clean_code = ticker.split('.')[0]
         if clean_code in tw_stock_map: return tw_stock_map[clean_code].name
     if stock_obj:
-        try: return stock_obj.info.get('longName') or stock_obj.info.get('shortName') or ticker
+        try:
+            info = yf_attr(stock_obj, "info")
+            return info.get('longName') or info.get('shortName') or ticker
         except: pass
     return display_name
 
 def get_tw_stock_list():
-    stocks = []
-    for code in twstock.twse:
+    stocks = []; tables = code_tables()
+    for code in tables.twse:
         if len(code) == 4: stocks.append({"code": f"{code}.TW", "region": "TW"})
-    for code in twstock.tpex:
+    for code in tables.tpex:
         if len(code) == 4: stocks.append({"code": f"{code}.TWO", "region": "TW"})
     return stocks
 
 def get_tw_ticker_candidates(stock_id):
-    if stock_id in twstock.twse:
+    tables = code_tables()
+    if stock_id in tables.twse:
         return [f"{stock_id}.TW"]
-    if stock_id in twstock.tpex:
+    if stock_id in tables.tpex:
         return [f"{stock_id}.TWO"]
     return [f"{stock_id}.TW", f"{stock_id}.TWO"]
 
+def empty_financial_details():
+    return {"pe": 999, "growth": None, "rev_yoy": None, "rev_qoq": None, "quarters": []}
+
 def get_financial_details(stock_obj):
-    data = {"pe": 999, "growth": None, "rev_yoy": None, "rev_qoq": None, "quarters": []}
+    data = empty_financial_details()
     try:
-        info = stock_obj.info
+        info = yf_attr(stock_obj, "info")
         data['pe'] = info.get('trailingPE', 999)
         data['growth'] = info.get('earningsGrowth', None)
         data['rev_yoy'] = info.get('revenueGrowth', None)
-        q_stmt = stock_obj.quarterly_income_stmt
+        q_stmt = yf_attr(stock_obj, "quarterly_income_stmt")
         if q_stmt is not None and not q_stmt.empty:
             vals = q_stmt.loc['Total Revenue'] if 'Total Revenue' in q_stmt.index else q_stmt.loc['Operating Revenue']
             limit = min(4, len(vals))
@@ -140,91 +155,215 @@ def get_financial_details(stock_obj):
     except: pass
     return data
 
+class FetchFailed(Exception):
+    pass
+
 def fetch_data_safe(ticker, retries=3):
+    error = None
     for i in range(retries):
         try:
             stock = yf.Ticker(ticker)
-            df = stock.history(period="2y") 
+            df = yf_history(stock, period="2y")
             if not df.empty: return stock, df
-        except: time.sleep(1)
+            error = None
+        except Exception as e:
+            error = e
+            # 限流與逾時退避後重試；其他錯誤重試也沒用，記錄後放棄。
+            if classify_error(e) == ERROR:
+                print(f"[{ticker}] 下載失敗: {e}"); break
+        if i + 1 < retries: time.sleep(backoff_seconds(i))
+    get_limiter().count_failure()
+    # 回傳空表才是真的沒資料；最後仍是例外 (限流、逾時、連線錯誤) 就交給呼叫端保留待重試。
+    if error is not None: raise FetchFailed(f"{ticker}: {error}") from error
     return None, None
 
 # ==========================================
 # CBAS 可轉債策略模組
 # ==========================================
-def fetch_active_cbs():
+def parse_active_cbs(raw_list):
+    cb_list = []
+    for row in raw_list:
+        try:
+            cb_id = (row.get("BondCode") or "").strip()
+            stock_id = (row.get("IssuerCode") or "").strip()
+            conv_price = parse_float(row.get("Conversion/ExchangePriceAtIssuance"))
+            is_listed = row.get("ListingStatus") == "2"
+            is_public = row.get("OfferingMethod") == "7"
+            if not (cb_id and len(stock_id) == 4 and stock_id.isdigit() and is_listed and is_public):
+                continue
+            if conv_price is None or conv_price <= 0:
+                continue
+            cb_list.append({
+                "stock_id": stock_id,
+                "cb_id": cb_id,
+                "cb_name": row.get("ShortName") or cb_id,
+                "conversion_price": conv_price,
+                "issue_date": roc_or_yyyymmdd_to_iso(row.get("IssueDate")),
+                "maturity_date": roc_or_yyyymmdd_to_iso(row.get("MaturityDate")),
+                "listing_date": roc_or_yyyymmdd_to_iso(row.get("ListingDate")),
+                "outstanding_amount": parse_float(row.get("OutstandingAmount")),
+                "put_option_date": roc_or_yyyymmdd_to_iso(row.get("PutOptionDate")),
+                "put_option_price": parse_float(row.get("PutOptionPrice")),
+                "guaranteed": row.get("Guaranteed") == "1",
+            })
+        except: continue
+    return cb_list
+
+class CbMaster:
+    def __init__(self, cbs, fetched_date=None, etag=None, last_modified=None):
+        self.cbs = cbs
+        self.fetched_date = fetched_date
+        self.etag = etag
+        self.last_modified = last_modified
+        self.by_id = {cb['cb_id']: cb for cb in cbs}
+        self.by_stock = {}
+        for cb in cbs: self.by_stock.setdefault(cb['stock_id'], []).append(cb)
+
+    def to_json(self):
+        return {"fetchedDate": self.fetched_date, "etag": self.etag, "lastModified": self.last_modified, "cbs": self.cbs}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get("cbs") or [], data.get("fetchedDate"), data.get("etag"), data.get("lastModified"))
+
+_cb_master = None
+
+def read_cb_master(path=CB_MASTER_FILE):
+    if not os.path.exists(path): return None
+    try:
+        with open(path, "r", encoding="utf-8") as f: return CbMaster.from_json(json.load(f))
+    except (OSError, ValueError): return None
+
+def fetch_cb_issue_rows(master=None):
+    headers = {}
+    if master and master.etag: headers["If-None-Match"] = master.etag
+    if master and master.last_modified: headers["If-Modified-Since"] = master.last_modified
+    res = http_get(TPEX_CB_ISSUE_URL, headers=headers, timeout=20)
+    if res.status_code == 304: return None, res.headers
+    res.raise_for_status()
+    return res.json(), res.headers
+
+def diff_cb_master(old, new):
+    return {
+        "added": [new.by_id[cb_id] for cb_id in sorted(new.by_id.keys() - old.by_id.keys())],
+        "removed": [old.by_id[cb_id] for cb_id in sorted(old.by_id.keys() - new.by_id.keys())],
+        "repriced": [
+            (new.by_id[cb_id], old.by_id[cb_id]['conversion_price'])
+            for cb_id in sorted(new.by_id.keys() & old.by_id.keys())
+            if new.by_id[cb_id]['conversion_price'] != old.by_id[cb_id]['conversion_price']
+        ],
+    }
+
+def log_cb_master_changes(changes):
+    for cb in changes["added"]: print(f"  新掛牌可轉債：{cb['cb_id']} {cb['cb_name']} (標的 {cb['stock_id']}，轉換價 {cb['conversion_price']})")
+    for cb in changes["removed"]: print(f"  下櫃/到期可轉債：{cb['cb_id']} {cb['cb_name']}")
+    for cb, old_price in changes["repriced"]: print(f"  轉換價調整：{cb['cb_id']} {cb['cb_name']} {old_price} → {cb['conversion_price']}")
+
+def load_cb_master(force=False, path=CB_MASTER_FILE, today=None):
+    # 發行資料一天最多更新一次；同一個行程內直接用記憶體中的表。
+    global _cb_master
+    today = today or clock_now(timezone(timedelta(hours=8))).strftime('%Y-%m-%d')
+    master = _cb_master or read_cb_master(path)
+    if master and master.cbs and master.fetched_date == today and not force:
+        _cb_master = master
+        return master
     try:
         print("連線 TPEx OpenAPI 抓取可轉債發行資料...")
-        raw_list = fetch_json(TPEX_CB_ISSUE_URL)
-        cb_list = []
-        for row in raw_list:
-            try:
-                cb_id = (row.get("BondCode") or "").strip()
-                stock_id = (row.get("IssuerCode") or "").strip()
-                conv_price = parse_float(row.get("Conversion/ExchangePriceAtIssuance"))
-                is_listed = row.get("ListingStatus") == "2"
-                is_public = row.get("OfferingMethod") == "7"
-                if not (cb_id and len(stock_id) == 4 and stock_id.isdigit() and is_listed and is_public):
-                    continue
-                if conv_price is None or conv_price <= 0:
-                    continue
-                cb_list.append({
-                    "stock_id": stock_id,
-                    "cb_id": cb_id,
-                    "cb_name": row.get("ShortName") or cb_id,
-                    "conversion_price": conv_price,
-                    "issue_date": roc_or_yyyymmdd_to_iso(row.get("IssueDate")),
-                    "maturity_date": roc_or_yyyymmdd_to_iso(row.get("MaturityDate")),
-                    "listing_date": roc_or_yyyymmdd_to_iso(row.get("ListingDate")),
-                    "outstanding_amount": parse_float(row.get("OutstandingAmount")),
-                    "put_option_date": roc_or_yyyymmdd_to_iso(row.get("PutOptionDate")),
-                    "put_option_price": parse_float(row.get("PutOptionPrice")),
-                    "guaranteed": row.get("Guaranteed") == "1",
-                })
-            except: continue
-        print(f"可轉債發行資料：{len(cb_list)} 檔")
-        return cb_list
+        raw_list, headers = fetch_cb_issue_rows(master)
+        etag = headers.get("ETag") or (master.etag if master else None)
+        last_modified = headers.get("Last-Modified") or (master.last_modified if master else None)
+        if raw_list is None:
+            print("可轉債發行資料未變動 (304)")
+            fresh = CbMaster(master.cbs, today, etag, last_modified)
+        else:
+            fresh = CbMaster(parse_active_cbs(raw_list), today, etag, last_modified)
+            if not fresh.cbs: raise ValueError("發行資料為空")
+            if master:
+                changes = diff_cb_master(master, fresh)
+                print(f"可轉債發行資料異動：新增 {len(changes['added'])} / 移除 {len(changes['removed'])} / 轉換價調整 {len(changes['repriced'])}")
+                log_cb_master_changes(changes)
     except Exception as e:
         print(f"CB 資料抓取失敗: {e}")
-        return []
+        _cb_master = master or CbMaster([])
+        return _cb_master
+    write_json(path, fresh.to_json(), report=False)
+    print(f"可轉債發行資料：{len(fresh.cbs)} 檔")
+    _cb_master = fresh
+    return fresh
+
+def fetch_active_cbs():
+    return load_cb_master().cbs
 
-def fetch_cb_latest_quote(cb_id):
+def parse_cb_quote_rows(rows):
+    quotes = []
+    for row in rows:
+        if len(row) < 11 or row[1] != "等價":
+            continue
+        close = parse_float(row[2])
+        if close is None:
+            continue
+        quotes.append({
+            "trade_date": roc_or_yyyymmdd_to_iso(row[0]),
+            "cb_price": close,
+            "cb_change": parse_float(row[3]),
+            "cb_open": parse_float(row[4]),
+            "cb_high": parse_float(row[5]),
+            "cb_low": parse_float(row[6]),
+            "cb_transactions": parse_float(row[7]),
+            "cb_units": parse_float(row[8]),
+            "cb_trade_value": parse_float(row[9]),
+            "cb_avg_price": parse_float(row[10]),
+        })
+    return quotes
+
+def fetch_cb_quote_history(cb_id):
     try:
         data = fetch_json(TPEX_CB_QUOTE_URL, params={"code": cb_id, "response": "json"}, timeout=15)
         tables = data.get("tables") or []
         rows = tables[0].get("data", []) if tables else []
-        latest = None
-        for row in rows:
-            if len(row) < 11 or row[1] != "等價":
-                continue
-            close = parse_float(row[2])
-            if close is None:
-                continue
-            latest = {
-                "trade_date": roc_or_yyyymmdd_to_iso(row[0]),
-                "cb_price": close,
-                "cb_change": parse_float(row[3]),
-                "cb_open": parse_float(row[4]),
-                "cb_high": parse_float(row[5]),
-                "cb_low": parse_float(row[6]),
-                "cb_transactions": parse_float(row[7]),
-                "cb_units": parse_float(row[8]),
-                "cb_trade_value": parse_float(row[9]),
-                "cb_avg_price": parse_float(row[10]),
-            }
-        return latest
+        return parse_cb_quote_rows(rows)
     except Exception:
-        return None
+        return []
 
-def check_cbas_signal(stock_id):
-    df = None; valid_symbol = None
-    for symbol in get_tw_ticker_candidates(stock_id):
-        _, tmp_df = fetch_data_safe(symbol, retries=1)
-        if tmp_df is not None and len(tmp_df) > 30:
-            df = tmp_df; valid_symbol = symbol; break
-            
-    if df is None: return None
+def expected_market_date(now=None):
+    now = now or clock_now(timezone(timedelta(hours=8)))
+    expected_date = now.strftime('%Y-%m-%d')
+    if now.hour < 14: expected_date = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+    exp_dt = datetime.strptime(expected_date, '%Y-%m-%d')
+    if exp_dt.weekday() == 6: expected_date = (exp_dt - timedelta(days=2)).strftime('%Y-%m-%d')
+    elif exp_dt.weekday() == 5: expected_date = (exp_dt - timedelta(days=1)).strftime('%Y-%m-%d')
+    return expected_date
 
+def cached_cb_quote_history(cb_id, market_date, cache_dir=CB_QUOTE_CACHE_DIR):
+    path = os.path.join(cache_dir, market_date, f"{cb_id}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f: return json.load(f)
+        except (OSError, ValueError): pass
+    quotes = fetch_cb_quote_history(cb_id)
+    # 收盤行情尚未出來前抓到的資料不落地，下一輪整點重跑會再抓一次。
+    if quotes and (quotes[-1].get("trade_date") or "") >= market_date:
+        write_json(path, quotes, report=False)
+    return quotes
+
+def fetch_cb_latest_quotes(cb_ids, market_date, cache_dir=CB_QUOTE_CACHE_DIR):
+    cb_ids = sorted(set(cb_ids))
+    if os.path.isdir(cache_dir):
+        for day in os.listdir(cache_dir):
+            if day != market_date: shutil.rmtree(os.path.join(cache_dir, day), ignore_errors=True)
+    histories = {}
+    for cb_id, future in fetch_map("tpex", lambda cb_id: cached_cb_quote_history(cb_id, market_date, cache_dir), cb_ids):
+        histories[cb_id] = future.result()
+    # 只要有任一檔已出現 market_date 的報價，代表當天行情已公布；其餘停留在舊日期的是當天沒成交的債券，
+    # 也寫入當日快取，之後整點重跑只會查詢最新一筆仍早於 market_date 且尚未確認的債券。
+    if any((quotes[-1].get("trade_date") or "") >= market_date for quotes in histories.values() if quotes):
+        for cb_id, quotes in histories.items():
+            path = os.path.join(cache_dir, market_date, f"{cb_id}.json")
+            if quotes and not os.path.exists(path): write_json(path, quotes, report=False)
+    return {cb_id: quotes[-1] for cb_id, quotes in histories.items() if quotes}
+
+def cbas_breakout_signal(df, symbol):
+    if df is None or len(df) <= 30: return None
     close = df['Close']; volume = df['Volume']
     ma20 = close.rolling(20).mean()
     std20 = close.rolling(20).std()
@@ -240,59 +379,79 @@ def check_cbas_signal(stock_id):
     is_volume_surge = curr_vol > (curr_vol_ma5 * 2.0)
     
     if is_breakout and is_volume_surge:
-        stock_name = get_stock_name(valid_symbol, "TW")
+        stock_name = get_stock_name(symbol, "TW")
         pct_change = round(((curr_close - prev_close) / prev_close) * 100, 2)
-        return {"code": valid_symbol, "name": stock_name, "price": float(f"{curr_close:.2f}"), "pct_change": pct_change, "vol_ratio": round(curr_vol / curr_vol_ma5, 1) if curr_vol_ma5 > 0 else 0}
+        return {"code": symbol, "name": stock_name, "price": float(f"{curr_close:.2f}"), "pct_change": pct_change, "vol_ratio": round(curr_vol / curr_vol_ma5, 1) if curr_vol_ma5 > 0 else 0}
     return None
 
+def build_cbas_row(sig, cb, quote):
+    parity = (sig['price'] / cb['conversion_price']) * 100
+    if parity <= 0:
+        return None
+    premium = ((quote['cb_price'] - parity) / parity) * 100
+    double_low = quote['cb_price'] + premium
+    return {
+        "code": sig['code'], "name": sig['name'], "price": sig['price'], "pct_change": sig['pct_change'],
+        "cb_code": cb['cb_id'], "cb_name": cb['cb_name'], "cb_price": quote['cb_price'],
+        "conversion_price": cb['conversion_price'], "conversion_value": round(parity, 2),
+        "premium_pct": round(premium, 2), "double_low": round(double_low, 2),
+        "cb_trade_date": quote.get("trade_date"), "cb_units": quote.get("cb_units"),
+        "cb_trade_value": quote.get("cb_trade_value"),
+        "maturity_date": cb.get("maturity_date"), "put_option_date": cb.get("put_option_date"),
+        "put_option_price": cb.get("put_option_price"), "guaranteed": cb.get("guaranteed"),
+        "desc": f"CB:{cb['cb_name']} | 雙低:{round(double_low, 2)}"
+    }
+
+def fetch_underlying_closes():
+    closes = {}
+    for url, code_key, close_key in ((TWSE_QUOTE_URL, "Code", "ClosingPrice"), (TPEX_CLOSE_URL, "SecuritiesCompanyCode", "Close")):
+        try:
+            rows = fetch_json(url, ttl=0)
+        except Exception as e:
+            print(f"收盤行情抓取失敗 ({url}): {e}")
+            continue
+        for row in rows:
+            code = (row.get(code_key) or "").strip()
+            close = parse_float(row.get(close_key))
+            if code and close: closes[code] = close
+    return closes
+
 def run_cbas_scanner():
     print("啟動 CBAS (可轉債發動) 掃描...")
-    cb_list = fetch_active_cbs()
-    if not cb_list: return []
-    
-    unique_stocks = list(set([item['stock_id'] for item in cb_list]))
-    stock_signals = {}
-    
-    with ThreadPoolExecutor(max_workers=10) as exc:
-        future_to_sid = {exc.submit(check_cbas_signal, sid): sid for sid in unique_stocks}
-        for future in as_completed(future_to_sid):
-            res = future.result()
-            if res: stock_signals[res['code'].split('.')[0]] = res
-    
-    results = []
-    for cb in cb_list:
-        sid = cb['stock_id']
-        if sid in stock_signals:
-            sig = stock_signals[sid]
-            quote = fetch_cb_latest_quote(cb['cb_id'])
-            if not quote:
-                continue
-            parity = (sig['price'] / cb['conversion_price']) * 100
-            if parity <= 0:
-                continue
-            premium = ((quote['cb_price'] - parity) / parity) * 100
-            double_low = quote['cb_price'] + premium
-            results.append({
-                "code": sig['code'], "name": sig['name'], "price": sig['price'], "pct_change": sig['pct_change'],
-                "cb_code": cb['cb_id'], "cb_name": cb['cb_name'], "cb_price": quote['cb_price'],
-                "conversion_price": cb['conversion_price'], "conversion_value": round(parity, 2),
-                "premium_pct": round(premium, 2), "double_low": round(double_low, 2),
-                "cb_trade_date": quote.get("trade_date"), "cb_units": quote.get("cb_units"),
-                "cb_trade_value": quote.get("cb_trade_value"),
-                "maturity_date": cb.get("maturity_date"), "put_option_date": cb.get("put_option_date"),
-                "put_option_price": cb.get("put_option_price"), "guaranteed": cb.get("guaranteed"),
-                "desc": f"CB:{cb['cb_name']} | 雙低:{round(double_low, 2)}"
-            })
-            
-    results.sort(key=lambda x: x['double_low'])
+    master = load_cb_master()
+    if not master.cbs: return []
+    market_date = expected_market_date()
+
+    # 發行公司的近期日線放在本地價格檔，整點重跑只補抓最近幾天。
+    symbols = sorted({symbol for stock_id in master.by_stock for symbol in get_tw_ticker_candidates(stock_id)})
+    end_dt = clock_now() + timedelta(days=1)
+    panel = update_panel_store(CBAS_PRICE_STORE, symbols, end_dt - timedelta(days=CBAS_HISTORY_DAYS), end_dt)
+    breakouts = breakout_table({symbol: panel[symbol] for symbol in symbols if symbol in panel}).drop_duplicates("stock_id")
+
+    closes = fetch_underlying_closes()
+    for symbol in symbols:
+        if symbol in panel and not panel[symbol].empty:
+            closes.setdefault(symbol.split('.')[0], float(panel[symbol]['Close'].iloc[-1]))
+    quotes = fetch_cb_latest_quotes(list(master.by_id), market_date)
+    table = valuation_table(cb_frame(master.cbs), quote_frame(quotes), close_frame(closes))
+    write_json(CB_VALUATION_FILE, {"date": market_date, "items": valuation_records(table)}, report=False)
+    print(f"可轉債估值表：{int(table['double_low'].notna().sum())}/{len(table)} 檔可計算雙低")
+
+    names = {symbol: get_stock_name(symbol, "TW") for symbol in breakouts['symbol']}
+    results = cbas_rows(table, breakouts, names)
     print(f"CBAS 掃描完成，找到 {len(results)} 檔標的")
     return results
 
 # ==========================================
 # 既有策略群 (移除厚積薄發)
 # ==========================================
-def strategy_momentum(df, ticker, region, latest, prev, fin_data):
-    LOOKBACK_SHORT = 60; LOOKBACK_LONG = 500; VOL_FACTOR = 1.2; GROWTH_REV_PRIORITY = 0.15
+MOMENTUM_PARAMS = {"lookback_short": 60, "lookback_long": 500, "vol_factor": 1.2, "growth_rev_priority": 0.15}
+DOJI_RISE_PARAMS = {"max_body_pct": 0.006, "min_vol_ratio": 0.5, "max_vol_ratio": 1.5}
+MACD_PARAMS = {"fast": 21, "slow": 55, "signal": 89}
+
+def strategy_momentum(df, ticker, region, latest, prev, fin_data, params=None):
+    p = {**MOMENTUM_PARAMS, **(params or {})}
+    LOOKBACK_SHORT = p["lookback_short"]; LOOKBACK_LONG = p["lookback_long"]; VOL_FACTOR = p["vol_factor"]; GROWTH_REV_PRIORITY = p["growth_rev_priority"]
     if latest['Volume'] < (500000 if region == 'TW' else 1000000): return None
     window_high_short = df['Close'][-LOOKBACK_SHORT-1:-1].max()
     is_new_high = latest['Close'] > window_high_short
@@ -302,7 +461,7 @@ def strategy_momentum(df, ticker, region, latest, prev, fin_data):
         vol_ma20 = df['Volume'].rolling(window=20).mean().iloc[-1]
         if latest['Volume'] > vol_ma20 * VOL_FACTOR: reasons.append(f"(基礎) 量增{VOL_FACTOR}倍")
         if latest['Close'] > df['Close'][-LOOKBACK_LONG-1:-1].max(): score += 2; reasons.append("(加分) 兩年新高 +2分")
-        if fin_data['rev_yoy'] and fin_data['rev_yoy'] > GROWTH_REV_PRIORITY: score += 3; reasons.append("★營收年增>15% (+3分)")
+        if fin_data['rev_yoy'] and fin_data['rev_yoy'] > GROWTH_REV_PRIORITY: score += 3; reasons.append(f"★營收年增>{GROWTH_REV_PRIORITY:.0%} (+3分)")
         elif fin_data['rev_yoy'] and fin_data['rev_yoy'] > 0: score += 1; reasons.append("(加分) 營收正成長 (+1分)")
         if fin_data['growth'] and fin_data['growth'] > 0.15: score += 1; reasons.append("(加分) EPS高成長 (+1分)")
         if fin_data['pe'] != 999 and fin_data['pe'] < 30: score += 1; reasons.append("(加分) 本益比合理 (+1分)")
@@ -325,7 +484,8 @@ def strategy_day_trading(df, ticker, region, latest):
     if today['Close'] * today['Volume'] < 50000000: return None
     return {"drop_pct": round(((today['Open'] - today['Close']) / today['Open']) * 100, 2), "rise_20d": round(((today['Close'] - price_20_ago) / price_20_ago) * 100, 2), "vol_lots": int(today['Volume'] / 1000), "amount_yi": round((today['Close'] * today['Volume']) / 100000000, 2), "pattern": "連紅漲停後黑K"}
 
-def strategy_doji_rise(df, ticker, region, latest):
+def strategy_doji_rise(df, ticker, region, latest, params=None):
+    p = {**DOJI_RISE_PARAMS, **(params or {})}
     if len(df) < 65: return None
     close = latest['Close']; open_p = latest['Open']; vol = latest['Volume']
     ma5_vol = df['Volume'].rolling(5).mean().iloc[-1]
@@ -334,11 +494,11 @@ def strategy_doji_rise(df, ticker, region, latest):
     if not (ma5_vol >= 5000000 or (ma5_vol * df['Close'][-5:].mean()) >= 1000000000): return None
     if close < ma20 or close < ma60 or ma60 < ma60_prev or close/ma20 > 1.15: return None
     body_pct = abs(close - open_p) / open_p
-    if body_pct > 0.006: return None
+    if body_pct > p["max_body_pct"]: return None
     total_range = latest['High'] - latest['Low']
     if total_range < abs(close - open_p) * 2 or total_range == 0: return None
     vol_ratio = vol / ma5_vol
-    if vol_ratio > 1.5 or vol_ratio < 0.5: return None
+    if vol_ratio > p["max_vol_ratio"] or vol_ratio < p["min_vol_ratio"]: return None
     score = 60; reasons = ["結構+十字星成立 (60分)"]
     if ma5_vol >= 10000000: score += 5; reasons.append("流動性極佳 (+5)")
     if 0.8 <= vol_ratio <= 1.2: score += 5; reasons.append("量能平穩 (+5)")
@@ -349,15 +509,16 @@ def strategy_doji_rise(df, ticker, region, latest):
     if score < 60: return None
     return {"score": score, "pattern": "標準十字星", "vol_ratio": round(vol_ratio * 100, 1), "vol_avg_val": round((ma5_vol * df['Close'][-5:].mean()) / 100000000, 1), "trend": "多頭整理", "reasons": reasons}
 
-def strategy_macd_turn_red(df):
+def strategy_macd_turn_red(df, params=None):
+    p = {**MACD_PARAMS, **(params or {})}
     if len(df) < 120:
         return None
 
     close = df['Close']
-    ema_fast = close.ewm(span=21, adjust=False).mean()
-    ema_slow = close.ewm(span=55, adjust=False).mean()
+    ema_fast = close.ewm(span=p["fast"], adjust=False).mean()
+    ema_slow = close.ewm(span=p["slow"], adjust=False).mean()
     dif = ema_fast - ema_slow
-    macd_signal = dif.ewm(span=89, adjust=False).mean()
+    macd_signal = dif.ewm(span=p["signal"], adjust=False).mean()
     histogram = dif - macd_signal
 
     if histogram.isna().iloc[-1] or histogram.iloc[-1] <= 0:
@@ -391,7 +552,7 @@ def strategy_macd_turn_red(df):
                 "histogram_cross": round(float(histogram.iloc[cross_idx]), 4),
                 "hist_sequence": hist_sequence,
                 "reasons": [
-                    f"MACD(21,55,89) 柱狀體於 {cross_date} 由綠翻紅",
+                    f"MACD({p['fast']},{p['slow']},{p['signal']}) 柱狀體於 {cross_date} 由綠翻紅",
                     f"目前為翻紅第{day}天，柱狀體 {round(float(histogram.iloc[-1]), 4)}",
                 ],
             }
@@ -399,7 +560,7 @@ def strategy_macd_turn_red(df):
 
 def fetch_twse_quote_map():
     try:
-        rows = fetch_json(TWSE_QUOTE_URL)
+        rows = fetch_json(TWSE_QUOTE_URL, ttl=0)
         return {row.get("Code"): row for row in rows if row.get("Code")}
     except Exception as e:
         print(f"TWSE 行情資料抓取失敗: {e}")
@@ -486,7 +647,7 @@ def active_etf_side(change_type):
 
 def fetch_active_etfs():
     try:
-        page_html = fetch_text(ETFINFO_ACTIVE_URL, timeout=25)
+        page_html = fetch_text(ETFINFO_ACTIVE_URL, timeout=25, ttl=0)
         summary = extract_etfinfo_active_summary(page_html)
         etf_map = {item.get("code"): item for item in summary.get("etfs", [])}
         results = []
@@ -554,6 +715,22 @@ def fetch_active_etfs():
         print(f"主動式 ETF 重複買賣資料抓取失敗: {e}")
         return []
 
+def run_stock_strategies(df, ticker, region, fin_data, base, keys=STOCK_STRATEGY_KEYS):
+    latest = df.iloc[-1]; prev = df.iloc[-2]
+    pkg = {}
+    if 'momentum' in keys and (res := strategy_momentum(df, ticker, region, latest, prev, fin_data)): pkg['momentum'] = {**base, **res}
+    if 'day_trading' in keys and (res := strategy_day_trading(df, ticker, region, latest)): pkg['day_trading'] = {**base, **res}
+    if 'doji_rise' in keys and (res := strategy_doji_rise(df, ticker, region, latest)): pkg['doji_rise'] = {**base, **res}
+    if 'macd_turn_red' in keys and (res := strategy_macd_turn_red(df)): pkg['macd_turn_red'] = {**base, **res}
+    # Low Volatility 已移除
+    return pkg
+
+def sort_strategy_results(res):
+    if 'momentum' in res: res['momentum'].sort(key=lambda x: -x['score'])
+    if 'day_trading' in res: res['day_trading'].sort(key=lambda x: -x['rise_20d'])
+    if 'doji_rise' in res: res['doji_rise'].sort(key=lambda x: -x['score'])
+    if 'macd_turn_red' in res: res['macd_turn_red'].sort(key=lambda x: (x.get('macd_day') or 99, -(x.get('histogram') or 0)))
+
 def analyze_stock(stock_info):
     ticker = stock_info['code']
     region = stock_info['region']
@@ -561,7 +738,7 @@ def analyze_stock(stock_info):
     
     if stock is None or df is None or len(df) < 205: return None
         
-    latest = df.iloc[-1]; prev = df.iloc[-2]
+    latest = df.iloc[-1]
     real_trade_date = latest.name.strftime('%Y-%m-%d')
     window_high_short = df['Close'][-61:-1].max()
     is_60d_high = latest['Close'] > window_high_short
@@ -569,17 +746,48 @@ def analyze_stock(stock_info):
     display_name = get_stock_name(ticker, region, stock)
     
     base = {"code": ticker, "name": display_name, "region": region, "price": float(f"{latest['Close']:.2f}"), "date": real_trade_date, "fundamentals": fin_data}
-    pkg = {}; has_res = False
-    
-    if res := strategy_momentum(df, ticker, region, latest, prev, fin_data): pkg['momentum'] = {**base, **res}; has_res = True
-    if res := strategy_day_trading(df, ticker, region, latest): pkg['day_trading'] = {**base, **res}; has_res = True
-    if res := strategy_doji_rise(df, ticker, region, latest): pkg['doji_rise'] = {**base, **res}; has_res = True
-    if res := strategy_macd_turn_red(df): pkg['macd_turn_red'] = {**base, **res}; has_res = True
-    # Low Volatility 已移除
+    pkg = run_stock_strategies(df, ticker, region, fin_data, base)
         
-    return {"result": pkg if has_res else None, "is_60d_high": is_60d_high, "trade_date": real_trade_date}
+    return {"result": pkg or None, "is_60d_high": is_60d_high, "trade_date": real_trade_date}
+
+def rebuild_history_file(data_dir=DATA_DIR, data_file=DATA_FILE, shard_dir=SHARD_DIR, signal_db=SIGNAL_DB):
+    stats = publish_history(data_dir, data_file)
+    print(f"總檔更新：{stats['days']} 天，變動 {stats['changed']} 天，重新編碼 {stats['reencodedBytes'] / 1024:.1f} KB，寫入 {stats['writtenBytes'] / 1024:.1f} KB，編碼 {stats['encodeMs']:.1f} ms")
+    shards = publish_shards(data_dir, shard_dir)
+    print(f"分片更新：{shards['days']} 天，變動 {shards['changed']} 天，移除 {shards['removed']} 天，寫入 {shards['bytes'] / 1024:.1f} KB，編碼 {shards['encodeMs']:.1f} ms")
+    tickers = publish_ticker_index(data_dir, os.path.join(shard_dir, "tickers"))
+    print(f"個股訊號索引：變動 {tickers['changed']} 天，重寫 {tickers['shards']} 個分片")
+    deltas = publish_deltas(data_dir, os.path.join(shard_dir, "deltas"))
+    print(f"每日差異：重算 {deltas['written']} 天，移除 {deltas['removed']} 天")
+    try:
+        conn = open_signal_store(signal_db)
+        signal_stats = import_archive(conn, data_dir)
+        conn.close()
+        print(f"訊號資料庫更新：{signal_stats['imported']} 天")
+    except Exception as e:
+        print(f"訊號資料庫更新失敗: {e}")
+    return stats
 
 def main():
+    parser = argparse.ArgumentParser(description="全策略每日掃描")
+    parser.add_argument("--resume", action="store_true", help="沿用同一市場日期中斷前已完成的個股結果，只掃描剩下的股票。")
+    parser.add_argument("--record", metavar="PATH", help="把所有 HTTP / yfinance 回應錄進 cassette (gzip 壓縮的 JSON)。")
+    parser.add_argument("--replay", metavar="PATH", help="改用 cassette 重播回應，完全不連網 (輸出仍寫入 data/，建議搭配 --workdir)。只讀取 JSON 資料，不接受舊版 pickle 格式。")
+    parser.add_argument("--replay-latency", metavar="MS", help="重播時每個請求延遲的毫秒數；recorded 表示照錄製時的耗時。")
+    parser.add_argument("--synthetic", metavar="SEED", type=int, help="改用固定種子產生的合成行情與基本面，完全不連網；未指定 --workdir 時輸出寫到暫存目錄。")
+    parser.add_argument("--synthetic-symbols", metavar="N", type=int, default=2000, help="合成股票檔數 (預設 2000)。")
+    parser.add_argument("--synthetic-bars", metavar="N", type=int, default=600, help="每檔合成 K 棒數 (預設 600)。")
+    parser.add_argument("--workdir", metavar="DIR", help="在指定目錄下讀寫 data/、history/ 與 cache/，不動到正式資料。")
+    args = parser.parse_args()
+    start_cassette(record=args.record, replay=args.replay, latency=args.replay_latency)
+    workdir = args.workdir or (os.path.join(tempfile.gettempdir(), f"twstock-synthetic-{args.synthetic}") if args.synthetic is not None else None)
+    if workdir:
+        os.makedirs(workdir, exist_ok=True); os.chdir(workdir)
+        print(f"工作目錄：{os.getcwd()}")
+    if args.synthetic is not None:
+        install_provider(SyntheticMarket(args.synthetic, symbols=args.synthetic_symbols, bars=args.synthetic_bars, end_date=expected_market_date()))
+        print(f"使用合成行情：種子 {args.synthetic}，{args.synthetic_symbols} 檔 x {args.synthetic_bars} 根")
+
     print("啟動全策略掃描 (Clean版 + CBAS)...")
     if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
         
@@ -593,13 +801,7 @@ def main():
         except: pass
 
     # 日期檢查
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz)
-    expected_date = now.strftime('%Y-%m-%d')
-    if now.hour < 14: expected_date = (now - timedelta(days=1)).strftime('%Y-%m-%d')
-    exp_dt = datetime.strptime(expected_date, '%Y-%m-%d')
-    if exp_dt.weekday() == 6: expected_date = (exp_dt - timedelta(days=2)).strftime('%Y-%m-%d')
-    elif exp_dt.weekday() == 5: expected_date = (exp_dt - timedelta(days=1)).strftime('%Y-%m-%d')
+    expected_date = expected_market_date()
 
     stocks = get_tw_stock_list() 
     
@@ -619,24 +821,40 @@ def main():
     }
     stat_total = 0; stat_new_high = 0; detected_market_date = None
     
-    with ThreadPoolExecutor(max_workers=20) as exc:
-        futures = [exc.submit(analyze_stock, s) for s in stocks]
-        for f in as_completed(futures):
-            ret = f.result()
-            if ret:
-                if detected_market_date is None and ret.get("trade_date"): detected_market_date = ret["trade_date"]
-                stat_total += 1
-                if ret['is_60d_high']: stat_new_high += 1
-                if r := ret['result']:
-                    for k in ("momentum", "day_trading", "doji_rise", "macd_turn_red"):
-                        if k in r: res[k].append(r[k])
-
-    res['cbas'] = clean_for_json(cbas_results)
-    res['active_etf'] = clean_for_json(fetch_active_etfs())
+    # 每檔完成就寫入 journal；工作被取消後以 --resume 重跑時只補掃尚未完成的股票。
+    journal = ScanJournal(expected_date, resume=args.resume)
+    # 沒有資料或 K 棒不足的股票也會記成 None，續跑時同樣略過，不再重抓。
+    done = [journal.done[s['code']] for s in stocks if journal.done.get(s['code'])]
+    pending = [s for s in stocks if s['code'] not in journal.done]
+    if args.resume:
+        print(f"續跑 {expected_date}：已完成 {len(journal.done)} 檔 (有資料 {len(done)} 檔)，剩餘 {len(pending)} 檔")
+
+    def collect(ret):
+        nonlocal detected_market_date, stat_total, stat_new_high
+        if detected_market_date is None and ret.get("trade_date"): detected_market_date = ret["trade_date"]
+        stat_total += 1
+        if ret['is_60d_high']: stat_new_high += 1
+        if r := ret['result']:
+            for k in STOCK_STRATEGY_KEYS:
+                if k in r: res[k].append(r[k])
+
+    for ret in done:
+        collect(ret)
+    failed = []
+    with journal:
+        for s, f in fetch_map("yahoo", analyze_stock, pending):
+            try: ret = f.result()
+            except FetchFailed: failed.append(s['code']); continue
+            journal.record(s['code'], ret)
+            if ret: collect(ret)
+    if failed: print(f"下載失敗 {len(failed)} 檔，未寫入 journal，以 --resume 續跑時會重抓")
+
+    res['cbas'] = cbas_results
+    res['active_etf'] = fetch_active_etfs()
     holy_grail_date = detected_market_date if detected_market_date else expected_date
     try:
         print(f"產生台股聖杯雷達：{holy_grail_date}")
-        res['holy_grail'] = clean_for_json(generate_holy_grail_report_from_yfinance(target_date=holy_grail_date))
+        res['holy_grail'] = generate_holy_grail_report_from_yfinance(target_date=holy_grail_date)
     except Exception as e:
         print(f"台股聖杯雷達產生失敗: {e}")
         res['holy_grail'] = empty_holy_grail_report(str(e))
@@ -644,10 +862,7 @@ def main():
     if detected_market_date and detected_market_date != expected_date:
         print(f"[警告] 日期不符 ({detected_market_date} vs {expected_date})")
 
-    res['momentum'].sort(key=lambda x: -x['score'])
-    res['day_trading'].sort(key=lambda x: -x['rise_20d'])
-    res['doji_rise'].sort(key=lambda x: -x['score'])
-    res['macd_turn_red'].sort(key=lambda x: (x.get('macd_day') or 99, -(x.get('histogram') or 0)))
+    sort_strategy_results(res)
     
     market_breadth = 0
     if stat_total > 0: market_breadth = round((stat_new_high / stat_total) * 100, 2)
@@ -657,11 +872,11 @@ def main():
 
     try:
         print(f"產生 Druckenmiller 風格雷達：{final_date}")
-        res['druckenmiller'] = clean_for_json(generate_druckenmiller_report(
+        res['druckenmiller'] = generate_druckenmiller_report(
             res,
             market_breadth=market_breadth,
             target_date=final_date,
-        ))
+        )
     except Exception as e:
         print(f"Druckenmiller 風格雷達產生失敗: {e}")
         res['druckenmiller'] = {
@@ -675,32 +890,28 @@ def main():
 
     try:
         print(f"產生關鍵分點：{final_date}")
-        res['key_branches'] = clean_for_json(generate_key_branch_report(
+        res['key_branches'] = generate_key_branch_report(
             res,
             final_date,
             token=os.getenv("FINMIND_TOKEN"),
-        ))
+        )
     except Exception as e:
         print(f"關鍵分點產生失敗: {e}")
         res['key_branches'] = empty_key_branch_report(str(e))
         res['key_branches']["date"] = final_date
     
-    daily_record = clean_for_json({"date": final_date, "market_breadth": market_breadth, "strategies": res})
-    with open(os.path.join(DATA_DIR, f"{final_date}.json"), 'w', encoding='utf-8') as f:
-        json.dump(daily_record, f, ensure_ascii=False, indent=2)
+    run_metrics = {"scanned": stat_total, "yfinance": get_limiter().snapshot()}
+    daily_record = {"date": final_date, "market_breadth": market_breadth, "strategies": res, "run_metrics": run_metrics}
+    write_json(os.path.join(DATA_DIR, f"{final_date}.json"), daily_record)
     
-    all_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.json")))
-    final_history = []
-    for file_path in all_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                d = datetime.strptime(data['date'], '%Y-%m-%d')
-                if d.weekday() < 5: final_history.append(data)
-        except: pass
-            
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(clean_for_json(final_history), f, ensure_ascii=False, indent=2)
+    # 有下載失敗時保留 journal，續跑才知道哪些已完成。
+    if not failed: journal.finish()
+    rebuild_history_file()
+    get_client().prune_cache()
+    print(format_http_stats())
+    print(format_limiter_stats())
+    print(format_engine_stats())
+    if cassette_stats := format_cassette_stats(): print(cassette_stats)
     print(f"總檔更新完成。日期: {final_date} / 新高佔比: {market_breadth}%")
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+import twstock
+
+
+# 可替換的行情來源：預設為 None，代表走 yfinance、真實的 HTTP 端點與 twstock 代碼表。
+# 安裝後，yf_history / yf_attr / http_get 與股票清單都改由 provider 回答。
+_provider = None
+
+
+def install_provider(provider):
+    global _provider
+    _provider = provider
+    return provider
+
+
+def get_provider():
+    return _provider
+
+
+def code_tables():
+    # provider 提供與 twstock 相同的 codes / twse / tpex 代碼表。
+    return _provider or twstock
@@ -0,0 +1,188 @@
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from cassette import clock_time
+from fetch_engine import fetch_map
+from yf_limiter import yf_history
+
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+ADJ_COLUMN = "Adj Close"
+# 策略用原始價格；回測的報酬與回撤改用含息的 Adj Close，所以一併存下來。
+STORE_COLUMNS = PRICE_COLUMNS + [ADJ_COLUMN]
+# 各市場收盤後多久視為當天 K 棒定案：台股 13:30 收盤，與 main.expected_market_date 一樣取 14:00。
+SESSION_CLOSE = {
+    "tw": (timezone(timedelta(hours=8)), 14, 0),
+    "us": (ZoneInfo("America/New_York"), 16, 30),
+}
+
+
+def market_of(symbol):
+    return "tw" if symbol.endswith((".TW", ".TWO")) or symbol in ("^TWII", "^TWOII") else "us"
+
+
+def expected_session(symbol, now):
+    # 以該市場當地時間推算最近一個已收盤的交易日 (週末往前推；國定假日當天本來就沒有 K 棒)。
+    tz, hour, minute = SESSION_CLOSE[market_of(symbol)]
+    local = datetime.fromtimestamp(now, tz)
+    day = local.date() if (local.hour, local.minute) >= (hour, minute) else local.date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.strftime("%Y-%m-%d")
+
+
+def normalize_history(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    df = df[[column for column in STORE_COLUMNS if column in df.columns]].copy()
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.normalize()
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df.dropna(subset=["Close"])
+
+
+def fetch_panel_history(symbol, start_dt, end_dt):
+    try:
+        df = yf_history(yf.Ticker(symbol), start=start_dt, end=end_dt, auto_adjust=False)
+    except Exception:
+        return None
+    df = normalize_history(df)
+    return df if not df.empty else None
+
+
+def adjustment_ratio(df):
+    # Adj Close / Close：除權息前的日子小於 1；舊資料沒有 Adj Close 時視為不調整。
+    close = df["Close"].astype(float)
+    if ADJ_COLUMN not in df.columns or df[ADJ_COLUMN].isna().all():
+        return pd.Series(1.0, index=df.index)
+    return (df[ADJ_COLUMN].astype(float) / close).bfill().ffill()
+
+
+def adjusted_close(df):
+    return df["Close"].astype(float) * adjustment_ratio(df)
+
+
+def adjusted_low(df):
+    return df["Low"].astype(float) * adjustment_ratio(df)
+
+
+def rebased(old, new):
+    # 除權息或分割後 yfinance 會回頭改寫整段 Adj Close (分割連 Close 也改)；重疊區間對不上時整檔重抓。
+    common = old.index.intersection(new.index)
+    if common.empty:
+        return False
+    for column in ("Close", ADJ_COLUMN):
+        if column not in new.columns:
+            continue
+        if column not in old.columns:
+            return True
+        before = old.loc[common, column].astype(float).to_numpy()
+        after = new.loc[common, column].astype(float).to_numpy()
+        if not np.allclose(before, after, rtol=1e-4):
+            return True
+    return False
+
+
+def load_price_panel(symbols, start_dt, end_dt):
+    symbols = list(dict.fromkeys(symbols))
+    panel = {}
+    print(f"載入歷史資料：{len(symbols)} 檔 ({start_dt:%Y-%m-%d} ~ {end_dt:%Y-%m-%d})")
+    completed = fetch_map("yahoo", lambda symbol: fetch_panel_history(symbol, start_dt, end_dt), symbols)
+    for index, (symbol, future) in enumerate(completed, 1):
+        df = future.result()
+        if df is not None:
+            panel[symbol] = df
+        if index % 200 == 0:
+            print(f"   {index}/{len(symbols)}...")
+    print(f"歷史資料載入完成：{len(panel)}/{len(symbols)} 檔")
+    return panel
+
+
+def slice_as_of(df, target_date, lookback_days=None):
+    end = pd.Timestamp(target_date)
+    stop = df.index.searchsorted(end, side="right")
+    start = 0
+    if lookback_days:
+        start = df.index.searchsorted(end - pd.Timedelta(days=lookback_days), side="left")
+    return df.iloc[start:stop]
+
+
+def traded_on(df, target_date):
+    return len(df) > 0 and df.index[-1] == pd.Timestamp(target_date)
+
+
+def panel_to_frame(panel):
+    frames = []
+    for symbol, df in panel.items():
+        if df is None or df.empty:
+            continue
+        frame = df[[column for column in STORE_COLUMNS if column in df.columns]].copy()
+        frame.index.name = "date"
+        frame = frame.reset_index()
+        frame.insert(0, "symbol", symbol)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "date"] + PRICE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def frame_to_panel(frame):
+    panel = {}
+    for symbol, group in frame.groupby("symbol", sort=False):
+        panel[symbol] = group.drop(columns="symbol").set_index("date").sort_index()
+    return panel
+
+
+def save_panel(panel, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    panel_to_frame(panel).to_pickle(path)
+
+
+def load_panel(path):
+    if not os.path.exists(path):
+        return {}
+    return frame_to_panel(pd.read_pickle(path))
+
+
+def settled_panel(panel, now):
+    return {symbol: df.loc[:expected_session(symbol, now)] for symbol, df in panel.items()}
+
+
+def update_panel_store(path, symbols, start_dt, end_dt, overlap_days=7, now=None):
+    now = now or clock_time()
+    panel = load_panel(path)
+    end = pd.Timestamp(end_dt).normalize()
+    missing = []
+    stale = {}
+    for symbol in dict.fromkeys(symbols):
+        df = panel.get(symbol)
+        if df is None or df.empty:
+            missing.append(symbol)
+        elif df.index[-1] < end - pd.Timedelta(days=1):
+            stale.setdefault(df.index[-1] - pd.Timedelta(days=overlap_days), []).append(symbol)
+
+    fetched = load_price_panel(missing, start_dt, end_dt) if missing else {}
+    panel.update(fetched)
+    rebase = []
+    for since, group in stale.items():
+        for symbol, df in load_price_panel(group, since.to_pydatetime(), end_dt).items():
+            if rebased(panel[symbol], df):
+                rebase.append(symbol)
+                continue
+            merged = pd.concat([panel[symbol], df])
+            panel[symbol] = merged[~merged.index.duplicated(keep="last")].sort_index()
+    if rebase:
+        print(f"除權息/分割後重抓完整歷史：{len(rebase)} 檔")
+        panel.update(load_price_panel(rebase, start_dt, end_dt))
+
+    # 盤中抓到的當日 K 棒還會變，只留在這次回傳的 panel；存檔只到最近已收盤的交易日，下次會重抓。
+    if fetched or stale:
+        save_panel(settled_panel(panel, now), path)
+    return panel
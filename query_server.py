@@ -0,0 +1,249 @@
+import argparse
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from history_store import DATA_DIR, day_sources, day_summary
+from json_output import encode_json
+from signals import base_code, extract_signals
+from ticker_index import compact_score
+
+
+DEFAULT_PORT = 8765
+REFRESH_SECONDS = 60
+GZIP_MIN_BYTES = 1024
+MAX_PAYLOADS = 512
+
+
+class Payload:
+    def __init__(self, body):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self._gzip = None
+
+    def gzipped(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzip
+
+
+class ArchiveIndex:
+    def __init__(self, data_dir=DATA_DIR, refresh_seconds=REFRESH_SECONDS, max_payloads=MAX_PAYLOADS):
+        self.data_dir = data_dir
+        self.refresh_seconds = refresh_seconds
+        self.max_payloads = max_payloads
+        self.lock = threading.Lock()
+        self.payload_lock = threading.Lock()
+        self.signature = None
+        self.checked_at = 0
+        self.load()
+
+    def source_signature(self):
+        return tuple((date_text, source.path, source.line, source.size, source.mtime) for date_text, source in day_sources(self.data_dir).items())
+
+    def load(self, signature=None):
+        signature = signature or self.source_signature()
+        records = {}
+        timelines = {}
+        for date_text, source in day_sources(self.data_dir).items():
+            try:
+                record = source.read_record()
+            except (OSError, ValueError):
+                continue
+            record = {**record, "date": record.get("date") or date_text}
+            records[date_text] = record
+            for signal in extract_signals(record):
+                timelines.setdefault(signal["code"], []).append([date_text, signal["strategy"], compact_score(signal["score"]), signal["bucket"], signal["price"]])
+        self.records = records
+        self.dates = sorted(records)
+        self.timelines = timelines
+        self.payloads = OrderedDict()
+        self.signature = signature
+        self.checked_at = time.monotonic()
+
+    def refresh(self):
+        if time.monotonic() - self.checked_at < self.refresh_seconds:
+            return
+        with self.lock:
+            if time.monotonic() - self.checked_at < self.refresh_seconds:
+                return
+            signature = self.source_signature()
+            if signature != self.signature:
+                self.load(signature)
+            else:
+                self.checked_at = time.monotonic()
+
+    def payload(self, key, build):
+        # 同一份資料只編碼一次；存檔有變動時 load() 會清掉整個快取。
+        # key 含有用戶端給的 start / end / strategy，以 LRU 限制筆數，避免記憶體無限成長。
+        payloads = self.payloads
+        with self.payload_lock:
+            cached = payloads.get(key)
+            if cached is not None:
+                payloads.move_to_end(key)
+                return cached
+        data = build()
+        if data is None:
+            return None
+        cached = Payload(encode_json(data, indent=False))
+        with self.payload_lock:
+            payloads[key] = cached
+            payloads.move_to_end(key)
+            while len(payloads) > self.max_payloads:
+                payloads.popitem(last=False)
+        return cached
+
+    def resolve_date(self, date_text):
+        if date_text == "latest":
+            return self.dates[-1] if self.dates else None
+        return date_text if date_text in self.records else None
+
+    def days(self):
+        return [{"date": date_text, **day_summary(self.records[date_text])} for date_text in self.dates]
+
+    def day(self, date_text):
+        date_text = self.resolve_date(date_text)
+        return self.records[date_text] if date_text else None
+
+    def strategy(self, date_text, name):
+        record = self.day(date_text)
+        strategies = (record or {}).get("strategies") or {}
+        if name not in strategies:
+            return None
+        return {"date": record["date"], "strategy": name, "data": strategies[name]}
+
+    def stock(self, code, start=None, end=None, strategies=None):
+        code = base_code(code)
+        rows = [
+            row for row in self.timelines.get(code, [])
+            if (not start or row[0] >= start) and (not end or row[0] <= end) and (not strategies or row[1] in strategies)
+        ]
+        if not rows and code not in self.timelines:
+            return None
+        return {"code": code, "columns": ["date", "strategy", "score", "bucket", "price"], "rows": rows}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "TWStockQuery/1.0"
+    index = None
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def route(self):
+        parts = urlsplit(self.path)
+        segments = [unquote(part) for part in parts.path.strip("/").split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        index = self.index
+        if segments[:1] != ["api"]:
+            return None, None
+        segments = segments[1:]
+        if segments == ["days"]:
+            return ("days",), index.days
+        if segments == ["latest"]:
+            date_text = index.resolve_date("latest")
+            return ("day", date_text), lambda: index.day(date_text)
+        if len(segments) == 2 and segments[0] == "day":
+            date_text = index.resolve_date(segments[1])
+            return ("day", date_text), lambda: index.day(date_text)
+        if len(segments) == 3 and segments[0] == "day":
+            date_text = index.resolve_date(segments[1])
+            return ("strategy", date_text, segments[2]), lambda: index.strategy(date_text, segments[2])
+        if len(segments) == 2 and segments[0] == "stock":
+            strategies = tuple(sorted(query["strategy"].split(","))) if query.get("strategy") else None
+            key = ("stock", base_code(segments[1]), query.get("start"), query.get("end"), strategies)
+            return key, lambda: index.stock(segments[1], query.get("start"), query.get("end"), strategies)
+        return None, None
+
+    def send_payload(self, payload, head_only=False):
+        use_gzip = len(payload.body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", "")
+        # 強 ETag 要區分壓縮與否，兩種表示法的位元組不同。
+        etag = f'{payload.etag[:-1]}-gz"' if use_gzip else payload.etag
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        body = payload.gzipped() if use_gzip else payload.body
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        body = encode_json({"error": message}, indent=False)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self, head_only=False):
+        self.index.refresh()
+        key, build = self.route()
+        if key is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "未知的路徑")
+            return
+        payload = self.index.payload(key, build)
+        if payload is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "查無資料")
+            return
+        self.send_payload(payload, head_only)
+
+    def do_HEAD(self):
+        self.do_GET(head_only=True)
+
+    def do_POST(self):
+        self.send_error_json(HTTPStatus.METHOD_NOT_ALLOWED, "唯讀服務")
+
+    do_PUT = do_DELETE = do_PATCH = do_POST
+
+
+def make_server(index, host="127.0.0.1", port=DEFAULT_PORT, verbose=False):
+    handler = type("BoundQueryHandler", (QueryHandler,), {"index": index})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機唯讀查詢服務：每日存檔、策略切片、個股時間軸")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--refresh", type=float, default=REFRESH_SECONDS, help="檢查存檔是否變動的間隔秒數。")
+    parser.add_argument("--verbose", action="store_true", help="印出每筆請求。")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = ArchiveIndex(args.data_dir, args.refresh)
+    print(f"載入 {len(index.dates)} 天、{len(index.timelines)} 檔股票，耗時 {time.perf_counter() - started:.2f} 秒")
+    server = make_server(index, args.host, args.port, args.verbose)
+    print(f"查詢服務啟動：http://{args.host}:{server.server_address[1]}/api/latest")
+    print("端點：/api/days、/api/latest、/api/day/<日期|latest>、/api/day/<日期>/<策略>、/api/stock/<代號>?start=&end=&strategy=")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
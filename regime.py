@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from druckenmiller import market_regime
+from index_cache import first_available_series
+from json_output import write_json
+from main import get_tw_stock_list
+from price_panel import update_panel_store
+
+
+REGIME_FILE = "regime.json"
+PRICE_STORE = os.path.join("cache", "prices.pkl.gz")
+INDEX_SYMBOLS = ("^TWII", "0050.TW")
+BREADTH_WINDOW = 60
+MIN_HISTORY = 205
+HISTORY_DAYS = 900
+
+
+def index_regime_frame(index_bars):
+    frame = pd.DataFrame(index_bars)
+    if frame.empty:
+        return pd.DataFrame(columns=["close", "ma20", "ma60", "ma120", "state"])
+    frame = frame.dropna(subset=["close"])
+    frame.index = pd.to_datetime(frame["date"])
+    close = frame["close"].astype(float)
+    volume = pd.to_numeric(frame["volume"], errors="coerce").fillna(0).astype(float)
+    ma20 = close.rolling(20).mean()
+    ma60 = close.rolling(60).mean()
+    ma120 = close.rolling(120).mean()
+    volume_ma5 = volume.rolling(5).mean()
+    volume_ma20 = volume.rolling(20).mean()
+
+    # 與 holy_grail.get_market_regime 同一套判斷順序，只是一次算完整段歷史。
+    state = np.select(
+        [
+            ma120.isna().to_numpy(),
+            (close < ma120).to_numpy(),
+            ((close < ma60) | (ma20 < ma60)).to_numpy(),
+            ((close > ma60) & (ma20 > ma60) & (volume_ma5 >= volume_ma20 * 0.9)).to_numpy(),
+        ],
+        ["Unknown", "Bear", "RiskOff", "Bull"],
+        default="Caution",
+    )
+    return pd.DataFrame({"close": close, "ma20": ma20, "ma60": ma60, "ma120": ma120, "state": state}, index=frame.index)
+
+
+def breadth_frame(panel, window=BREADTH_WINDOW, min_history=MIN_HISTORY):
+    totals = []
+    highs = []
+    for df in panel.values():
+        if df is None or df.empty:
+            continue
+        close = df["Close"].astype(float)
+        eligible = pd.Series(np.arange(1, len(close) + 1) >= min_history, index=close.index)
+        prior_high = close.shift(1).rolling(window, min_periods=1).max()
+        totals.append(eligible)
+        highs.append(eligible & (close > prior_high))
+    if not totals:
+        return pd.DataFrame(columns=["total", "new_high", "breadth"])
+    total = pd.concat(totals, axis=1).fillna(False).sum(axis=1)
+    new_high = pd.concat(highs, axis=1).fillna(False).sum(axis=1)
+    frame = pd.DataFrame({"total": total, "new_high": new_high}).sort_index()
+    frame = frame[frame["total"] > 0]
+    frame["breadth"] = (frame["new_high"] / frame["total"] * 100).round(2)
+    return frame
+
+
+def build_regime_timeline(index_bars, panel, start=None, end=None, index_symbol=None):
+    index_frame = index_regime_frame(index_bars)
+    breadth = breadth_frame(panel)
+    dates = index_frame.index.union(breadth.index)
+    if start:
+        dates = dates[dates >= pd.Timestamp(start)]
+    if end:
+        dates = dates[dates <= pd.Timestamp(end)]
+    dates = dates[dates.weekday < 5]
+
+    index_frame = index_frame.reindex(dates)
+    breadth = breadth.reindex(dates)
+    breadth_values = [None if pd.isna(value) else float(value) for value in breadth["breadth"]]
+    breadth_states = {value: market_regime(value)["state"] for value in set(breadth_values) if value is not None}
+    return {
+        "generatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "indexSymbol": index_symbol,
+        "breadthWindow": BREADTH_WINDOW,
+        "dates": [date.strftime("%Y-%m-%d") for date in dates],
+        "indexClose": [None if pd.isna(value) else round(float(value), 2) for value in index_frame["close"]],
+        "indexState": [state if isinstance(state, str) else "Unknown" for state in index_frame["state"]],
+        "breadth": breadth_values,
+        "breadthState": [breadth_states.get(value) for value in breadth_values],
+        "universe": [None if pd.isna(value) else int(value) for value in breadth["total"]],
+    }
+
+
+def timeline_frame(timeline):
+    columns = ["indexClose", "indexState", "breadth", "breadthState", "universe"]
+    frame = pd.DataFrame({column: timeline.get(column, []) for column in columns}, index=pd.to_datetime(timeline.get("dates", [])))
+    frame.index.name = "date"
+    return frame
+
+
+def regime_on(timeline, target_date):
+    dates = timeline.get("dates", [])
+    if target_date not in dates:
+        return None
+    index = dates.index(target_date)
+    return {
+        "date": target_date,
+        "indexState": timeline["indexState"][index],
+        "breadth": timeline["breadth"][index],
+        "breadthState": timeline["breadthState"][index],
+    }
+
+
+def save_timeline(timeline, path=REGIME_FILE):
+    return write_json(path, timeline)
+
+
+def load_timeline(path=REGIME_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="計算每個交易日的大盤狀態與 60 日新高廣度")
+    parser.add_argument("--start", help="起始日期 YYYY-MM-DD；空白時輸出全部可算日期。")
+    parser.add_argument("--end", help="結束日期 YYYY-MM-DD。")
+    parser.add_argument("--prices", default=PRICE_STORE, help="本地價格資料檔路徑。")
+    parser.add_argument("--output", default=REGIME_FILE, help="輸出檔案路徑。")
+    args = parser.parse_args()
+
+    end_dt = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1) if args.end else datetime.now() + timedelta(days=1)
+    first_dt = datetime.strptime(args.start, "%Y-%m-%d") if args.start else end_dt - timedelta(days=365)
+    start_dt = first_dt - timedelta(days=HISTORY_DAYS)
+
+    series = first_available_series(INDEX_SYMBOLS, start_dt, end_dt)
+    index_bars = series.bars if series else []
+    universe = [stock["code"] for stock in get_tw_stock_list()]
+    panel = update_panel_store(args.prices, universe, start_dt, end_dt)
+
+    timeline = build_regime_timeline(index_bars, panel, start=first_dt.strftime("%Y-%m-%d"), end=args.end, index_symbol=series.symbol if series else None)
+    save_timeline(timeline, args.output)
+    print(f"大盤狀態時間序列：{len(timeline['dates'])} 天 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import bisect
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from backfill import strategy_granville_vcp
+from history_store import read_day, stored_dates
+from holy_grail import (
+    US_INDUSTRY_ETFS,
+    build_us_industry_rows,
+    dataframe_to_bars,
+    generate_holy_grail_report_from_bars,
+    get_taiwan_stock_universe,
+)
+from json_output import write_json
+from main import (
+    DATA_DIR,
+    STOCK_STRATEGY_KEYS,
+    build_cbas_row,
+    cbas_breakout_signal,
+    empty_financial_details,
+    fetch_active_cbs,
+    fetch_cb_quote_history,
+    get_stock_name,
+    get_tw_stock_list,
+    get_tw_ticker_candidates,
+    rebuild_history_file,
+    run_stock_strategies,
+    sort_strategy_results,
+)
+from price_panel import load_price_panel, slice_as_of, traded_on
+
+
+REPLAY_STRATEGIES = STOCK_STRATEGY_KEYS + ("cbas", "holy_grail", "low_volatility")
+STOCK_LOOKBACK_DAYS = 730
+LOW_VOLATILITY_LOOKBACK_DAYS = 365
+HOLY_GRAIL_LOOKBACK_DAYS = 520
+TW_MARKET_SYMBOLS = ("^TWII", "0050.TW")
+US_MARKET_SYMBOLS = ("SPY", "^GSPC")
+
+
+@dataclass
+class ReplayContext:
+    panel: dict
+    universe: list = field(default_factory=list)
+    holy_grail_universe: list = field(default_factory=list)
+    cb_list: list = field(default_factory=list)
+    cb_quotes: dict = field(default_factory=dict)
+    bars: dict = field(default_factory=dict)
+
+
+def required_symbols(strategies, universe, holy_grail_universe, cb_list):
+    symbols = []
+    if set(strategies) & set(STOCK_STRATEGY_KEYS + ("low_volatility",)):
+        symbols.extend(stock["code"] for stock in universe)
+    if "low_volatility" in strategies:
+        symbols.append("0050.TW")
+    if "cbas" in strategies:
+        for stock_id in sorted({cb["stock_id"] for cb in cb_list}):
+            symbols.extend(get_tw_ticker_candidates(stock_id))
+    if "holy_grail" in strategies:
+        symbols.extend(TW_MARKET_SYMBOLS)
+        symbols.extend(US_MARKET_SYMBOLS)
+        symbols.extend(spec["symbol"] for spec in US_INDUSTRY_ETFS)
+        symbols.extend(stock["code"] for stock in holy_grail_universe)
+    return symbols
+
+
+def build_replay_context(strategies, dates, max_per_industry=8):
+    universe = get_tw_stock_list()
+    holy_grail_universe = get_taiwan_stock_universe(max_per_industry=max_per_industry) if "holy_grail" in strategies else []
+    cb_list = fetch_active_cbs() if "cbas" in strategies else []
+    start_dt = datetime.strptime(dates[0], "%Y-%m-%d") - timedelta(days=STOCK_LOOKBACK_DAYS + 10)
+    end_dt = datetime.strptime(dates[-1], "%Y-%m-%d") + timedelta(days=1)
+    symbols = required_symbols(strategies, universe, holy_grail_universe, cb_list)
+    panel = load_price_panel(symbols, start_dt, end_dt)
+    return ReplayContext(panel=panel, universe=universe, holy_grail_universe=holy_grail_universe, cb_list=cb_list)
+
+
+def market_return_20d(context, target_date, symbol="0050.TW"):
+    df = context.panel.get(symbol)
+    if df is None:
+        return None
+    window = slice_as_of(df, target_date)
+    if not traded_on(window, target_date) or len(window) <= 20:
+        return None
+    latest = float(window["Close"].iloc[-1])
+    past_20 = float(window["Close"].iloc[-21])
+    return (latest - past_20) / past_20 if past_20 else None
+
+
+def replay_stock_lists(context, target_date, keys):
+    stock_keys = tuple(key for key in keys if key in STOCK_STRATEGY_KEYS)
+    results = {key: [] for key in keys if key in STOCK_STRATEGY_KEYS or key == "low_volatility"}
+    market_ret = market_return_20d(context, target_date) if "low_volatility" in results else None
+
+    for stock in context.universe:
+        ticker = stock["code"]; region = stock["region"]
+        df = context.panel.get(ticker)
+        if df is None:
+            continue
+        window = slice_as_of(df, target_date, STOCK_LOOKBACK_DAYS)
+        if len(window) < 205 or not traded_on(window, target_date):
+            continue
+        latest = window.iloc[-1]
+        base = {"code": ticker, "name": get_stock_name(ticker, region), "region": region, "price": float(f"{latest['Close']:.2f}"), "date": target_date}
+        if stock_keys:
+            pkg = run_stock_strategies(window, ticker, region, empty_financial_details(), {**base, "fundamentals": empty_financial_details()}, keys=stock_keys)
+            for key, item in pkg.items():
+                results[key].append(item)
+        if "low_volatility" in results:
+            low_vol_window = slice_as_of(window, target_date, LOW_VOLATILITY_LOOKBACK_DAYS)
+            if res := strategy_granville_vcp(low_vol_window, market_ret):
+                results["low_volatility"].append({"code": ticker, "name": base["name"], "region": region, "price": base["price"], **res})
+
+    sort_strategy_results(results)
+    if "low_volatility" in results:
+        results["low_volatility"].sort(key=lambda item: -item.get("score_val", 0))
+    return results
+
+
+def quote_as_of(context, cb_id, target_date):
+    if cb_id not in context.cb_quotes:
+        context.cb_quotes[cb_id] = fetch_cb_quote_history(cb_id)
+    quote = None
+    for row in context.cb_quotes[cb_id]:
+        if row.get("trade_date") and row["trade_date"] <= target_date:
+            quote = row
+    return quote
+
+
+def replay_cbas(context, target_date):
+    stock_signals = {}
+    for stock_id in sorted({cb["stock_id"] for cb in context.cb_list}):
+        for symbol in get_tw_ticker_candidates(stock_id):
+            df = context.panel.get(symbol)
+            if df is None:
+                continue
+            window = slice_as_of(df, target_date, STOCK_LOOKBACK_DAYS)
+            if len(window) <= 30:
+                continue
+            if traded_on(window, target_date) and (sig := cbas_breakout_signal(window, symbol)):
+                stock_signals[stock_id] = sig
+            break
+
+    results = []
+    for cb in context.cb_list:
+        sig = stock_signals.get(cb["stock_id"])
+        if not sig:
+            continue
+        quote = quote_as_of(context, cb["cb_id"], target_date)
+        if not quote:
+            continue
+        if row := build_cbas_row(sig, cb, quote):
+            results.append(row)
+    results.sort(key=lambda item: item["double_low"])
+    return results
+
+
+def bars_for(context, symbol):
+    if symbol not in context.bars:
+        df = context.panel.get(symbol)
+        bars = dataframe_to_bars(df) if df is not None else []
+        context.bars[symbol] = ([bar["date"] for bar in bars], bars)
+    return context.bars[symbol]
+
+
+def bars_as_of(context, symbol, target_date, lookback_days=HOLY_GRAIL_LOOKBACK_DAYS):
+    dates, bars = bars_for(context, symbol)
+    start_date = (datetime.strptime(target_date, "%Y-%m-%d") - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    return bars[bisect.bisect_left(dates, start_date):bisect.bisect_right(dates, target_date)]
+
+
+def first_available_bars(context, symbols, target_date):
+    for symbol in symbols:
+        bars = bars_as_of(context, symbol, target_date)
+        if bars:
+            return bars
+    return []
+
+
+def replay_holy_grail(context, target_date):
+    market_bars = first_available_bars(context, TW_MARKET_SYMBOLS, target_date)
+    loaded_stocks = []
+    for stock in context.holy_grail_universe:
+        bars = bars_as_of(context, stock["code"], target_date)
+        if len(bars) >= 120:
+            loaded_stocks.append({**stock, "bars": bars})
+    us_market_bars = first_available_bars(context, US_MARKET_SYMBOLS, target_date)
+    us_bars = {spec["symbol"]: bars_as_of(context, spec["symbol"], target_date) for spec in US_INDUSTRY_ETFS}
+    us_industries = build_us_industry_rows(us_bars, us_market_bars)
+    return generate_holy_grail_report_from_bars(
+        market_bars,
+        loaded_stocks,
+        us_industries,
+        target_date,
+        data_source="twstock universe + yfinance history (point-in-time replay)",
+    )
+
+
+def replay_date(context, target_date, strategies):
+    results = {}
+    if set(strategies) & set(STOCK_STRATEGY_KEYS + ("low_volatility",)):
+        results.update(replay_stock_lists(context, target_date, strategies))
+    if "cbas" in strategies:
+        results["cbas"] = replay_cbas(context, target_date)
+    if "holy_grail" in strategies:
+        results["holy_grail"] = replay_holy_grail(context, target_date)
+    return results
+
+
+def merge_into_record(record, results):
+    record.setdefault("strategies", {}).update(results)
+    return record
+
+
+def replay_range(strategies, start=None, end=None, data_dir=DATA_DIR, max_per_industry=8, context=None):
+    dates = stored_dates(data_dir, start, end)
+    if not dates:
+        print("指定區間沒有已存檔的交易日。")
+        return []
+    context = context or build_replay_context(strategies, dates, max_per_industry=max_per_industry)
+
+    for target_date in dates:
+        results = replay_date(context, target_date, strategies)
+        record = read_day(target_date, data_dir)
+        merge_into_record(record, results)
+        write_json(os.path.join(data_dir, f"{target_date}.json"), record, report=False)
+        counts = {key: summary_count(value) for key, value in results.items()}
+        print(f"📅 {target_date} 完成：{counts}")
+    return dates
+
+
+def summary_count(value):
+    if isinstance(value, dict):
+        return sum(len(rows) for rows in (value.get("candidates") or {}).values())
+    return len(value)
+
+
+def parse_strategies(values):
+    if not values or "all" in values:
+        return REPLAY_STRATEGIES
+    unknown = [value for value in values if value not in REPLAY_STRATEGIES]
+    if unknown:
+        raise SystemExit(f"未知策略：{', '.join(unknown)}；可用：{', '.join(REPLAY_STRATEGIES)}")
+    return tuple(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以時間點一致的方式重算歷史交易日的策略清單，並合併回 data/YYYY-MM-DD.json")
+    parser.add_argument("--strategy", nargs="+", default=["all"], help=f"要重算的策略，可多選：{', '.join(REPLAY_STRATEGIES)} 或 all。")
+    parser.add_argument("--start", help="起始日期 YYYY-MM-DD（含）。未指定時從最早的存檔開始。")
+    parser.add_argument("--end", help="結束日期 YYYY-MM-DD（含）。未指定時到最新的存檔為止。")
+    parser.add_argument("--max-per-industry", type=int, default=8, help="台股聖杯每個細分類最多抓取幾檔。")
+    args = parser.parse_args()
+
+    strategies = parse_strategies(args.strategy)
+    print(f"🐢 啟動歷史重算：{', '.join(strategies)}")
+    dates = replay_range(strategies, args.start, args.end, max_per_industry=args.max_per_industry)
+    if dates:
+        rebuild_history_file()
+        print(f"🎉 完成 {len(dates)} 個交易日 ({dates[0]} ~ {dates[-1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,37 @@
 import argparse
-import json
 from pathlib import Path
 
+from history_store import latest_date, read_day
 from holy_grail import generate_holy_grail_report_from_yfinance
-from main import DATA_DIR, DATA_FILE, clean_for_json
+from json_output import write_json
+from main import DATA_DIR, rebuild_history_file
 
 
-def load_json(path, default):
-    if not path.exists():
-        return default
-    with path.open("r", encoding="utf-8") as file:
-        return json.load(file)
-
-
-def write_json(path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as file:
-        json.dump(clean_for_json(data), file, ensure_ascii=False, indent=2)
-
-
-def find_or_create_record(history, target_date):
-    for record in history:
-        if record.get("date") == target_date:
-            return record
-    record = {"date": target_date, "market_breadth": None, "strategies": {}}
-    history.append(record)
-    history.sort(key=lambda item: item.get("date", ""))
-    return record
+def find_or_create_record(data_dir, target_date):
+    daily_path = Path(data_dir) / f"{target_date}.json"
+    return daily_path, read_day(target_date, data_dir, {"date": target_date, "market_breadth": None, "strategies": {}})
 
 
 def main():
     parser = argparse.ArgumentParser(description="重新產生台股聖杯雷達與美股產業對應資料")
-    parser.add_argument("--date", help="指定資料日期，格式 YYYY-MM-DD。未指定時使用 data.json 最新日期。")
+    parser.add_argument("--date", help="指定資料日期，格式 YYYY-MM-DD。未指定時使用最新一天的存檔。")
     parser.add_argument("--max-per-industry", type=int, default=8, help="每個細分類最多抓取幾檔台股。")
     args = parser.parse_args()
 
-    history_path = Path(DATA_FILE)
-    history = load_json(history_path, [])
-    if not history and not args.date:
-        raise SystemExit("data.json 沒有資料，請指定 --date 或先執行 main.py。")
+    target_date = args.date or latest_date(DATA_DIR)
+    if not target_date:
+        raise SystemExit("data 目錄沒有資料，請指定 --date 或先執行 main.py。")
 
-    target_date = args.date or history[-1]["date"]
     print(f"重新產生台股聖杯雷達：{target_date}")
-    report = clean_for_json(generate_holy_grail_report_from_yfinance(
+    report = generate_holy_grail_report_from_yfinance(
         target_date=target_date,
         max_per_industry=args.max_per_industry,
-    ))
-
-    record = find_or_create_record(history, target_date)
-    record.setdefault("strategies", {})["holy_grail"] = report
-    write_json(history_path, history)
+    )
 
-    daily_path = Path(DATA_DIR) / f"{target_date}.json"
-    daily = load_json(daily_path, {"date": target_date, "market_breadth": record.get("market_breadth"), "strategies": {}})
+    daily_path, daily = find_or_create_record(DATA_DIR, target_date)
     daily.setdefault("strategies", {})["holy_grail"] = report
-    write_json(daily_path, daily)
+    write_json(str(daily_path), daily)
+    rebuild_history_file()
 
     counts = {key: len(value) for key, value in report.get("candidates", {}).items()}
     print(f"完成：market={report.get('market', {}).get('state')} candidates={counts} usMatches={len(report.get('usTaiwanMatches', []))}")
@@ -0,0 +1,70 @@
+import glob
+import json
+import os
+
+from json_output import encode_json
+
+
+JOURNAL_DIR = os.path.join("cache", "scan_journal")
+
+
+def journal_path(run_date, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, f"{run_date}.jsonl")
+
+
+def read_journal(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb") as file:
+        for line in file:
+            # 被中斷時最後一行可能只寫了一半，直接略過。
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("code"):
+                done[entry["code"]] = entry.get("result")
+    return done
+
+
+def trim_partial_line(path):
+    with open(path, "r+b") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+class ScanJournal:
+    def __init__(self, run_date, resume=False, journal_dir=JOURNAL_DIR):
+        self.path = journal_path(run_date, journal_dir)
+        os.makedirs(journal_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(journal_dir, "*.jsonl")):
+            if stale != self.path:
+                os.remove(stale)
+        self.done = {}
+        if resume and os.path.exists(self.path):
+            trim_partial_line(self.path)
+            self.done = read_journal(self.path)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self.file = open(self.path, "ab")
+
+    def record(self, code, result):
+        self.file.write(encode_json({"code": code, "result": result}, indent=False) + b"\n")
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def finish(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
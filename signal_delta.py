@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import shutil
+
+from history_store import DATA_DIR, MANIFEST_VERSION, SHARD_DIR, day_sources, scan_changes
+from json_output import write_json
+from signals import extract_signals
+from ticker_index import compact_score, read_json
+
+
+DELTA_DIR = os.path.join(SHARD_DIR, "deltas")
+# 這些策略的分類本身就是不同訊號 (聖杯的各候選組、主動 ETF 的買超 / 賣超)，不是同一訊號的狀態。
+BUCKET_KEYED = {"holy_grail", "active_etf"}
+
+
+def signal_key(signal):
+    # 同一檔股票可能同時有多檔可轉債，以轉債代號區分。
+    bucket = signal["bucket"] if signal["strategy"] in BUCKET_KEYED else None
+    return signal["strategy"], signal["code"], str(signal["metrics"].get("cb_code") or ""), bucket or ""
+
+
+def signal_map(record, date_text):
+    return {
+        signal_key(signal): (compact_score(signal["score"]), signal["bucket"], signal["name"])
+        for signal in extract_signals({**record, "date": date_text})
+    }
+
+
+def delta_entry(key, value):
+    strategy, code, cb_code, _ = key
+    entry = {"code": code, "name": value[2], "score": value[0], "bucket": value[1]}
+    if cb_code:
+        entry["cb_code"] = cb_code
+    return strategy, entry
+
+
+def diff_signals(previous, current):
+    previous_keys = previous.keys()
+    current_keys = current.keys()
+    strategies = {}
+
+    def section(strategy):
+        return strategies.setdefault(strategy, {"added": [], "removed": [], "changed": []})
+
+    for key in sorted(current_keys - previous_keys):
+        strategy, entry = delta_entry(key, current[key])
+        section(strategy)["added"].append(entry)
+    for key in sorted(previous_keys - current_keys):
+        strategy, entry = delta_entry(key, previous[key])
+        section(strategy)["removed"].append(entry)
+    for key in sorted(key for key in current_keys & previous_keys if current[key][:2] != previous[key][:2]):
+        strategy, entry = delta_entry(key, current[key])
+        section(strategy)["changed"].append({**entry, "previousScore": previous[key][0], "previousBucket": previous[key][1]})
+    return strategies
+
+
+def delta_counts(strategies):
+    return {
+        strategy: [len(changes["added"]), len(changes["removed"]), len(changes["changed"])]
+        for strategy, changes in strategies.items()
+    }
+
+
+def delta_path(delta_dir, date_text):
+    return os.path.join(delta_dir, f"{date_text}.json")
+
+
+def load_delta_manifest(delta_dir=DELTA_DIR):
+    manifest = read_json(os.path.join(delta_dir, "manifest.json"), {})
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("days") or {}
+
+
+def publish_deltas(data_dir=DATA_DIR, delta_dir=DELTA_DIR):
+    old_days = load_delta_manifest(delta_dir)
+    if not old_days and os.path.isdir(delta_dir):
+        shutil.rmtree(delta_dir)
+    sources = day_sources(data_dir)
+    maps = {}
+
+    def load_map(date_text, record=None):
+        if date_text not in maps:
+            if record is None:
+                try:
+                    record = sources[date_text].read_record()
+                except (OSError, ValueError):
+                    record = {}
+            maps[date_text] = signal_map(record, date_text)
+        return maps[date_text]
+
+    days = {}
+    written = 0
+    previous_date = None
+    previous_changed = False
+    for date_text, info, record in scan_changes(data_dir, old_days):
+        old = old_days.get(date_text)
+        changed = record is not None
+        # 當日或前一交易日有變動、或前一交易日換了，才需要重算這天的差異。
+        if changed or previous_changed or not old or old.get("previous") != previous_date:
+            current = load_map(date_text, record)
+            strategies = diff_signals(load_map(previous_date), current) if previous_date else {}
+            write_json(delta_path(delta_dir, date_text), {"date": date_text, "previous": previous_date, "strategies": strategies}, report=False)
+            info = {**info, "previous": previous_date, "counts": delta_counts(strategies)}
+            written += 1
+        else:
+            info = {**old, **info}
+        days[date_text] = info
+        previous_date = date_text
+        previous_changed = changed
+
+    removed = set(old_days) - set(days)
+    for date_text in removed:
+        path = delta_path(delta_dir, date_text)
+        if os.path.exists(path):
+            os.remove(path)
+
+    write_json(os.path.join(delta_dir, "manifest.json"), {"version": MANIFEST_VERSION, "days": days}, report=False)
+    return {"days": len(days), "written": written, "removed": len(removed)}
+
+
+def load_delta(date_text, delta_dir=DELTA_DIR):
+    return read_json(delta_path(delta_dir, date_text), None)
+
+
+def format_delta(delta, strategies=None):
+    lines = [f"{delta['date']} 對比 {delta['previous'] or '-'}"]
+    for strategy, changes in delta["strategies"].items():
+        if strategies and strategy not in strategies:
+            continue
+        lines.append(f"  {strategy}: 新增 {len(changes['added'])} / 移出 {len(changes['removed'])} / 變動 {len(changes['changed'])}")
+        for label, key in (("+", "added"), ("-", "removed"), ("~", "changed")):
+            for entry in changes[key]:
+                detail = f" {entry['previousScore']} → {entry['score']}" if key == "changed" else f" {entry['score']}"
+                code = f"{entry['code']}/{entry['cb_code']}" if entry.get("cb_code") else entry["code"]
+                lines.append(f"    {label} {code} {entry['name'] or ''}{detail} {entry['bucket'] or ''}".rstrip())
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每日訊號與前一交易日的差異 (新增 / 移出 / 分數或分組變動)")
+    parser.add_argument("--date", help="查詢日期 YYYY-MM-DD；預設為最新一天。")
+    parser.add_argument("--strategy", nargs="+", help="只列出指定策略。")
+    parser.add_argument("--json", action="store_true", help="輸出原始 JSON，方便串接通知。")
+    args = parser.parse_args()
+
+    stats = publish_deltas()
+    days = load_delta_manifest()
+    date_text = args.date or (max(days) if days else None)
+    delta = load_delta(date_text) if date_text else None
+    if delta is None:
+        print(f"找不到 {date_text or '任何'} 的差異資料 (共 {stats['days']} 天)")
+        return
+    if args.json:
+        print(json.dumps(delta, ensure_ascii=False))
+    else:
+        print(format_delta(delta, args.strategy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from history_store import DATA_DIR, day_sources
+from signals import extract_signals
+
+
+SIGNAL_DB = os.path.join("cache", "signals.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    record_date TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    signal_count INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signals (
+    record_date TEXT NOT NULL,
+    date TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    code TEXT NOT NULL,
+    symbol TEXT,
+    name TEXT,
+    price REAL,
+    score REAL,
+    bucket TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_signals_code_date ON signals (code, record_date);
+CREATE INDEX IF NOT EXISTS idx_signals_date ON signals (record_date);
+CREATE INDEX IF NOT EXISTS idx_signals_strategy_date ON signals (strategy, record_date);
+"""
+
+
+def open_signal_store(db_path=SIGNAL_DB):
+    if db_path != ":memory:":
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def numeric(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def store_record(conn, record, digest=""):
+    record_date = record.get("date")
+    if not record_date:
+        return 0
+    rows = [
+        (
+            signal["record_date"],
+            signal["date"],
+            signal["strategy"],
+            signal["code"],
+            signal["symbol"],
+            signal["name"],
+            numeric(signal["price"]),
+            numeric(signal["score"]),
+            signal["bucket"],
+            json.dumps(signal["metrics"], ensure_ascii=False) if signal["metrics"] else None,
+        )
+        for signal in extract_signals(record)
+    ]
+    with conn:
+        conn.execute("DELETE FROM signals WHERE record_date = ?", (record_date,))
+        conn.executemany("INSERT INTO signals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?)",
+            (record_date, digest, len(rows), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+    return len(rows)
+
+
+def import_archive(conn, data_dir=DATA_DIR):
+    known = {row["record_date"]: row["hash"] for row in conn.execute("SELECT record_date, hash FROM days")}
+    files = day_sources(data_dir)
+    imported = 0
+    for date_text, source in files.items():
+        digest = source.digest()
+        if known.get(date_text) == digest:
+            continue
+        try:
+            record = source.read_record()
+        except (OSError, ValueError):
+            continue
+        store_record(conn, {**record, "date": record.get("date") or date_text}, digest)
+        imported += 1
+    removed = sorted(set(known) - set(files))
+    with conn:
+        for date_text in removed:
+            conn.execute("DELETE FROM signals WHERE record_date = ?", (date_text,))
+            conn.execute("DELETE FROM days WHERE record_date = ?", (date_text,))
+    return {"days": len(files), "imported": imported, "removed": len(removed)}
+
+
+def recent_dates(conn, days, end=None):
+    rows = conn.execute(
+        "SELECT record_date FROM days WHERE record_date <= ? ORDER BY record_date DESC LIMIT ?",
+        (end or "9999-12-31", days),
+    ).fetchall()
+    return [row["record_date"] for row in reversed(rows)]
+
+
+def strategy_filter(strategies):
+    if not strategies:
+        return "", []
+    return f" AND strategy IN ({','.join('?' * len(strategies))})", list(strategies)
+
+
+def appearances(conn, code, strategies=None, days=60, end=None):
+    dates = recent_dates(conn, days, end)
+    if not dates:
+        return {"code": code, "dates": 0, "total": 0, "byStrategy": {}, "rows": []}
+    clause, params = strategy_filter(strategies)
+    rows = conn.execute(
+        "SELECT record_date, strategy, score, bucket, price FROM signals"
+        f" WHERE code = ? AND record_date BETWEEN ? AND ?{clause} ORDER BY record_date, strategy",
+        [str(code).split(".")[0], dates[0], dates[-1], *params],
+    ).fetchall()
+    by_strategy = {}
+    for row in rows:
+        by_strategy[row["strategy"]] = by_strategy.get(row["strategy"], 0) + 1
+    return {"code": code, "dates": len(dates), "total": len(rows), "byStrategy": by_strategy, "rows": [dict(row) for row in rows]}
+
+
+def streaks(conn, strategy, bucket=None, min_days=3, days=None, end=None):
+    dates = recent_dates(conn, days or 100000, end)
+    if not dates:
+        return []
+    bucket_clause = " AND s.bucket = ?" if bucket else ""
+    # gaps-and-islands：交易日序號減去該股出現序號，相同者即為連續出現的一段。
+    sql = f"""
+        WITH day_index AS (
+            SELECT record_date, ROW_NUMBER() OVER (ORDER BY record_date) AS day_no
+            FROM days WHERE record_date BETWEEN ? AND ?
+        ),
+        hits AS (
+            SELECT DISTINCT s.code, s.record_date, d.day_no
+            FROM signals s JOIN day_index d ON d.record_date = s.record_date
+            WHERE s.strategy = ?{bucket_clause}
+        ),
+        islands AS (
+            SELECT code, record_date, day_no - ROW_NUMBER() OVER (PARTITION BY code ORDER BY day_no) AS island
+            FROM hits
+        )
+        SELECT code, MIN(record_date) AS start, MAX(record_date) AS end, COUNT(*) AS days
+        FROM islands GROUP BY code, island HAVING COUNT(*) >= ?
+        ORDER BY end DESC, days DESC, code
+    """
+    params = [dates[0], dates[-1], strategy] + ([bucket] if bucket else []) + [min_days]
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="訊號資料庫：匯入每日存檔並做跨日查詢")
+    parser.add_argument("--db", default=SIGNAL_DB, help="SQLite 檔案路徑。")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("import", help="匯入 data/ 內新增或變動的每日存檔。")
+
+    count = sub.add_parser("count", help="某檔股票最近 N 個交易日出現在哪些策略。")
+    count.add_argument("code")
+    count.add_argument("--strategy", nargs="+")
+    count.add_argument("--days", type=int, default=60)
+    count.add_argument("--end")
+
+    streak = sub.add_parser("streak", help="連續多日出現在同一策略的股票。")
+    streak.add_argument("strategy")
+    streak.add_argument("--bucket", help="限定分組，例如 active_etf 的 buy。")
+    streak.add_argument("--min-days", type=int, default=3)
+    streak.add_argument("--days", type=int, help="只看最近 N 個交易日。")
+    streak.add_argument("--end")
+
+    sql = sub.add_parser("sql", help="直接執行唯讀 SQL。")
+    sql.add_argument("query")
+    args = parser.parse_args()
+
+    conn = open_signal_store(args.db)
+    if args.command == "import":
+        stats = import_archive(conn)
+        print(f"匯入完成：{stats['days']} 天，更新 {stats['imported']} 天，移除 {stats['removed']} 天")
+    elif args.command == "count":
+        result = appearances(conn, args.code, args.strategy, args.days, args.end)
+        print(f"{args.code} 最近 {result['dates']} 個交易日共出現 {result['total']} 次：{result['byStrategy']}")
+        for row in result["rows"]:
+            print(f"  {row['record_date']} {row['strategy']:<14} score={row['score']} {row['bucket'] or ''}")
+    elif args.command == "streak":
+        for row in streaks(conn, args.strategy, args.bucket, args.min_days, args.days, args.end):
+            print(f"{row['code']:<8} {row['start']} ~ {row['end']} 連續 {row['days']} 天")
+    else:
+        conn.execute("PRAGMA query_only = ON")
+        for row in conn.execute(args.query):
+            print(dict(row))
+
+
+if __name__ == "__main__":
+    main()
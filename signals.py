@@ -0,0 +1,109 @@
+import re
+
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+LIST_STRATEGY_FIELDS = {
+    "momentum": {"score": "score"},
+    "day_trading": {"score": "rise_20d"},
+    "doji_rise": {"score": "score"},
+    "macd_turn_red": {"score": "histogram", "bucket": "macd_label"},
+    "cbas": {"score": "double_low"},
+    "active_etf": {"score": "net_amount", "bucket": "side"},
+    "low_volatility": {"score": "score_val", "bucket": "tag"},
+    "granville_buy": {"score": "score", "bucket": "title"},
+    "granville_sell": {"score": "score", "bucket": "title"},
+}
+
+METRIC_FIELDS = (
+    "pct_change",
+    "vol_ratio",
+    "rise_20d",
+    "macd_day",
+    "histogram",
+    "premium_pct",
+    "double_low",
+    "cb_code",
+    "net_amount",
+    "same_side_count",
+    "etf_count",
+    "return20",
+    "relativeStrength20",
+    "volumeRatio",
+    "signalCount",
+    "branchScore",
+    "netPressureLots",
+)
+
+
+def base_code(code):
+    return str(code or "").split(".")[0]
+
+
+def signal_date(item, record_date):
+    value = str(item.get("date") or "")
+    return value if DATE_PATTERN.match(value) else record_date
+
+
+def pick_metrics(item):
+    return {key: item[key] for key in METRIC_FIELDS if item.get(key) is not None}
+
+
+def make_signal(record_date, strategy, item, score=None, bucket=None):
+    code = item.get("code") or item.get("cb_code")
+    if not code:
+        return None
+    return {
+        "record_date": record_date,
+        "date": signal_date(item, record_date),
+        "strategy": strategy,
+        "code": base_code(code),
+        "symbol": str(code) if "." in str(code) else None,
+        "name": item.get("name"),
+        "price": item.get("price") if item.get("price") is not None else item.get("close"),
+        "score": score,
+        "bucket": None if bucket is None else str(bucket),
+        "metrics": pick_metrics(item),
+    }
+
+
+def extract_signals(record):
+    record_date = record.get("date")
+    strategies = record.get("strategies") or {}
+    rows = []
+
+    for strategy, fields in LIST_STRATEGY_FIELDS.items():
+        items = strategies.get(strategy)
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            bucket_field = fields.get("bucket")
+            signal = make_signal(record_date, strategy, item, item.get(fields["score"]), item.get(bucket_field) if bucket_field else None)
+            if signal:
+                rows.append(signal)
+
+    holy = strategies.get("holy_grail")
+    if isinstance(holy, dict):
+        for bucket, items in (holy.get("candidates") or {}).items():
+            for item in items if isinstance(items, list) else []:
+                signal = make_signal(record_date, "holy_grail", item, item.get("score"), bucket)
+                if signal:
+                    rows.append(signal)
+
+    druck = strategies.get("druckenmiller")
+    if isinstance(druck, dict):
+        for item in druck.get("candidates") or []:
+            signal = make_signal(record_date, "druckenmiller", item, item.get("score"), item.get("conviction"))
+            if signal:
+                rows.append(signal)
+
+    branches = strategies.get("key_branches")
+    if isinstance(branches, dict):
+        for item in branches.get("items") or []:
+            signal = make_signal(record_date, "key_branches", item, item.get("branchScore"), item.get("bias"))
+            if signal:
+                rows.append(signal)
+
+    return rows
@@ -0,0 +1,43 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, func, share=None):
+        # 同一個 key 同時只有一個呼叫真的執行，其他呼叫等它結束後共用結果 (或同一個例外)。
+        # 回傳 (結果, 是否為共用)；share 可以替等待者複製一份可變的結果。
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return (share(call.result) if share else call.result), True
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            # 結束後立刻移除，之後的呼叫會重新抓取，不把結果當成快取。
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result, False
@@ -0,0 +1,287 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from main import DOJI_RISE_PARAMS, MACD_PARAMS, MOMENTUM_PARAMS, get_tw_stock_list
+from price_panel import adjusted_close, load_panel, update_panel_store
+
+
+HORIZONS = (5, 20)
+PRICE_STORE = os.path.join("cache", "prices.pkl.gz")
+STOCK_MIN_BARS = 205
+BREAKOUT_MIN_BARS = 120
+BREAKOUT_PARAMS = {"volume_factor": 1.5, "max_change": 0.07}
+
+SWEEP_DEFAULTS = {
+    "momentum": MOMENTUM_PARAMS,
+    "doji_rise": DOJI_RISE_PARAMS,
+    "macd_turn_red": MACD_PARAMS,
+    "breakout": BREAKOUT_PARAMS,
+}
+
+DEFAULT_GRIDS = {
+    "momentum": {"lookback_short": [40, 60, 80, 120], "vol_factor": [1.2, 1.5, 2.0]},
+    "doji_rise": {"max_body_pct": [0.004, 0.006, 0.01], "min_vol_ratio": [0.5, 0.7], "max_vol_ratio": [1.2, 1.5, 2.0]},
+    "macd_turn_red": {"fast": [12, 21], "slow": [26, 55], "signal": [9, 89]},
+    "breakout": {"volume_factor": [1.2, 1.5, 2.0], "max_change": [0.05, 0.07, 0.095]},
+}
+
+
+class IndicatorCache:
+    def __init__(self, df):
+        self.df = df
+        self.close = df["Close"].astype(float)
+        self.adj_close = adjusted_close(df)
+        self.volume = df["Volume"].astype(float)
+        self.position = np.arange(len(df))
+        self.hits = 0
+        self._cache = {}
+
+    def get(self, key, build):
+        if key in self._cache:
+            self.hits += 1
+        else:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def column(self, name):
+        return self.get(("column", name), lambda: self.df[name].astype(float))
+
+    def sma(self, name, window):
+        return self.get(("sma", name, window), lambda: self.column(name).rolling(window).mean())
+
+    def prior_max(self, name, window):
+        return self.get(("prior_max", name, window), lambda: self.column(name).shift(1).rolling(window).max())
+
+    def ema(self, span):
+        return self.get(("ema", span), lambda: self.close.ewm(span=span, adjust=False).mean())
+
+    def macd_histogram(self, fast, slow, signal):
+        def build():
+            dif = self.get(("dif", fast, slow), lambda: self.ema(fast) - self.ema(slow))
+            return dif - dif.ewm(span=signal, adjust=False).mean()
+        return self.get(("macd", fast, slow, signal), build)
+
+
+def momentum_signals(cache, params):
+    close = cache.close
+    high_short = cache.prior_max("Close", int(params["lookback_short"]))
+    new_high = close > high_short
+    was_high = close.shift(1) > high_short
+    signal = (cache.volume >= 500000) & new_high & ~was_high & (cache.position >= STOCK_MIN_BARS - 1)
+    confirmed = signal & (cache.volume > cache.sma("Volume", 20) * params["vol_factor"])
+    return signal, confirmed
+
+
+def doji_rise_signals(cache, params):
+    close = cache.close; open_p = cache.column("Open")
+    ma5_vol = cache.sma("Volume", 5)
+    ma5 = cache.sma("Close", 5); ma10 = cache.sma("Close", 10)
+    ma20 = cache.sma("Close", 20); ma60 = cache.sma("Close", 60)
+    liquid = (ma5_vol >= 5000000) | ((ma5_vol * ma5) >= 1000000000)
+    trend = ~((close < ma20) | (close < ma60) | (ma60 < ma60.shift(1)) | (close / ma20 > 1.15))
+    body = (close - open_p).abs()
+    total_range = cache.column("High") - cache.column("Low")
+    shape = (body / open_p <= params["max_body_pct"]) & ~((total_range < body * 2) | (total_range == 0))
+    vol_ratio = cache.volume / ma5_vol
+    volume_ok = ~((vol_ratio > params["max_vol_ratio"]) | (vol_ratio < params["min_vol_ratio"]))
+    score = (
+        60
+        + 5 * (ma5_vol >= 10000000)
+        + 5 * ((vol_ratio >= 0.8) & (vol_ratio <= 1.2))
+        + 5 * ((ma5 > ma10) & (ma10 > ma20) & (ma20 > ma60))
+        - 10 * (ma5_vol < 6000000)
+        - 5 * (vol_ratio > 1.3)
+    )
+    signal = liquid & trend & shape & volume_ok & (score >= 60) & (cache.position >= STOCK_MIN_BARS - 1)
+    return signal, None
+
+
+def macd_turn_red_signals(cache, params):
+    histogram = cache.macd_histogram(int(params["fast"]), int(params["slow"]), int(params["signal"]))
+    signal = (histogram > 0) & (histogram.shift(1) <= 0) & (cache.position >= STOCK_MIN_BARS - 1)
+    return signal, None
+
+
+def breakout_signals(cache, params):
+    close = cache.close
+    ma20 = cache.sma("Close", 20); ma60 = cache.sma("Close", 60); ma120 = cache.sma("Close", 120)
+    volume_ma20 = cache.sma("Volume", 20)
+    change = (close / close.shift(1) - 1).fillna(0)
+    trend_ok = (close > ma20) & (ma20 > ma60) & (ma60 > ma120)
+    signal = (
+        (close > cache.prior_max("High", 20))
+        & (volume_ma20 > 0)
+        & (cache.volume > volume_ma20 * params["volume_factor"])
+        & (change < params["max_change"])
+        & trend_ok
+        & (cache.position >= BREAKOUT_MIN_BARS - 1)
+    )
+    return signal, None
+
+
+SIGNAL_BUILDERS = {
+    "momentum": momentum_signals,
+    "doji_rise": doji_rise_signals,
+    "macd_turn_red": macd_turn_red_signals,
+    "breakout": breakout_signals,
+}
+
+
+def expand_grid(strategy, grid=None):
+    defaults = SWEEP_DEFAULTS[strategy]
+    grid = grid or DEFAULT_GRIDS[strategy]
+    keys = list(grid)
+    points = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = {**defaults, **dict(zip(keys, values))}
+        if strategy == "macd_turn_red" and params["fast"] >= params["slow"]:
+            continue
+        if strategy == "doji_rise" and params["min_vol_ratio"] >= params["max_vol_ratio"]:
+            continue
+        points.append(params)
+    return points
+
+
+def sweep_chunk(items, strategy, grid, horizons, start=None, end=None):
+    builder = SIGNAL_BUILDERS[strategy]
+    collected = [{"signals": [], "confirmed": []} for _ in grid]
+    cache_hits = 0
+    for _, df in items:
+        if len(df) < 2:
+            continue
+        cache = IndicatorCache(df)
+        in_range = np.ones(len(df), dtype=bool)
+        if start:
+            in_range &= df.index >= pd.Timestamp(start)
+        if end:
+            in_range &= df.index <= pd.Timestamp(end)
+        forward = np.column_stack([(cache.adj_close.shift(-horizon) / cache.adj_close - 1).to_numpy() for horizon in horizons])
+        for index, params in enumerate(grid):
+            signal, confirmed = builder(cache, params)
+            mask = signal.to_numpy(dtype=bool) & in_range
+            collected[index]["signals"].append(forward[mask])
+            if confirmed is not None:
+                collected[index]["confirmed"].append(forward[confirmed.to_numpy(dtype=bool) & in_range])
+        cache_hits += cache.hits
+    empty = np.empty((0, len(horizons)))
+    return [
+        {key: np.vstack(values) if values else empty for key, values in item.items()}
+        for item in collected
+    ], cache_hits
+
+
+def chunked(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def summarize_returns(prefix, values, horizons):
+    row = {prefix: int(len(values))}
+    for column, horizon in enumerate(horizons):
+        returns = values[:, column] if len(values) else np.empty(0)
+        returns = returns[~np.isnan(returns)]
+        suffix = "" if prefix == "signals" else "_confirmed"
+        row[f"hit_{horizon}d{suffix}"] = float((returns > 0).mean()) if len(returns) else None
+        row[f"mean_{horizon}d{suffix}"] = float(returns.mean()) if len(returns) else None
+        row[f"median_{horizon}d{suffix}"] = float(np.median(returns)) if len(returns) else None
+    return row
+
+
+def run_sweep(panel, strategy, grid=None, horizons=HORIZONS, start=None, end=None, workers=None, chunk_size=50):
+    points = expand_grid(strategy, grid)
+    items = [(symbol, df) for symbol, df in panel.items() if df is not None and not df.empty]
+    chunks = list(chunked(items, chunk_size))
+    merged = [{"signals": [], "confirmed": []} for _ in points]
+    cache_hits = 0
+
+    if workers == 1 or len(chunks) <= 1:
+        outputs = [sweep_chunk(chunk, strategy, points, horizons, start, end) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(sweep_chunk, chunk, strategy, points, horizons, start, end) for chunk in chunks]
+            outputs = [future.result() for future in futures]
+
+    for chunk_result, hits in outputs:
+        cache_hits += hits
+        for index, item in enumerate(chunk_result):
+            merged[index]["signals"].append(item["signals"])
+            merged[index]["confirmed"].append(item["confirmed"])
+
+    rows = []
+    uses_confirmed = strategy == "momentum"
+    for params, item in zip(points, merged):
+        row = {"strategy": strategy, **params}
+        row.update(summarize_returns("signals", np.vstack(item["signals"]) if item["signals"] else np.empty((0, len(horizons))), horizons))
+        if uses_confirmed:
+            row.update(summarize_returns("confirmed", np.vstack(item["confirmed"]) if item["confirmed"] else np.empty((0, len(horizons))), horizons))
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    table.attrs["indicator_cache_hits"] = cache_hits
+    return table
+
+
+def parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_grid(specs):
+    if not specs:
+        return None
+    grid = {}
+    for spec in specs:
+        if "=" not in spec:
+            raise SystemExit(f"參數格式錯誤：{spec}，請使用 name=v1,v2")
+        key, values = spec.split("=", 1)
+        grid[key.strip()] = [parse_value(value) for value in values.split(",") if value.strip()]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以歷史價格資料平行掃描策略參數組合，輸出訊號數與後續報酬")
+    parser.add_argument("--strategy", required=True, choices=sorted(SIGNAL_BUILDERS), help="要掃描的策略。")
+    parser.add_argument("--grid", nargs="+", help="參數網格，例如 lookback_short=40,60,80 vol_factor=1.2,1.5；未指定時使用預設網格。")
+    parser.add_argument("--start", help="訊號起始日期 YYYY-MM-DD（含）。")
+    parser.add_argument("--end", help="訊號結束日期 YYYY-MM-DD（含）。")
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(HORIZONS), help="持有天數 (交易日)。")
+    parser.add_argument("--prices", default=PRICE_STORE, help="本地價格資料檔路徑。")
+    parser.add_argument("--fetch", action="store_true", help="先用 yfinance 增量更新全市場本地價格資料。")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="平行處理的程序數。")
+    parser.add_argument("--output", help="將結果表輸出為 CSV。")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    unknown = set(grid or {}) - set(SWEEP_DEFAULTS[args.strategy])
+    if unknown:
+        raise SystemExit(f"{args.strategy} 沒有參數：{', '.join(sorted(unknown))}")
+
+    if args.fetch:
+        start_dt = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now() - timedelta(days=365)
+        symbols = [stock["code"] for stock in get_tw_stock_list()]
+        panel = update_panel_store(args.prices, symbols, start_dt - timedelta(days=800), datetime.now() + timedelta(days=1))
+    else:
+        panel = load_panel(args.prices)
+    if not panel:
+        raise SystemExit(f"找不到本地價格資料 {args.prices}，請加上 --fetch。")
+
+    started = datetime.now()
+    table = run_sweep(panel, args.strategy, grid, tuple(args.horizons), args.start, args.end, workers=args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(table.to_string(index=False))
+    print(f"\n{len(table)} 組參數 × {len(panel)} 檔，耗時 {elapsed:.1f} 秒，指標重用 {table.attrs['indicator_cache_hits']} 次")
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"已輸出：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import html
+import json
+import re
+import zlib
+from collections import Counter, namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import twstock
+
+from http_client import HttpResponse
+
+
+SyntheticCode = namedtuple("SyntheticCode", ["type", "code", "name", "market", "group"])
+
+TW_SYMBOL = re.compile(r"^(\d{4})\.TWO?$")
+TW_LIMIT = 0.099
+ACTIVE_ETF_CODES = ["00980A", "00981A", "00982A", "00984A", "00985A", "00991A"]
+ACTIVE_ETF_TYPES = ["added", "increased", "decreased", "removed"]
+PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def default_end_date():
+    return pd.offsets.BDay().rollback(pd.Timestamp(datetime.now().date()))
+
+
+def industry_weights():
+    # 產業比例照 twstock 實際的上市櫃分布抽樣。
+    counts = Counter(
+        info.group for code, info in twstock.codes.items()
+        if len(code) == 4 and code.isdigit() and info.type == "股票" and info.group
+    )
+    groups = sorted(counts)
+    weights = np.array([counts[group] for group in groups], dtype=float)
+    return groups, weights / weights.sum()
+
+
+def roc_date(value):
+    return f"{value.year - 1911}/{value.month:02d}/{value.day:02d}"
+
+
+class SyntheticMarket:
+    def __init__(self, seed=7, symbols=2000, bars=600, end_date=None, illiquid_ratio=0.1, cb_ratio=0.06, adjust_splits=True):
+        self.seed = seed
+        self.bars = bars
+        self.illiquid_ratio = illiquid_ratio
+        self.cb_ratio = cb_ratio
+        # yfinance 的價格已還原分割，只在 Stock Splits 欄位標出事件；adjust_splits=False 則保留分割當天的價格斷層。
+        self.adjust_splits = adjust_splits
+        self.end_date = pd.Timestamp(end_date).normalize() if end_date else default_end_date()
+        rng = np.random.default_rng(seed)
+
+        days = pd.bdate_range(end=self.end_date, periods=int(bars * 1.05) + 10)
+        holidays = rng.random(len(days)) < 0.025
+        holidays[-1] = False
+        self.calendar = days[~holidays][-bars:]
+        self.market_returns = rng.normal(0.0003, 0.011, len(self.calendar))
+
+        free_codes = [str(number) for number in range(1000, 10000) if str(number) not in twstock.codes]
+        if symbols > len(free_codes):
+            raise ValueError(f"四位數代碼最多只能產生 {len(free_codes)} 檔")
+        codes = sorted(rng.choice(free_codes, size=symbols, replace=False))
+        groups, weights = industry_weights()
+        picked_groups = rng.choice(groups, size=symbols, p=weights)
+        listed = rng.random(symbols) < 0.55
+        self.codes = {}
+        self.twse = {}
+        self.tpex = {}
+        self.symbols = {}
+        for code, group, is_listed in zip(codes, picked_groups, listed):
+            info = SyntheticCode("股票", code, f"合成{code}", "上市" if is_listed else "上櫃", str(group))
+            self.codes[code] = info
+            (self.twse if is_listed else self.tpex)[code] = info
+            self.symbols[code] = f"{code}.TW" if is_listed else f"{code}.TWO"
+        self._closes = None
+        self._cb_rows = None
+
+    def symbol_rng(self, symbol, salt=0):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode("utf-8")), salt])
+
+    def is_known(self, symbol):
+        match = TW_SYMBOL.match(symbol)
+        if not match:
+            return True
+        code = match.group(1)
+        if code in self.symbols:
+            return self.symbols[code] == symbol
+        # 合成代碼以外的台股代碼 (0050、真實個股) 照樣產生，方便大盤與 ETF 參考序列使用。
+        return code in twstock.codes
+
+    def full_history(self, symbol):
+        rng = self.symbol_rng(symbol)
+        n = len(self.calendar)
+        tw = symbol.endswith((".TW", ".TWO")) or symbol == "^TWII"
+        vol = rng.uniform(0.01, 0.035) if tw else rng.uniform(0.006, 0.018)
+        returns = rng.uniform(0.4, 1.6) * self.market_returns + rng.normal(rng.normal(0.0002, 0.0005), vol, n)
+        shocks = rng.random(n) < 0.01
+        returns[shocks] += rng.normal(0, 4 * vol, int(shocks.sum()))
+        limit_up = np.zeros(n, dtype=bool)
+        if tw:
+            limit_up = rng.random(n) < 0.004
+            returns[limit_up] = TW_LIMIT
+            returns = np.clip(returns, -TW_LIMIT, TW_LIMIT)
+
+        illiquid = tw and TW_SYMBOL.match(symbol) is not None and rng.random() < self.illiquid_ratio
+        traded = rng.random(n) > 0.4 if illiquid else np.ones(n, dtype=bool)
+        returns = np.where(traded, returns, 0.0)
+
+        prev_close = rng.uniform(10, 600) * np.cumprod(np.concatenate([[1.0], 1 + returns[:-1]]))
+        close = prev_close * (1 + returns)
+        gap = rng.normal(0, vol * 0.4, n)
+        jumps = rng.random(n) < 0.03
+        gap[jumps] += rng.choice([-1, 1], int(jumps.sum())) * rng.uniform(0.02, 0.05, int(jumps.sum()))
+        if tw:
+            gap = np.clip(gap, -TW_LIMIT, TW_LIMIT)
+        open_ = np.where(traded, prev_close * (1 + gap), close)
+        spread = np.abs(rng.normal(0, vol * 0.6, (2, n)))
+        high = np.where(limit_up, close, np.maximum(open_, close) * (1 + spread[0]))
+        low = np.minimum(open_, close) * (1 - spread[1])
+        if tw:
+            high = np.minimum(high, prev_close * (1 + TW_LIMIT))
+            low = np.maximum(low, prev_close * (1 - TW_LIMIT))
+        high = np.where(traded, high, close)
+        low = np.where(traded, low, close)
+
+        base_volume = rng.lognormal(np.log(4e4 if illiquid else 3e6), 0.8)
+        volume = base_volume * np.exp(rng.normal(0, 0.45, n)) * (1 + 8 * np.abs(returns)) * np.where(limit_up, 3.0, 1.0)
+        volume = np.where(traded, np.round(volume, -3 if tw else 0), 0)
+
+        splits = np.zeros(n)
+        if rng.random() < 0.03 and n > 300:
+            split_day = int(rng.integers(n // 4, n - 50))
+            ratio = float(rng.choice([2.0, 1.5, 0.5]))
+            splits[split_day] = ratio
+            if not self.adjust_splits:
+                before = np.arange(n) < split_day
+                for series in (open_, high, low, close):
+                    series[before] *= ratio
+                volume = np.where(before, volume / ratio, volume)
+
+        keep = np.ones(n, dtype=bool)
+        if rng.random() < 0.08:
+            keep[: int(rng.integers(1, int(n * 0.8)))] = False
+        if illiquid or rng.random() < 0.02:
+            start = int(rng.integers(0, max(1, n - 30)))
+            keep[start:start + int(rng.integers(5, 30))] = False
+        keep[-1] = True
+
+        index = self.calendar.tz_localize("Asia/Taipei" if tw else "America/New_York")
+        frame = pd.DataFrame({
+            "Open": np.round(open_, 2), "High": np.round(high, 2), "Low": np.round(low, 2),
+            "Close": np.round(close, 2), "Volume": volume.astype("int64"),
+            "Dividends": 0.0, "Stock Splits": splits,
+        }, index=index)
+        frame.index.name = "Date"
+        return frame[keep]
+
+    def history(self, symbol, period="1mo", start=None, end=None, auto_adjust=True, **kwargs):
+        if not self.is_known(symbol):
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"])
+        frame = self.full_history(symbol)
+        dates = frame.index.tz_localize(None)
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None or end is not None:
+            if start is not None:
+                mask &= dates >= pd.Timestamp(start).normalize()
+            if end is not None:
+                mask &= dates < pd.Timestamp(end).normalize()
+        elif period and period != "max":
+            number, unit = re.match(r"(\d+)(\D+)", period).groups()
+            mask &= dates > dates[-1] - pd.DateOffset(**{PERIOD_UNITS[unit]: int(number)})
+        frame = frame[mask]
+        if not auto_adjust:
+            frame.insert(4, "Adj Close", frame["Close"])
+        return frame
+
+    def info(self, symbol):
+        rng = self.symbol_rng(symbol, 2)
+        code = symbol.split(".")[0]
+        name = self.codes[code].name if code in self.codes else symbol
+        info = {
+            "longName": name,
+            "shortName": name,
+            "trailingPE": None if rng.random() < 0.1 else round(float(rng.lognormal(np.log(16), 0.5)), 2),
+            "earningsGrowth": None if rng.random() < 0.2 else round(float(rng.normal(0.08, 0.3)), 3),
+            "revenueGrowth": None if rng.random() < 0.2 else round(float(rng.normal(0.06, 0.2)), 3),
+        }
+        # 與 yfinance 相同，沒有資料的欄位直接不出現。
+        return {key: value for key, value in info.items() if value is not None}
+
+    def quarterly_income_stmt(self, symbol):
+        rng = self.symbol_rng(symbol, 3)
+        quarters = pd.period_range(end=self.end_date.to_period("Q") - 1, periods=5, freq="Q")[::-1]
+        revenue = rng.lognormal(np.log(2e9), 1.0) * np.cumprod(1 + rng.normal(0.02, 0.12, len(quarters)))
+        return pd.DataFrame([revenue.round(0)], index=["Total Revenue"], columns=quarters.to_timestamp(how="end").normalize())
+
+    def attr(self, symbol, name):
+        if name == "info":
+            return self.info(symbol)
+        if name == "quarterly_income_stmt":
+            return self.quarterly_income_stmt(symbol)
+        raise AttributeError(name)
+
+    def last_closes(self):
+        if self._closes is None:
+            self._closes = {}
+            for code, symbol in self.symbols.items():
+                frame = self.full_history(symbol)
+                if len(frame) and frame.index[-1].tz_localize(None) == self.calendar[-1]:
+                    self._closes[code] = float(frame["Close"].iloc[-1])
+        return self._closes
+
+    def cb_issuers(self):
+        codes = sorted(self.symbols, key=lambda code: zlib.crc32(f"{self.seed}-cb-{code}".encode("utf-8")))
+        return sorted(codes[: max(1, round(len(codes) * self.cb_ratio))])
+
+    def cb_rows(self):
+        if self._cb_rows is not None:
+            return self._cb_rows
+        rows = []
+        closes = self.last_closes()
+        for code in self.cb_issuers():
+            rng = self.symbol_rng(code, 4)
+            for serial in range(1, 3 if rng.random() < 0.2 else 2):
+                issue = self.end_date - pd.DateOffset(days=int(rng.integers(60, 900)))
+                conversion = round(closes.get(code, 50.0) * float(rng.uniform(0.75, 1.35)), 2)
+                rows.append({
+                    "BondCode": f"{code}{serial}", "IssuerCode": code, "ShortName": f"{self.codes[code].name}{'一二'[serial - 1]}",
+                    "Conversion/ExchangePriceAtIssuance": f"{conversion:.2f}", "ListingStatus": "2", "OfferingMethod": "7",
+                    "IssueDate": issue.strftime("%Y%m%d"), "ListingDate": issue.strftime("%Y%m%d"),
+                    "MaturityDate": (issue + pd.DateOffset(years=3)).strftime("%Y%m%d"),
+                    "PutOptionDate": (issue + pd.DateOffset(years=2)).strftime("%Y%m%d"), "PutOptionPrice": "101.00",
+                    "OutstandingAmount": str(int(rng.integers(2, 30)) * 100000000), "Guaranteed": "1" if rng.random() < 0.3 else "0",
+                })
+        self._cb_rows = rows
+        return rows
+
+    def cb_quote_table(self, cb_id):
+        issuer = cb_id[:4]
+        cb = next((row for row in self.cb_rows() if row["BondCode"] == cb_id), None)
+        if cb is None:
+            return []
+        rng = self.symbol_rng(cb_id, 5)
+        frame = self.full_history(self.symbols[issuer]).tail(30)
+        parity = frame["Close"].to_numpy() / float(cb["Conversion/ExchangePriceAtIssuance"]) * 100
+        premium = rng.uniform(0.01, 0.25)
+        price = np.round(np.maximum(parity * (1 + premium), rng.uniform(97, 103)), 2)
+        rows = []
+        for index, (date, close) in enumerate(zip(frame.index, price)):
+            units = int(rng.integers(0, 400))
+            change = close - price[index - 1] if index else 0.0
+            rows.append([
+                roc_date(date), "等價", f"{close:.2f}", f"{change:.2f}", f"{close:.2f}", f"{close * 1.01:.2f}",
+                f"{close * 0.99:.2f}", str(max(1, units // 5)), str(units), str(int(units * close * 1000)), f"{close:.2f}",
+            ])
+        return rows
+
+    def active_etf_summary(self):
+        rng = np.random.default_rng([self.seed, 6])
+        codes = list(self.symbols)
+        picked = rng.choice(codes, size=min(40, len(codes)), replace=False)
+        flows = []
+        for code in picked:
+            etfs = rng.choice(ACTIVE_ETF_CODES, size=int(rng.integers(1, 5)), replace=False)
+            details = [{
+                "etfCode": str(etf), "type": str(rng.choice(ACTIVE_ETF_TYPES)),
+                "sharesDelta": int(rng.integers(-500, 500)) * 1000, "amount": int(rng.integers(-50_000_000, 50_000_000)),
+            } for etf in etfs]
+            flows.append({
+                "stockCode": str(code), "stockName": self.codes[code].name, "industry": self.codes[code].group,
+                "etfDetails": details, "netShares": sum(item["sharesDelta"] for item in details),
+                "netAmount": sum(item["amount"] for item in details),
+                "buyAmount": sum(item["amount"] for item in details if item["amount"] > 0),
+                "sellAmount": -sum(item["amount"] for item in details if item["amount"] < 0),
+            })
+        return {
+            "etfs": [{"code": code, "name": f"合成主動{code}", "issuer": "合成投信"} for code in ACTIVE_ETF_CODES],
+            "flowRankings": flows,
+            "latestMarketDate": self.end_date.strftime("%Y-%m-%d"),
+            "updatedAt": self.end_date.strftime("%Y-%m-%d"),
+        }
+
+    def branch_rows(self, stock_id, date):
+        rng = self.symbol_rng(f"{stock_id}-{date}", 7)
+        symbol = self.symbols.get(stock_id)
+        close = self.last_closes().get(stock_id, 50.0) if symbol else 50.0
+        rows = []
+        for index in range(40):
+            rows.append({
+                "date": date, "stock_id": stock_id, "securities_trader_id": f"9{index:03d}",
+                "securities_trader": f"合成證券{index:02d}", "price": round(close * float(rng.uniform(0.97, 1.03)), 2),
+                "buy": int(rng.integers(0, 300)) * 1000, "sell": int(rng.integers(0, 300)) * 1000,
+            })
+        return rows
+
+    def http_get(self, url, params=None, headers=None, **kwargs):
+        params = params or {}
+        if "bond_ISSBD5_data" in url:
+            payload = self.cb_rows()
+        elif "cbDayQry" in url:
+            payload = {"tables": [{"data": self.cb_quote_table(str(params.get("code", "")))}]}
+        elif "STOCK_DAY_ALL" in url:
+            payload = [{"Code": code, "ClosingPrice": f"{close:.2f}"} for code, close in self.last_closes().items() if code in self.twse]
+        elif "tpex_mainboard_daily_close_quotes" in url:
+            payload = [{"SecuritiesCompanyCode": code, "Close": f"{close:.2f}"} for code, close in self.last_closes().items() if code in self.tpex]
+        elif "taiwan_stock_trading_daily_report" in url:
+            payload = {"status": 200, "msg": "success", "data": self.branch_rows(str(params.get("data_id")), str(params.get("date")))}
+        elif "etfinfo.tw/active" in url:
+            nuxt = json.dumps([{"data": 1}, {"active-summary-weekly-0": self.active_etf_summary()}], ensure_ascii=False)
+            body = f'<html><body><script type="application/json" id="__NUXT_DATA__">{html.escape(nuxt, quote=False)}</script></body></html>'
+            return HttpResponse(url, 200, body.encode("utf-8"), {"Content-Type": "text/html; charset=utf-8"})
+        else:
+            return HttpResponse(url, 404, b"", {})
+        return HttpResponse(url, 200, json.dumps(payload, ensure_ascii=False).encode("utf-8"), {"Content-Type": "application/json; charset=utf-8"})
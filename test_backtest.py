@@ -0,0 +1,97 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import pandas as pd
+
+from backtest import join_forward_returns, main as backtest_main, run_backtest, signal_frame
+from price_panel import save_panel
+from signals import extract_signals
+
+
+def make_panel():
+    index = pd.bdate_range("2026-01-05", periods=8)
+    closes = [100, 110, 121, 100, 90, 99, 108, 120]
+    lows = [99, 105, 95, 98, 88, 97, 107, 118]
+    df = pd.DataFrame({"Open": closes, "High": closes, "Low": lows, "Close": closes, "Volume": [1000] * 8}, index=index)
+    return {"2330.TW": df}
+
+
+RECORDS = [
+    {
+        "date": "2026-01-05",
+        "strategies": {
+            "momentum": [{"code": "2330.TW", "name": "台積電", "price": 100, "date": "2026-01-05", "score": 8}],
+            "active_etf": [{"code": "2330", "name": "台積電", "side": "buy", "net_amount": 1000}],
+            "holy_grail": {"candidates": {"breakout": [{"code": "2330.TW", "close": 100, "score": 80, "date": "2026-01-05"}]}},
+        },
+    },
+    {
+        "date": "2026-01-06",
+        "strategies": {
+            "momentum": [{"code": "2330.TW", "name": "台積電", "price": 110, "date": "2026-01-06", "score": 3}],
+        },
+    },
+]
+
+
+class BacktestTest(unittest.TestCase):
+    def test_extract_signals_normalizes_strategies(self):
+        signals = extract_signals(RECORDS[0])
+        self.assertEqual({item["strategy"] for item in signals}, {"momentum", "active_etf", "holy_grail"})
+        etf = next(item for item in signals if item["strategy"] == "active_etf")
+        self.assertEqual((etf["code"], etf["bucket"], etf["date"]), ("2330", "buy", "2026-01-05"))
+
+    def test_forward_returns_and_adverse_excursion(self):
+        signals = signal_frame(RECORDS, strategies=["momentum"])
+        joined = join_forward_returns(signals, make_panel(), horizons=(1, 2))
+        first = joined[joined["date"] == "2026-01-05"].iloc[0]
+        self.assertAlmostEqual(first["ret_1d"], 0.10)
+        self.assertAlmostEqual(first["ret_2d"], 0.21)
+        self.assertAlmostEqual(first["mae_2d"], -0.05)
+        self.assertEqual(set(joined["bucket"]), {"score Q2", "score Q4"})
+
+    def test_ex_dividend_gap_is_not_a_loss(self):
+        # 第 3 天除息 10 元：原始收盤從 110 掉到 100，但還原後價格不變。
+        index = pd.bdate_range("2026-01-05", periods=4)
+        closes = [100.0, 110.0, 100.0, 100.0]
+        adj = [90.91, 100.0, 100.0, 100.0]
+        df = pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Adj Close": adj, "Volume": [1000] * 4}, index=index)
+        signals = signal_frame(RECORDS, strategies=["momentum"])
+        joined = join_forward_returns(signals, {"2330.TW": df}, horizons=(1,))
+        second = joined[joined["date"] == "2026-01-06"].iloc[0]
+        self.assertAlmostEqual(second["ret_1d"], 0.0)
+        self.assertAlmostEqual(second["mae_1d"], 0.0)
+
+    def test_output_writes_null_for_missing_statistics(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            prices = os.path.join(tmp, "prices.pkl.gz")
+            # 缺 Low 的資料算不出回撤，mean_mae 為 NaN，輸出必須是合法 JSON 的 null。
+            panel = make_panel()
+            panel["2330.TW"]["Low"] = float("nan")
+            save_panel(panel, prices)
+            output = os.path.join(tmp, "out.json")
+            argv = ["backtest.py", "--prices", prices, "--horizons", "1", "--output", output]
+            with mock.patch("sys.argv", argv), mock.patch("backtest.load_records", return_value=RECORDS), redirect_stdout(io.StringIO()):
+                backtest_main()
+            with open(output, "r", encoding="utf-8") as file:
+                payload = json.loads(file.read(), parse_constant=lambda name: self.fail(f"{name} in output"))
+            self.assertIsNone(payload["byStrategy"][0]["mean_mae"])
+            self.assertIsNotNone(payload["byStrategy"][0]["mean_return"])
+
+    def test_summary_hit_rate_per_strategy(self):
+        result = run_backtest(RECORDS, make_panel(), horizons=(3,))
+        momentum = result["by_strategy"].set_index("strategy").loc["momentum"]
+        self.assertEqual(momentum["signals"], 2)
+        self.assertAlmostEqual(momentum["hit_rate"], 0.0)
+        self.assertAlmostEqual(momentum["mean_return"], (0.0 + (90 / 110 - 1)) / 2)
+        buckets = result["by_bucket"]
+        self.assertIn("breakout", set(buckets["bucket"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
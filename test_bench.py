@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+
+import bench
+from bench import Case, compare_results, format_table, load_baseline, measure, nuxt_payload, regressions, save_baseline, tile_items
+from main import revive_nuxt_payload
+
+
+class BenchTest(unittest.TestCase):
+    def test_regression_is_flagged_only_past_threshold(self):
+        results = {
+            "a": {"min": 0.130, "median": 0.140},
+            "b": {"min": 0.110, "median": 0.200},
+            "c": {"min": 0.050, "median": 0.060},
+            "d": {"min": 0.010, "median": 0.010},
+        }
+        baseline = {"a": {"min": 0.100}, "b": {"min": 0.100}, "c": {"min": 0.100}}
+        rows = {row["name"]: row for row in compare_results(results, baseline, threshold=0.25)}
+        self.assertEqual(rows["a"]["status"], "退步")
+        self.assertAlmostEqual(rows["a"]["change"], 0.30)
+        self.assertEqual(rows["b"]["status"], "持平")
+        self.assertEqual(rows["c"]["status"], "進步")
+        self.assertEqual(rows["d"]["status"], "新案例")
+        self.assertEqual([row["name"] for row in regressions(rows.values())], ["a"])
+        table = format_table(list(rows.values()))
+        self.assertIn("+30.0%", table)
+        self.assertEqual(regressions(compare_results(results, baseline, threshold=0.5)), [])
+
+    def test_baseline_round_trip_checks_scale(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            save_baseline(path, {"a": {"min": 0.1, "median": 0.2, "number": 5, "repeat": 3}}, "quick")
+            with open(path, "r", encoding="utf-8") as file:
+                self.assertEqual(json.load(file)["seed"], bench.BENCH_SEED)
+            self.assertEqual(load_baseline(path, "quick"), {"a": {"min": 0.1, "median": 0.2}})
+            self.assertIsNone(load_baseline(path, "full"))
+            self.assertIsNone(load_baseline(os.path.join(tmp, "missing.json"), "quick"))
+
+    def test_measure_calibrates_number_and_runs_before_each_sample(self):
+        calls = []
+        result = measure(Case("fast", lambda: calls.append(1)), repeat=3, min_seconds=0.001)
+        self.assertGreater(result["number"], 1)
+        self.assertEqual(result["repeat"], 3)
+        self.assertLessEqual(result["min"], result["median"])
+
+        events = []
+        result = measure(Case("cold", lambda: events.append("run"), before=lambda: events.append("before")), repeat=2)
+        self.assertEqual(result["number"], 1)
+        self.assertEqual(events, ["before", "run"] * 3)
+
+    def test_fixtures_are_valid_inputs(self):
+        rows = tile_items([{"code": "2330.TW"}, {"code": "6488.TWO"}], 5)
+        self.assertEqual([row["code"] for row in rows], ["2330.TW", "6488.TWO", "2330001.TW", "6488001.TWO", "2330002.TW"])
+        summary = {"flowRankings": [{"stockCode": "2330", "etfDetails": [{"etfCode": "00981A", "amount": 1}]}], "etfs": []}
+        self.assertEqual(revive_nuxt_payload(nuxt_payload({"active-summary-weekly-0": summary})), {"data": {"active-summary-weekly-0": summary}})
+
+    def test_tiny_scale_runs_every_case(self):
+        bench.SCALES["tiny"] = {"symbols": 60, "holy_grail": (20,), "strategy_items": 40, "branch_rows": 500, "nuxt_flows": 50, "history_days": 2, "history_items": 10}
+        self.addCleanup(bench.SCALES.pop, "tiny")
+        results = bench.run_bench("tiny", repeat=1, min_seconds=0.0001, progress=lambda text: None)
+        names = set(results)
+        self.assertTrue(any(name.startswith("strategy/macd_turn_red/universe/") for name in names))
+        for prefix in ("holy_grail/", "druckenmiller/40", "strategy_contexts/40", "aggregate_branch_rows/500", "revive_nuxt_payload/", "history/rebuild_cold/2d"):
+            self.assertTrue(any(name.startswith(prefix) for name in names), prefix)
+        self.assertTrue(all(result["min"] > 0 for result in results.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
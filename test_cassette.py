@@ -0,0 +1,170 @@
+import gzip
+import json
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from yfinance.exceptions import YFRateLimitError
+
+import cassette
+from cassette import Cassette, CassetteMiss, cassette_key, clock_now
+from http_client import HttpClient
+from yf_limiter import yf_attr, yf_history
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        status = 503 if self.server.hits == 1 else 200
+        body = json.dumps({"path": self.path, "hit": self.server.hits}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeTicker:
+    def __init__(self, ticker, live=True):
+        self.ticker = ticker
+        self.live = live
+
+    def history(self, **kwargs):
+        if not self.live:
+            raise AssertionError("replay should not touch the network")
+        return pd.DataFrame({"Close": [10.0, 11.0]}, index=pd.to_datetime(["2026-06-15", "2026-06-16"]))
+
+    @property
+    def info(self):
+        if not self.live:
+            raise AssertionError("replay should not touch the network")
+        return {"longName": "Taiwan Semiconductor"}
+
+
+class CassetteTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "run.cassette.gz")
+
+    def tearDown(self):
+        cassette.install(None)
+        self.tmp.cleanup()
+
+    def client(self):
+        return HttpClient(cache_dir=os.path.join(self.tmp.name, "http"), retries=1, sleep=lambda seconds: None)
+
+    def test_record_then_replay_http_and_yfinance_offline(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        server.hits = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/quotes"
+        recorder = cassette.install(Cassette(self.path, "record"))
+        client = self.client()
+        live = client.get(url, params={"code": "24421"}).json()
+        frame = yf_history(FakeTicker("2330.TW"), start=datetime(2026, 6, 1, 9, 30), end=datetime(2026, 6, 20))
+        info = yf_attr(FakeTicker("2330.TW"), "info")
+        recorder.save()
+        client.session.close()
+        server.shutdown()
+        server.server_close()
+        self.assertEqual(live["hit"], 2)
+
+        sleeps = []
+        player = cassette.install(Cassette(self.path, "replay", latency=0.05, sleep=sleeps.append))
+        client = self.client()
+        self.assertEqual(client.get(url, params={"code": "24421"}).json(), live)
+        self.assertEqual(client.stats["retries"], 1)
+        replayed = yf_history(FakeTicker("2330.TW", live=False), start=datetime(2026, 6, 1, 15, 0), end=datetime(2026, 6, 20))
+        pd.testing.assert_frame_equal(replayed, frame)
+        self.assertEqual(yf_attr(FakeTicker("2330.TW", live=False), "info"), info)
+        self.assertEqual(sleeps, [0.05] * 4)
+        self.assertEqual(player.stats, {"recorded": 0, "replayed": 4, "misses": 0})
+        client.session.close()
+
+        with self.assertRaises(CassetteMiss):
+            yf_history(FakeTicker("2317.TW", live=False), period="2y")
+
+    def test_recorded_errors_and_latency_are_replayed(self):
+        recorder = Cassette(self.path, "record")
+
+        def fail():
+            raise TimeoutError("Read timed out")
+
+        with self.assertRaises(TimeoutError):
+            recorder.play("key", fail)
+        recorder.entries["key"][0]["elapsed"] = 1.5
+        recorder.save()
+
+        sleeps = []
+        player = Cassette(self.path, "replay", latency="recorded", sleep=sleeps.append)
+        with self.assertRaises(TimeoutError):
+            player.play("key", fail)
+        self.assertEqual(sleeps, [1.5])
+
+    def test_frames_round_trip_with_timezones_and_gaps(self):
+        index = pd.DatetimeIndex(["2026-06-17", "2026-06-18"], name="Date").tz_localize("Asia/Taipei")
+        history = pd.DataFrame({"Close": [10.5, np.nan], "Volume": np.array([1000, 0], dtype="int64")}, index=index)
+        income = pd.DataFrame([[1.5e9, np.nan]], index=["Total Revenue"], columns=pd.DatetimeIndex(["2026-03-31", "2025-12-31"]))
+        recorder = Cassette(self.path, "record")
+        recorder.play("history", lambda: history)
+        recorder.play("income", lambda: income)
+        recorder.save()
+        player = Cassette(self.path, "replay")
+        pd.testing.assert_frame_equal(player.play("history", None), history)
+        pd.testing.assert_frame_equal(player.play("income", None), income)
+
+    def test_errors_are_restored_only_from_known_modules(self):
+        recorder = Cassette(self.path, "record")
+        for key, error in (("limit", YFRateLimitError()), ("other", unittest.SkipTest("x"))):
+            def fail(error=error):
+                raise error
+            with self.assertRaises(type(error)):
+                recorder.play(key, fail)
+        recorder.save()
+        player = Cassette(self.path, "replay")
+        with self.assertRaises(YFRateLimitError):
+            player.play("limit", None)
+        with self.assertRaisesRegex(RuntimeError, "SkipTest: x"):
+            player.play("other", None)
+
+    def test_replay_pins_the_clock_to_the_recorded_run(self):
+        from main import expected_market_date
+
+        recorded_at = datetime(2026, 6, 18, 15, 0, tzinfo=timezone(timedelta(hours=8))).timestamp()
+        recorder = cassette.install(Cassette(self.path, "record"))
+        recorder.recorded_at = recorded_at
+        # 錄製當下以「現在」推算的抓取區間，隔天重播時要算出同一個 key。
+        recorder.play(cassette_key("yf", "2330.TW", "history", datetime.fromtimestamp(recorded_at) + timedelta(days=1)), lambda: "bars")
+        recorder.save()
+        self.assertNotEqual(clock_now().timestamp(), recorded_at)
+
+        cassette.install(Cassette(self.path, "replay"))
+        self.assertEqual(clock_now().timestamp(), recorded_at)
+        self.assertEqual(expected_market_date(), "2026-06-18")
+        self.assertEqual(cassette.play(cassette_key("yf", "2330.TW", "history", clock_now() + timedelta(days=1)), None), "bars")
+
+    def test_pickle_cassettes_are_rejected_without_loading(self):
+        marker = os.path.join(self.tmp.name, "pwned")
+
+        class Boom:
+            def __reduce__(self):
+                return (os.makedirs, (marker,))
+
+        with open(self.path, "wb") as file:
+            file.write(gzip.compress(pickle.dumps({"version": 1, "entries": {"key": [Boom()]}})))
+        with self.assertRaises(ValueError):
+            Cassette(self.path, "replay")
+        self.assertFalse(os.path.exists(marker))
+
+
+if __name__ == "__main__":
+    unittest.main()
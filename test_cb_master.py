@@ -0,0 +1,80 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import main
+from main import load_cb_master
+
+
+def issue_row(cb_id, stock_id, price, listed="2"):
+    return {
+        "BondCode": cb_id, "IssuerCode": stock_id, "ShortName": f"{stock_id}轉{cb_id[-1]}",
+        "Conversion/ExchangePriceAtIssuance": str(price), "ListingStatus": listed, "OfferingMethod": "7",
+    }
+
+
+class CbMasterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cb_master.json")
+        main._cb_master = None
+
+    def tearDown(self):
+        main._cb_master = None
+        self.tmp.cleanup()
+
+    def load(self, rows, headers=None, today="2026-06-18", force=False):
+        with mock.patch("main.fetch_cb_issue_rows", return_value=(rows, headers or {})) as fetch, redirect_stdout(io.StringIO()) as out:
+            master = load_cb_master(force=force, path=self.path, today=today)
+        return master, fetch, out.getvalue()
+
+    def test_daily_ttl_serves_from_memory_and_disk(self):
+        master, fetch, _ = self.load([issue_row("24421", "2442", 50), issue_row("24422", "2442", 40), issue_row("13161", "1316", 45, listed="1")])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(sorted(master.by_id), ["24421", "24422"])
+        self.assertEqual([cb["cb_id"] for cb in master.by_stock["2442"]], ["24421", "24422"])
+
+        _, fetch, _ = self.load([])
+        self.assertEqual(fetch.call_count, 0)
+        main._cb_master = None
+        master, fetch, _ = self.load([])
+        self.assertEqual((fetch.call_count, len(master.cbs)), (0, 2))
+
+    def test_next_day_diffs_and_conditional_headers(self):
+        self.load([issue_row("24421", "2442", 50), issue_row("24422", "2442", 40)], {"ETag": '"v1"'})
+        master, fetch, out = self.load([issue_row("24421", "2442", 47.5), issue_row("13161", "1316", 45)], today="2026-06-19")
+        self.assertEqual(fetch.call_args.args[0].etag, '"v1"')
+        self.assertIn("新增 1 / 移除 1 / 轉換價調整 1", out)
+        self.assertIn("50.0 → 47.5", out)
+        self.assertEqual(sorted(master.by_stock), ["1316", "2442"])
+
+        master, fetch, out = self.load(None, {"ETag": '"v1"'}, today="2026-06-22")
+        self.assertIn("304", out)
+        self.assertEqual((master.fetched_date, len(master.cbs)), ("2026-06-22", 2))
+
+    def test_new_process_over_existing_file_reports_only_the_diff(self):
+        _, _, out = self.load([issue_row("24421", "2442", 50), issue_row("24422", "2442", 40)])
+        self.assertNotIn("異動", out)
+        # 模擬下一次排程：新的行程沒有記憶體中的表，只讀到上次留下的檔案。
+        main._cb_master = None
+        master, _, out = self.load([issue_row("24421", "2442", 50), issue_row("24423", "2442", 38)], today="2026-06-19")
+        self.assertIn("新增 1 / 移除 1 / 轉換價調整 0", out)
+        self.assertIn("新掛牌可轉債：24423", out)
+        self.assertIn("下櫃/到期可轉債：24422", out)
+        self.assertNotIn("24421", out)
+        self.assertEqual(sorted(master.by_id), ["24421", "24423"])
+
+    def test_failed_refresh_keeps_previous_table(self):
+        self.load([issue_row("24421", "2442", 50)])
+        with mock.patch("main.fetch_cb_issue_rows", side_effect=OSError("timeout")), redirect_stdout(io.StringIO()):
+            master = load_cb_master(path=self.path, today="2026-06-19")
+        self.assertEqual(list(master.by_id), ["24421"])
+        master, _, _ = self.load([], today="2026-06-19")
+        self.assertEqual(list(master.by_id), ["24421"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from cb_valuation import breakout_table, cb_frame, cbas_rows, close_frame, quote_frame, valuation_records, valuation_table
+from main import build_cbas_row, cbas_breakout_signal
+
+
+def price_frame(closes, volumes):
+    index = pd.bdate_range("2026-01-01", periods=len(closes))
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": np.asarray(volumes, dtype=float)}, index=index)
+
+
+class CbValuationTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        flat = 50 + rng.normal(0, 0.3, 40)
+        self.panel = {
+            "2442.TW": price_frame(np.append(flat, 58.0), np.append(np.full(40, 1000.0), 5000.0)),
+            "1316.TW": price_frame(np.append(flat, 50.2), np.append(np.full(40, 1000.0), 5000.0)),
+            "8442.TWO": price_frame(np.append(flat[:20], 58.0), np.append(np.full(20, 1000.0), 5000.0)),
+        }
+        self.cb_list = [
+            {"stock_id": "2442", "cb_id": "24421", "cb_name": "新美齊一", "conversion_price": 50.0, "maturity_date": "2028-01-01", "guaranteed": False},
+            {"stock_id": "2442", "cb_id": "24422", "cb_name": "新美齊二", "conversion_price": 40.0, "maturity_date": "2029-01-01", "guaranteed": True},
+            {"stock_id": "1316", "cb_id": "13161", "cb_name": "上曜一", "conversion_price": 45.0},
+            {"stock_id": "8442", "cb_id": "84421", "cb_name": "威宏一", "conversion_price": 60.0},
+        ]
+        self.quotes = {
+            "24421": {"trade_date": "2026-02-12", "cb_price": 118.0, "cb_units": 12.0},
+            "24422": {"trade_date": "2026-02-12", "cb_price": 150.0},
+            "13161": {"trade_date": "2026-02-12", "cb_price": 105.0},
+        }
+
+    def test_breakouts_match_per_symbol_signal(self):
+        breakouts = breakout_table(self.panel)
+        expected = {symbol for symbol, df in self.panel.items() if cbas_breakout_signal(df, symbol)}
+        self.assertEqual(set(breakouts["symbol"]), expected)
+        self.assertEqual(expected, {"2442.TW"})
+        signal = cbas_breakout_signal(self.panel["2442.TW"], "2442.TW")
+        row = breakouts.iloc[0]
+        self.assertEqual((row["price"], row["pct_change"], row["vol_ratio"]), (signal["price"], signal["pct_change"], signal["vol_ratio"]))
+
+    def test_valuation_table_ranks_universe_and_join_matches_row_builder(self):
+        table = valuation_table(cb_frame(self.cb_list), quote_frame(self.quotes), close_frame({"2442": 58.0, "1316": 50.2}))
+        records = valuation_records(table)
+        self.assertEqual([record["cb_id"] for record in records], ["13161", "24421", "24422", "84421"])
+        self.assertEqual([record["rank"] for record in records], [1, 2, 3, None])
+        self.assertAlmostEqual(records[1]["conversion_value"], 116.0)
+        self.assertIsNone(records[3]["double_low"])
+
+        breakouts = breakout_table(self.panel)
+        rows = cbas_rows(table, breakouts, {"2442.TW": "新美齊"})
+        signal = cbas_breakout_signal(self.panel["2442.TW"], "2442.TW")
+        cbs = {cb["cb_id"]: cb for cb in self.cb_list}
+        expected = sorted(
+            (build_cbas_row(signal, cbs[cb_id], self.quotes[cb_id]) for cb_id in ("24421", "24422")),
+            key=lambda row: row["double_low"],
+        )
+        for row, want in zip(rows, expected):
+            for key in ("code", "cb_code", "price", "conversion_value", "premium_pct", "double_low", "maturity_date", "guaranteed", "desc"):
+                self.assertEqual(row[key], want[key], key)
+        self.assertEqual(len(rows), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from main import expected_market_date, fetch_cb_latest_quotes
+
+
+TW = timezone(timedelta(hours=8))
+
+
+class CbQuoteCacheTest(unittest.TestCase):
+    def test_expected_market_date_rolls_back_before_close_and_on_weekends(self):
+        self.assertEqual(expected_market_date(datetime(2026, 6, 18, 15, 0, tzinfo=TW)), "2026-06-18")
+        self.assertEqual(expected_market_date(datetime(2026, 6, 18, 9, 0, tzinfo=TW)), "2026-06-17")
+        self.assertEqual(expected_market_date(datetime(2026, 6, 21, 15, 0, tzinfo=TW)), "2026-06-19")
+        self.assertEqual(expected_market_date(datetime(2026, 6, 22, 9, 0, tzinfo=TW)), "2026-06-19")
+
+    def test_quotes_fetched_once_per_cb_and_cached_for_the_day(self):
+        def history(cb_id, session=None):
+            trade_date = "2026-06-17" if cb_id == "24422" else "2026-06-18"
+            return [{"trade_date": "2026-06-16", "cb_price": 100.0}, {"trade_date": trade_date, "cb_price": 101.0}]
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.makedirs(os.path.join(cache_dir, "2026-06-17"))
+            with mock.patch("main.fetch_cb_quote_history", side_effect=history) as fetch:
+                quotes = fetch_cb_latest_quotes(["24421", "24421", "24422"], "2026-06-18", cache_dir=cache_dir)
+                self.assertEqual(fetch.call_count, 2)
+                self.assertEqual(quotes["24421"], {"trade_date": "2026-06-18", "cb_price": 101.0})
+                self.assertEqual(quotes["24422"]["trade_date"], "2026-06-17")
+
+                # 24421 已有 06-18 報價，代表行情已公布；24422 當天沒成交，同樣記入快取不再重抓。
+                fetch_cb_latest_quotes(["24421", "24422"], "2026-06-18", cache_dir=cache_dir)
+                self.assertEqual(fetch.call_count, 2)
+            self.assertEqual(os.listdir(cache_dir), ["2026-06-18"])
+
+    def test_quotes_before_publication_are_fetched_again(self):
+        def history(cb_id, session=None):
+            return [{"trade_date": "2026-06-17", "cb_price": 101.0}]
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch("main.fetch_cb_quote_history", side_effect=history) as fetch:
+                fetch_cb_latest_quotes(["24421", "24422"], "2026-06-18", cache_dir=cache_dir)
+                fetch_cb_latest_quotes(["24421", "24422"], "2026-06-18", cache_dir=cache_dir)
+                self.assertEqual(fetch.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+from fetch_engine import FetchEngine, FetchTimeout
+
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.total = 0
+        self.peak_total = 0
+
+    def work(self, host, seconds=0.02):
+        def run(item):
+            with self.lock:
+                self.active[host] = self.active.get(host, 0) + 1
+                self.total += 1
+                self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+                self.peak_total = max(self.peak_total, self.total)
+            time.sleep(seconds)
+            with self.lock:
+                self.active[host] -= 1
+                self.total -= 1
+            return item * 2
+        return run
+
+
+class FetchEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = FetchEngine(global_limit=5, host_limits={"a": 3, "b": 3})
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_per_host_and_global_limits(self):
+        tracker = Tracker()
+        results = {}
+
+        def drain(host):
+            for item, future in self.engine.map(host, tracker.work(host), range(20)):
+                results[(host, item)] = future.result()
+
+        threads = [threading.Thread(target=drain, args=(host,)) for host in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 40)
+        self.assertEqual(results[("b", 7)], 14)
+        self.assertLessEqual(max(tracker.peak.values()), 3)
+        self.assertLessEqual(tracker.peak_total, 5)
+        self.assertEqual(self.engine.stats["completed"], 40)
+
+    def test_errors_surface_through_future(self):
+        def fail(item):
+            raise ValueError(item)
+
+        (item, future), = list(self.engine.map("a", fail, ["x"]))
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertEqual(self.engine.stats["failed"], 1)
+
+    def test_deadline_times_out_slow_and_queued_requests(self):
+        tracker = Tracker()
+        outcomes = []
+        for item, future in self.engine.map("a", tracker.work("a", seconds=0.3), range(6), timeout=0.1):
+            try:
+                outcomes.append(future.result())
+            except FetchTimeout:
+                outcomes.append("timeout")
+        self.assertEqual(outcomes, ["timeout"] * 6)
+        self.assertEqual(self.engine.stats["timedOut"], 6)
+
+    def test_leaving_the_loop_cancels_pending_requests(self):
+        tracker = Tracker()
+        for item, future in self.engine.map("a", tracker.work("a", seconds=0.05), range(30)):
+            break
+        time.sleep(0.2)
+        self.assertGreater(self.engine.stats["cancelled"], 20)
+        self.assertEqual(tracker.total, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import unittest
+
+from history_store import (
+    compact_archive,
+    day_files,
+    fingerprint_path,
+    iter_records,
+    latest_date,
+    load_shard_manifest,
+    manifest_path,
+    publish_history,
+    publish_shards,
+    read_day,
+    shard_path,
+    stored_dates,
+)
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        self.data_file = os.path.join(self.tmp.name, "data.json")
+        os.makedirs(self.data_dir)
+        for date_text in ("2026-06-15", "2026-06-16", "2026-06-17", "2026-06-20"):
+            self.write_day(date_text, {"momentum": [{"code": "2330.TW", "score": 3}]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_day(self, date_text, strategies, raw=None):
+        with open(os.path.join(self.data_dir, f"{date_text}.json"), "w", encoding="utf-8") as file:
+            if raw is not None:
+                file.write(raw)
+            else:
+                json.dump({"date": date_text, "market_breadth": 5, "strategies": strategies}, file, ensure_ascii=False, indent=2)
+
+    def expected_history(self):
+        history = []
+        for name in sorted(os.listdir(self.data_dir)):
+            if name == "2026-06-20.json":
+                continue
+            with open(os.path.join(self.data_dir, name), "r", encoding="utf-8") as file:
+                history.append(json.load(file))
+        return history
+
+    def published(self):
+        with open(self.data_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def test_full_build_skips_weekends(self):
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertTrue(stats["full"])
+        self.assertEqual(stats["days"], 3)
+        self.assertEqual(self.published(), self.expected_history())
+        self.assertTrue(os.path.exists(manifest_path(self.data_file)))
+        self.assertEqual(latest_date(self.data_dir), "2026-06-17")
+
+    def test_new_day_only_appends(self):
+        publish_history(self.data_dir, self.data_file)
+        self.write_day("2026-06-18", {"momentum": [{"code": "2317.TW", "score": 5}]})
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertFalse(stats["full"])
+        self.assertEqual(stats["changed"], 1)
+        self.assertLess(stats["reencodedBytes"], os.path.getsize(self.data_file) / 2)
+        self.assertGreaterEqual(stats["writtenBytes"], os.path.getsize(self.data_file))
+        self.assertEqual(self.published(), self.expected_history())
+
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertEqual((stats["changed"], stats["reencodedBytes"], stats["writtenBytes"]), (0, 0, 0))
+
+    def test_fresh_checkout_leaves_committed_manifests_untouched(self):
+        shard_dir = os.path.join(self.tmp.name, "history")
+        publish_history(self.data_dir, self.data_file)
+        publish_shards(self.data_dir, shard_dir)
+        manifests = [manifest_path(self.data_file), os.path.join(shard_dir, "manifest.json")]
+        before = [self.read_bytes(path) for path in manifests]
+        self.assertNotIn(b"mtime", before[0])
+        self.assertTrue(os.path.exists(fingerprint_path(self.data_dir)))
+
+        # 重新 checkout：mtime 全變、cache/ 也不在，仍只靠內容雜湊判斷沒有變動。
+        os.remove(fingerprint_path(self.data_dir))
+        for name in os.listdir(self.data_dir):
+            os.utime(os.path.join(self.data_dir, name), ns=(1, 1))
+        self.assertEqual(publish_history(self.data_dir, self.data_file)["changed"], 0)
+        self.assertEqual(publish_shards(self.data_dir, shard_dir)["changed"], 0)
+        self.assertEqual([self.read_bytes(path) for path in manifests], before)
+
+    def read_bytes(self, path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_middle_change_and_delete_are_spliced(self):
+        publish_history(self.data_dir, self.data_file)
+        self.write_day("2026-06-16", {"momentum": [], "cbas": [{"code": "1234", "name": "測試"}]})
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertEqual(stats["changed"], 1)
+        self.assertEqual(self.published(), self.expected_history())
+
+        os.remove(os.path.join(self.data_dir, "2026-06-15.json"))
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertEqual(stats["changed"], 0)
+        self.assertEqual(self.published(), self.expected_history())
+
+    def test_non_finite_values_become_null_and_stale_manifest_rebuilds(self):
+        self.write_day("2026-06-17", None, raw='{"date": "2026-06-17", "market_breadth": NaN, "strategies": {}}')
+        publish_history(self.data_dir, self.data_file)
+        self.assertIsNone(self.published()[-1]["market_breadth"])
+
+        with open(self.data_file, "a", encoding="utf-8") as file:
+            file.write(" ")
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertTrue(stats["full"])
+        self.assertEqual(len(self.published()), 3)
+
+    def test_shards_hold_sections_and_manifest_counts(self):
+        shard_dir = os.path.join(self.tmp.name, "history")
+        self.write_day("2026-06-17", {
+            "momentum": [{"code": "2330.TW"}, {"code": "2317.TW"}],
+            "holy_grail": {"candidates": {"breakout": [{"code": "2330.TW"}], "exit": []}},
+            "key_branches": {"items": [{"code": "2330"}]},
+        })
+        stats = publish_shards(self.data_dir, shard_dir)
+        self.assertEqual((stats["days"], stats["changed"]), (3, 3))
+        days = load_shard_manifest(shard_dir)
+        self.assertEqual(days["2026-06-17"]["counts"], {"momentum": 2, "holy_grail": 1, "key_branches": 1})
+        self.assertEqual(days["2026-06-17"]["market_breadth"], 5)
+        with open(shard_path(shard_dir, "2026-06-17", "holy_grail"), "r", encoding="utf-8") as file:
+            self.assertEqual(json.load(file)["candidates"]["breakout"][0]["code"], "2330.TW")
+
+        self.write_day("2026-06-17", {"momentum": []})
+        os.remove(os.path.join(self.data_dir, "2026-06-15.json"))
+        stats = publish_shards(self.data_dir, shard_dir)
+        self.assertEqual((stats["changed"], stats["removed"]), (1, 1))
+        self.assertFalse(os.path.exists(shard_path(shard_dir, "2026-06-17", "holy_grail")))
+        self.assertFalse(os.path.isdir(os.path.join(shard_dir, "2026-06-15")))
+        self.assertEqual(load_shard_manifest(shard_dir)["2026-06-17"]["counts"], {"momentum": 0})
+
+    def test_compacted_months_read_transparently(self):
+        self.write_day("2026-05-29", {"momentum": [{"code": "2317.TW", "score": 1}]})
+        publish_history(self.data_dir, self.data_file)
+        before = self.published()
+
+        stats = compact_archive(self.data_dir, before_month="2026-06")
+        self.assertEqual((stats["months"], stats["days"]), (["2026-05"], 1))
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, "archive", "2026-05.jsonl.gz")))
+        self.assertNotIn("2026-05-29", day_files(self.data_dir))
+        self.assertEqual(stored_dates(self.data_dir, end="2026-06-15"), ["2026-05-29", "2026-06-15"])
+        self.assertEqual(read_day("2026-05-29", self.data_dir)["strategies"]["momentum"][0]["code"], "2317.TW")
+        self.assertEqual([record["date"] for record in iter_records(self.data_dir, end="2026-06-01")], ["2026-05-29"])
+
+        stats = publish_history(self.data_dir, self.data_file)
+        self.assertEqual(self.published(), before)
+
+        self.write_day("2026-05-29", {"momentum": []})
+        publish_history(self.data_dir, self.data_file)
+        self.assertEqual(self.published()[0]["strategies"], {"momentum": []})
+
+        compact_archive(self.data_dir, before_month="2026-06")
+        self.assertEqual(read_day("2026-05-29", self.data_dir)["strategies"], {"momentum": []})
+        self.assertEqual(stored_dates(self.data_dir)[0], "2026-05-29")
+
+
+if __name__ == "__main__":
+    unittest.main()
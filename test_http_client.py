@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_client import HttpClient, cache_key
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.hits.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/slow"):
+            time.sleep(0.2)
+        if self.path.startswith("/flaky") and server.failures > 0:
+            server.failures -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path, "version": server.version}).encode("utf-8")
+        if self.path.startswith("/limited"):
+            body = json.dumps({"status": 402, "msg": "Requests reach the upper limit."}).encode("utf-8")
+        etag = f'"v{server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHandler)
+        self.server.hits = []
+        self.server.failures = 0
+        self.server.version = 1
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.sleeps = []
+        self.client = HttpClient(cache_dir=os.path.join(self.tmp.name, "http"), retries=2, sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_retries_transient_errors_with_backoff(self):
+        self.server.failures = 2
+        response = self.client.get(f"{self.base}/flaky")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.stats["retries"], 2)
+        self.assertEqual(len(self.sleeps), 2)
+
+        self.server.failures = 5
+        self.assertEqual(self.client.get(f"{self.base}/flaky").status_code, 503)
+
+    def test_ttl_cache_and_conditional_revalidation(self):
+        url = f"{self.base}/quotes"
+        self.assertEqual(self.client.get(url, params={"code": "24421"}, ttl=3600).json()["version"], 1)
+        response = self.client.get(url, params={"code": "24421"}, ttl=3600)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(self.server.hits), 1)
+
+        response = self.client.get(url, params={"code": "24421"}, ttl=0)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.json()["version"], 1)
+        self.assertEqual(self.server.hits[-1][1], '"v1"')
+        self.assertEqual(self.client.stats["notModified"], 1)
+
+        self.server.version = 2
+        response = self.client.get(url, params={"code": "24421"}, ttl=0)
+        self.assertFalse(response.from_cache)
+        self.assertEqual(response.json()["version"], 2)
+        self.assertEqual(self.client.get(url, params={"code": "24422"}, ttl=0).json()["path"], "/quotes?code=24422")
+
+    def test_error_payloads_with_http_200_are_not_cached(self):
+        url = f"{self.base}/limited"
+        self.assertEqual(self.client.get(url, ttl=3600).json()["status"], 402)
+        response = self.client.get(url, ttl=3600)
+        self.assertFalse(response.from_cache)
+        self.assertEqual(len(self.server.hits), 2)
+        self.assertEqual(self.server.hits[-1][1], None)
+
+    def test_prune_removes_stale_entries(self):
+        self.client.get(f"{self.base}/old", ttl=3600)
+        self.client.get(f"{self.base}/new", ttl=3600)
+        stale = time.time() - 30 * 86400
+        old_meta = self.client.cache_paths(cache_key(f"{self.base}/old")[1])[0]
+        os.utime(old_meta, (stale, stale))
+        self.assertEqual(self.client.prune_cache(), 1)
+        self.assertEqual(len(os.listdir(self.client.cache_dir)), 2)
+        self.assertTrue(self.client.get(f"{self.base}/new", ttl=3600).from_cache)
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.client.get(f"{self.base}/slow"))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.json()["path"] for response in responses], ["/slow"] * 5)
+        self.assertEqual(len(self.server.hits), 1)
+        self.assertEqual(self.client.stats["coalesced"], 4)
+
+        self.client.get(f"{self.base}/slow")
+        self.assertEqual(len(self.server.hits), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
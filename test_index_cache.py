@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import index_cache
+
+
+def make_bars(start, count, base=100.0):
+    day = datetime.strptime(start, "%Y-%m-%d")
+    bars = []
+    while len(bars) < count:
+        if day.weekday() < 5:
+            close = base + len(bars)
+            bars.append({"date": day.strftime("%Y-%m-%d"), "open": close, "high": close, "low": close, "close": close, "volume": 1000})
+        day += timedelta(days=1)
+    return bars
+
+
+class IndexCacheTest(unittest.TestCase):
+    def setUp(self):
+        index_cache.clear_memory_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = []
+        self.source = make_bars("2026-01-01", 150)
+        self.original_fetch = index_cache.fetch_index_bars
+
+        def fake_fetch(symbol, start_dt, end_dt):
+            self.calls.append((symbol, start_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d")))
+            start = start_dt.strftime("%Y-%m-%d")
+            end = end_dt.strftime("%Y-%m-%d")
+            return [bar for bar in self.source if start <= bar["date"] < end]
+
+        index_cache.fetch_index_bars = fake_fetch
+
+    def tearDown(self):
+        index_cache.fetch_index_bars = self.original_fetch
+        index_cache.clear_memory_cache()
+        self.tmp.cleanup()
+
+    def get(self, start, end):
+        return index_cache.get_index_series(
+            "0050.TW",
+            datetime.strptime(start, "%Y-%m-%d"),
+            datetime.strptime(end, "%Y-%m-%d"),
+            cache_dir=self.tmp.name,
+        )
+
+    def test_lookups_match_direct_calculation(self):
+        series = self.get("2026-01-01", "2026-09-01")
+        target = self.source[130]["date"]
+        closes = [bar["close"] for bar in self.source[:131]]
+        snapshot = series.snapshot(target)
+        self.assertEqual(snapshot["close"], closes[-1])
+        self.assertAlmostEqual(snapshot["ma60"], sum(closes[-60:]) / 60)
+        self.assertAlmostEqual(snapshot["ma120"], sum(closes[-120:]) / 120)
+        self.assertAlmostEqual(series.return_20d_at(target), (closes[-1] - closes[-21]) / closes[-21])
+        self.assertIsNone(series.return_20d_at("2026-01-03", exact=True))
+        self.assertEqual(series.close_at("2026-01-03"), self.source[1]["close"])
+        self.assertEqual(series.bars_until(target, self.source[100]["date"]), self.source[100:131])
+
+    def test_memory_and_disk_cache_avoid_refetch(self):
+        self.get("2026-01-01", "2026-09-01")
+        self.get("2026-02-01", "2026-09-01")
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(os.path.exists(index_cache.cache_path("0050.TW", self.tmp.name)))
+
+        index_cache.clear_memory_cache()
+        series = self.get("2026-01-01", "2026-09-01")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(series), 150)
+
+    def test_incremental_refresh_only_fetches_missing_edges(self):
+        self.get("2026-03-01", "2026-04-01")
+        series = self.get("2026-01-01", "2026-09-01")
+        self.assertEqual(len(series), 150)
+        self.assertEqual(self.calls[1][1:], ("2026-01-01", "2026-03-03"))
+        self.assertEqual(self.calls[2][2], "2026-09-01")
+        self.assertGreater(self.calls[2][1], "2026-03-20")
+
+        # A start before the first listed bar is remembered and not refetched again.
+        self.get("2025-12-01", "2026-09-01")
+        self.get("2025-12-01", "2026-09-01")
+        self.assertEqual(len(self.calls), 5)
+
+    def test_stale_and_intraday_bars_are_refetched_after_the_close(self):
+        tw = index_cache.SESSION_CLOSE["tw"][0]
+
+        def at(text):
+            return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=tw).timestamp()
+
+        start = datetime(2026, 6, 1)
+        end = datetime(2026, 6, 20)
+        yesterday = index_cache.IndexSeries("^TWII", make_bars("2026-06-01", 13), fetched_at=at("2026-06-17 20:00"))
+        self.assertEqual(yesterday.dates[-1], "2026-06-17")
+        self.assertFalse(index_cache.needs_refresh(yesterday, start, end, 3600, now=at("2026-06-18 10:00")))
+        self.assertTrue(index_cache.needs_refresh(yesterday, start, end, 3600, now=at("2026-06-18 14:05")))
+
+        intraday = index_cache.IndexSeries("^TWII", make_bars("2026-06-01", 14), fetched_at=at("2026-06-18 10:00"))
+        self.assertEqual(intraday.dates[-1], "2026-06-18")
+        self.assertFalse(index_cache.needs_refresh(intraday, start, end, 3600, now=at("2026-06-18 10:30")))
+        self.assertTrue(index_cache.needs_refresh(intraday, start, end, 3600, now=at("2026-06-18 11:05")))
+        self.assertTrue(index_cache.needs_refresh(intraday, start, end, 3600, now=at("2026-06-18 15:00")))
+
+        settled = index_cache.IndexSeries("^TWII", make_bars("2026-06-01", 14), fetched_at=at("2026-06-18 14:30"))
+        self.assertFalse(index_cache.needs_refresh(settled, start, end, 3600, now=at("2026-06-18 20:00")))
+        # 休市日：收盤後抓過一次仍沒有新 K 棒，就不再重抓。
+        holiday = index_cache.IndexSeries("^TWII", make_bars("2026-06-01", 13), fetched_at=at("2026-06-18 14:30"))
+        self.assertFalse(index_cache.needs_refresh(holiday, start, end, 3600, now=at("2026-06-18 20:00")))
+
+        # 美股以紐約時間收盤：台北 6/19 上午時 6/18 的 K 棒才定案。
+        us = index_cache.IndexSeries("SPY", make_bars("2026-06-01", 13), fetched_at=at("2026-06-18 20:00"))
+        self.assertFalse(index_cache.needs_refresh(us, start, end, 3600, now=at("2026-06-18 23:00")))
+        self.assertTrue(index_cache.needs_refresh(us, start, end, 3600, now=at("2026-06-19 06:00")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import json_output
+from json_output import encode_json, write_json
+
+
+class JsonOutputTest(unittest.TestCase):
+    def test_compact_and_indented_encode_same_data(self):
+        data = {"date": "2026-06-18", "strategies": {"momentum": [{"code": "2330.TW", "name": "台積電", "score": 3.5}]}}
+        compact = encode_json(data, indent=False)
+        indented = encode_json(data, indent=True)
+        self.assertNotIn(b"\n", compact)
+        self.assertIn("台積電".encode("utf-8"), compact)
+        self.assertLess(len(compact), len(indented))
+        self.assertEqual(json.loads(compact), json.loads(indented))
+
+    def test_precompressed_siblings_follow_the_requested_modes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out", "data.json")
+            stats = write_json(path, [{"value": index} for index in range(200)], compress=("gz",), report=False)
+            with gzip.open(f"{path}.gz", "rb") as file:
+                self.assertEqual(file.read(), open(path, "rb").read())
+            self.assertEqual(set(stats["compressed"]), {"gz"})
+            self.assertLess(stats["compressed"]["gz"], stats["bytes"])
+
+            write_json(path, [], compress=(), report=False)
+            self.assertFalse(os.path.exists(f"{path}.gz"))
+
+    def test_failed_write_keeps_previous_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "2026-06-18.json")
+            write_json(path, {"date": "2026-06-18"}, report=False)
+            with mock.patch("json_output.os.replace", side_effect=OSError("killed")):
+                with self.assertRaises(OSError):
+                    write_json(path, {"date": "2026-06-19"}, report=False)
+            with open(path, "r", encoding="utf-8") as file:
+                self.assertEqual(json.load(file), {"date": "2026-06-18"})
+            self.assertEqual(os.listdir(tmp), ["2026-06-18.json"])
+
+    def test_non_finite_and_numpy_values_encode_without_copying(self):
+        data = {
+            "score": float("nan"),
+            "ratio": float("inf"),
+            "items": [np.float64("nan"), np.float64(1.25), np.int64(3), np.bool_(True)],
+            "pair": (1.5, float("-inf")),
+            "date": pd.Timestamp("2026-06-18"),
+            "at": pd.Timestamp("2026-06-18 13:30:00"),
+            "missing": pd.NaT,
+        }
+        expected = {
+            "score": None,
+            "ratio": None,
+            "items": [None, 1.25, 3, True],
+            "pair": [1.5, None],
+            "date": "2026-06-18",
+            "at": "2026-06-18T13:30:00",
+            "missing": None,
+        }
+        original = json_output.orjson
+        try:
+            for encoder in {original, None}:
+                json_output.orjson = encoder
+                for indent in (False, True):
+                    self.assertEqual(json.loads(encode_json(data, indent=indent)), expected)
+        finally:
+            json_output.orjson = original
+        self.assertTrue(np.isnan(data["score"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pandas as pd
+
+from price_panel import load_panel, save_panel, update_panel_store
+
+
+def bars(dates, closes, adj=None):
+    index = pd.DatetimeIndex(pd.to_datetime(dates))
+    frame = pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [1000] * len(closes)}, index=index)
+    frame["Adj Close"] = adj if adj is not None else closes
+    return frame
+
+
+class PanelStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "prices.pkl.gz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def update(self, fetch, end_dt, now=None):
+        with mock.patch("price_panel.load_price_panel", side_effect=fetch) as loader, redirect_stdout(io.StringIO()):
+            panel = update_panel_store(self.path, ["2330.TW"], datetime(2026, 1, 1), end_dt, now=now)
+        return panel, loader
+
+    def test_new_dividend_refetches_the_whole_history(self):
+        save_panel({"2330.TW": bars(["2026-06-15", "2026-06-16"], [100.0, 110.0])}, self.path)
+        full = bars(["2026-06-15", "2026-06-16", "2026-06-17"], [100.0, 110.0, 100.0], [90.91, 100.0, 100.0])
+
+        def fetch(symbols, start_dt, end_dt):
+            if start_dt == datetime(2026, 1, 1):
+                return {"2330.TW": full}
+            # 增量抓取的重疊區間裡 Adj Close 已被回頭調整。
+            return {"2330.TW": full.loc["2026-06-10":]}
+
+        panel, loader = self.update(fetch, datetime(2026, 6, 18, 15, 0))
+        self.assertEqual(loader.call_count, 2)
+        pd.testing.assert_series_equal(panel["2330.TW"]["Adj Close"], full["Adj Close"])
+        self.assertEqual(load_panel(self.path)["2330.TW"]["Adj Close"].iloc[0], 90.91)
+
+    def test_intraday_bar_is_not_persisted_and_is_refetched_after_the_close(self):
+        save_panel({"2330.TW": bars(["2026-06-16", "2026-06-17"], [100.0, 101.0])}, self.path)
+        tw = timezone(timedelta(hours=8))
+        session = {"close": 105.0}
+
+        def fetch(symbols, start_dt, end_dt):
+            return {"2330.TW": bars(["2026-06-17", "2026-06-18"], [101.0, session["close"]])}
+
+        panel, loader = self.update(fetch, datetime(2026, 6, 19), now=datetime(2026, 6, 18, 10, 0, tzinfo=tw).timestamp())
+        self.assertEqual(panel["2330.TW"]["Close"].iloc[-1], 105.0)
+        self.assertEqual(load_panel(self.path)["2330.TW"].index[-1], pd.Timestamp("2026-06-17"))
+
+        # 收盤後再跑一次：上次的盤中價沒有存檔，所以會重抓並存下定案的收盤價。
+        session["close"] = 108.0
+        panel, loader = self.update(fetch, datetime(2026, 6, 19), now=datetime(2026, 6, 18, 15, 0, tzinfo=tw).timestamp())
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(panel["2330.TW"]["Close"].iloc[-1], 108.0)
+        self.assertEqual(load_panel(self.path)["2330.TW"]["Close"].iloc[-1], 108.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
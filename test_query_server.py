@@ -0,0 +1,93 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from query_server import ArchiveIndex, make_server
+
+
+class QueryServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        os.makedirs(self.data_dir)
+        self.write_day("2026-06-15", {"momentum": [{"code": "2330.TW", "name": "台積電", "score": 3, "price": 1000}]})
+        self.write_day("2026-06-16", {
+            "momentum": [{"code": "2330.TW", "name": "台積電", "score": 4, "price": 1010, "note": "x" * 2000}],
+            "macd_turn_red": [{"code": "2330.TW", "histogram": 0.5, "macd_label": "第1天"}],
+        })
+        self.index = ArchiveIndex(self.data_dir, refresh_seconds=0)
+        self.server = make_server(self.index, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def write_day(self, date_text, strategies):
+        with open(os.path.join(self.data_dir, f"{date_text}.json"), "w", encoding="utf-8") as file:
+            json.dump({"date": date_text, "strategies": strategies}, file, ensure_ascii=False)
+
+    def get(self, path, headers=None):
+        request = urllib.request.Request(self.base + path, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers, error.read()
+
+    def test_endpoints(self):
+        status, _, body = self.get("/api/latest")
+        self.assertEqual((status, json.loads(body)["date"]), (200, "2026-06-16"))
+        status, _, body = self.get("/api/day/2026-06-15/momentum")
+        self.assertEqual(json.loads(body)["data"][0]["score"], 3)
+        status, _, body = self.get("/api/stock/2330.TW?strategy=momentum")
+        self.assertEqual([row[:3] for row in json.loads(body)["rows"]], [["2026-06-15", "momentum", 3], ["2026-06-16", "momentum", 4]])
+        status, _, body = self.get("/api/days")
+        self.assertEqual(json.loads(body)[1]["counts"], {"momentum": 1, "macd_turn_red": 1})
+        self.assertEqual(self.get("/api/day/2026-06-17")[0], 404)
+        self.assertEqual(self.get("/api/stock/9999")[0], 404)
+        self.assertEqual(self.get("/index.html")[0], 404)
+
+    def test_etag_gzip_and_refresh(self):
+        status, headers, body = self.get("/api/day/2026-06-16", {"Accept-Encoding": "gzip"})
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body))["date"], "2026-06-16")
+        gzip_tag = headers["ETag"]
+
+        status, headers, body = self.get("/api/day/2026-06-16")
+        self.assertIsNone(headers["Content-Encoding"])
+        self.assertNotEqual(headers["ETag"], gzip_tag)
+        plain_tag = headers["ETag"]
+
+        status, _, body = self.get("/api/day/2026-06-16", {"If-None-Match": plain_tag})
+        self.assertEqual((status, body), (304, b""))
+
+        self.write_day("2026-06-16", {"momentum": []})
+        status, headers, _ = self.get("/api/day/2026-06-16", {"If-None-Match": plain_tag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], plain_tag)
+
+    def test_payload_cache_is_bounded(self):
+        self.index.max_payloads = 3
+        for day in range(1, 10):
+            status, _, _ = self.get(f"/api/stock/2330.TW?start=2026-06-{day:02d}")
+            self.assertEqual(status, 200)
+        self.assertEqual(len(self.index.payloads), 3)
+        # 重新讀取的項目移到最新，下一個新查詢淘汰的是最久沒用的那筆。
+        self.get("/api/stock/2330.TW?start=2026-06-07")
+        self.get("/api/stock/2330.TW?start=2026-06-10")
+        cached = " ".join(repr(key) for key in self.index.payloads)
+        self.assertIn("2026-06-07", cached)
+        self.assertNotIn("2026-06-08", cached)
+
+
+if __name__ == "__main__":
+    unittest.main()
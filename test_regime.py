@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest import attach_regime
+from druckenmiller import market_regime
+from holy_grail import get_market_regime
+from regime import breadth_frame, build_regime_timeline, index_regime_frame, regime_on
+
+
+def make_index_bars(count=220, seed=7):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.015, count))
+    volumes = rng.integers(800, 1200, count)
+    dates = pd.bdate_range("2025-01-01", periods=count)
+    return [
+        {"date": date.strftime("%Y-%m-%d"), "open": close, "high": close, "low": close, "close": float(close), "volume": int(volume)}
+        for date, close, volume in zip(dates, closes, volumes)
+    ]
+
+
+def make_panel(count=260, seed=11):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2025-01-01", periods=count)
+    panel = {}
+    for number in range(6):
+        closes = 50 * np.cumprod(1 + rng.normal(0.001, 0.02, count))
+        df = pd.DataFrame({"Close": closes}, index=index)
+        # 一檔晚上市、一檔中途停牌，檢查每檔各自的交易日序列。
+        if number == 4:
+            df = df.iloc[40:]
+        if number == 5:
+            df = df.drop(index[230:235])
+        panel[f"{2300 + number}.TW"] = df
+    return panel
+
+
+class RegimeTimelineTest(unittest.TestCase):
+    def test_index_regime_matches_latest_day_classifier(self):
+        bars = make_index_bars()
+        frame = index_regime_frame(bars)
+        for position in (50, 119, 120, 150, 180, 219):
+            expected = get_market_regime(bars[: position + 1])["state"]
+            self.assertEqual(frame["state"].iloc[position], expected, bars[position]["date"])
+
+    def test_breadth_matches_per_run_calculation(self):
+        panel = make_panel()
+        frame = breadth_frame(panel)
+        for target in (pd.bdate_range("2025-01-01", periods=260)[[210, 240, 259]]):
+            total = 0
+            new_high = 0
+            for df in panel.values():
+                window = df[df.index <= target]
+                if len(window) < 205 or window.index[-1] != target:
+                    continue
+                total += 1
+                if window["Close"].iloc[-1] > window["Close"][-61:-1].max():
+                    new_high += 1
+            self.assertEqual(frame.loc[target, "total"], total)
+            self.assertEqual(frame.loc[target, "breadth"], round(new_high / total * 100, 2))
+
+    def test_timeline_is_compact_columns(self):
+        bars = make_index_bars(count=260)
+        timeline = build_regime_timeline(bars, make_panel(), start="2025-10-01", index_symbol="^TWII")
+        self.assertEqual(timeline["dates"][0], "2025-10-01")
+        lengths = {len(timeline[key]) for key in ("dates", "indexState", "breadth", "breadthState", "universe")}
+        self.assertEqual(len(lengths), 1)
+        day = regime_on(timeline, "2025-12-01")
+        self.assertEqual(day["breadthState"], market_regime(day["breadth"])["state"])
+
+        joined = attach_regime(pd.DataFrame({"date": ["2025-12-01", "2020-01-01"]}), timeline)
+        self.assertEqual(list(joined["regime"]), [day["indexState"], "Unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
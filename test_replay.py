@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from price_panel import slice_as_of, traded_on
+from replay import ReplayContext, merge_into_record, replay_range, replay_stock_lists
+
+
+def make_frame(closes, start="2025-01-01", volume=1_000_000):
+    index = pd.bdate_range(start, periods=len(closes))
+    return pd.DataFrame({
+        "Open": closes,
+        "High": [value * 1.01 for value in closes],
+        "Low": [value * 0.99 for value in closes],
+        "Close": closes,
+        "Volume": [volume] * len(closes),
+    }, index=index)
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        closes = [100 + (index % 5) * 0.1 for index in range(250)] + [110, 105, 80]
+        self.df = make_frame(closes)
+        self.breakout_date = self.df.index[250].strftime("%Y-%m-%d")
+        self.context = ReplayContext(
+            panel={"2330.TW": self.df},
+            universe=[{"code": "2330.TW", "region": "TW"}],
+        )
+
+    def test_slice_as_of_excludes_future_bars(self):
+        window = slice_as_of(self.df, self.breakout_date)
+        self.assertEqual(window.index[-1].strftime("%Y-%m-%d"), self.breakout_date)
+        self.assertTrue(traded_on(window, self.breakout_date))
+        self.assertFalse(traded_on(window, "2030-01-01"))
+        self.assertEqual(len(slice_as_of(self.df, self.breakout_date, lookback_days=30)), 23)
+
+    def test_momentum_replay_is_point_in_time(self):
+        results = replay_stock_lists(self.context, self.breakout_date, ("momentum",))
+        self.assertEqual([item["code"] for item in results["momentum"]], ["2330.TW"])
+        self.assertEqual(results["momentum"][0]["date"], self.breakout_date)
+        self.assertEqual(results["momentum"][0]["price"], 110)
+
+        next_day = self.df.index[251].strftime("%Y-%m-%d")
+        self.assertEqual(replay_stock_lists(self.context, next_day, ("momentum",))["momentum"], [])
+
+    def test_replay_range_merges_into_daily_file(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, f"{self.breakout_date}.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"date": self.breakout_date, "market_breadth": 5, "strategies": {"cbas": [{"code": "1234"}]}}, file)
+            dates = replay_range(("momentum",), data_dir=data_dir, context=self.context)
+            with open(path, "r", encoding="utf-8") as file:
+                record = json.load(file)
+        self.assertEqual(dates, [self.breakout_date])
+        self.assertEqual(record["strategies"]["cbas"], [{"code": "1234"}])
+        self.assertEqual(record["strategies"]["momentum"][0]["code"], "2330.TW")
+
+    def test_merge_into_record_creates_strategies(self):
+        record = merge_into_record({"date": "2026-01-02"}, {"macd_turn_red": []})
+        self.assertEqual(record["strategies"], {"macd_turn_red": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import main
+from main import FetchFailed, fetch_data_safe
+from scan_journal import ScanJournal, journal_path
+
+
+class ScanJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume_reads_completed_results_and_skips_partial_line(self):
+        with ScanJournal("2026-06-18", journal_dir=self.journal_dir) as journal:
+            journal.record("2330.TW", {"is_60d_high": np.bool_(True), "trade_date": "2026-06-18", "result": {"momentum": {"score": float("nan")}}})
+            journal.record("2317.TW", {"is_60d_high": False, "trade_date": "2026-06-18", "result": None})
+        with open(journal_path("2026-06-18", self.journal_dir), "ab") as file:
+            file.write(b'{"code":"2454.TW","result":{"is_6')
+
+        with ScanJournal("2026-06-18", resume=True, journal_dir=self.journal_dir) as journal:
+            self.assertEqual(set(journal.done), {"2330.TW", "2317.TW"})
+            self.assertIs(journal.done["2330.TW"]["is_60d_high"], True)
+            self.assertIsNone(journal.done["2330.TW"]["result"]["momentum"]["score"])
+            journal.record("2454.TW", {"is_60d_high": False, "result": None})
+            # 抓不到資料的股票記成 None，續跑時也算已完成。
+            journal.record("9999.TW", None)
+        with ScanJournal("2026-06-18", resume=True, journal_dir=self.journal_dir) as journal:
+            self.assertEqual(set(journal.done), {"2330.TW", "2317.TW", "2454.TW", "9999.TW"})
+            self.assertIsNone(journal.done["9999.TW"])
+
+    def test_fresh_run_and_other_dates_start_empty(self):
+        with ScanJournal("2026-06-17", journal_dir=self.journal_dir) as journal:
+            journal.record("2330.TW", {"is_60d_high": False, "result": None})
+        with ScanJournal("2026-06-17", journal_dir=self.journal_dir) as journal:
+            self.assertEqual(journal.done, {})
+            journal.record("2330.TW", {"is_60d_high": False, "result": None})
+        with ScanJournal("2026-06-18", resume=True, journal_dir=self.journal_dir) as journal:
+            self.assertEqual(journal.done, {})
+        self.assertEqual(os.listdir(self.journal_dir), ["2026-06-18.jsonl"])
+        journal.finish()
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+    def test_fetch_failures_are_not_mistaken_for_missing_data(self):
+        # 沒資料是最終結果，可以寫入 journal；限流或連線錯誤要讓續跑重抓。
+        with mock.patch.object(main.time, "sleep"), mock.patch.object(main, "yf_history", return_value=pd.DataFrame()):
+            self.assertEqual(fetch_data_safe("9999.TW"), (None, None))
+        with mock.patch.object(main.time, "sleep"), mock.patch.object(main, "yf_history", side_effect=Exception("429 Too Many Requests")) as history:
+            with self.assertRaises(FetchFailed):
+                fetch_data_safe("2330.TW")
+            self.assertEqual(history.call_count, 3)
+        with mock.patch.object(main, "yf_history", side_effect=ConnectionError("Could not resolve host")) as history:
+            with self.assertRaises(FetchFailed):
+                fetch_data_safe("2330.TW")
+            self.assertEqual(history.call_count, 1)
+        with mock.patch.object(main, "fetch_data_safe", side_effect=FetchFailed("2330.TW")):
+            with self.assertRaises(FetchFailed):
+                main.analyze_stock({"code": "2330.TW", "region": "TW"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+
+from signal_delta import diff_signals, load_delta, load_delta_manifest, publish_deltas, signal_map
+
+
+class SignalDeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        self.delta_dir = os.path.join(self.tmp.name, "history", "deltas")
+        os.makedirs(self.data_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_day(self, date_text, strategies):
+        with open(os.path.join(self.data_dir, f"{date_text}.json"), "w", encoding="utf-8") as file:
+            json.dump({"date": date_text, "strategies": strategies}, file, ensure_ascii=False)
+
+    def test_diff_uses_strategy_code_and_cb_code_keys(self):
+        previous = signal_map({"strategies": {
+            "momentum": [{"code": "2330.TW", "name": "台積電", "score": 3}, {"code": "2317.TW", "score": 2}],
+            "cbas": [{"code": "2442", "cb_code": "24421", "double_low": 120.0}],
+        }}, "2026-06-15")
+        current = signal_map({"strategies": {
+            "momentum": [{"code": "2330.TW", "name": "台積電", "score": 4}, {"code": "2454.TW", "score": 1}],
+            "cbas": [{"code": "2442", "cb_code": "24421", "double_low": 120.0}, {"code": "2442", "cb_code": "24422", "double_low": 118.5}],
+            "macd_turn_red": [{"code": "2603.TW", "histogram": 0.1, "macd_label": "第1天"}],
+        }}, "2026-06-16")
+        delta = diff_signals(previous, current)
+        self.assertEqual([entry["code"] for entry in delta["momentum"]["added"]], ["2454"])
+        self.assertEqual([entry["code"] for entry in delta["momentum"]["removed"]], ["2317"])
+        self.assertEqual(delta["momentum"]["changed"], [{"code": "2330", "name": "台積電", "score": 4, "bucket": None, "previousScore": 3, "previousBucket": None}])
+        self.assertEqual(delta["cbas"]["added"], [{"code": "2442", "name": None, "score": 118.5, "bucket": None, "cb_code": "24422"}])
+        self.assertEqual(delta["macd_turn_red"]["added"][0]["bucket"], "第1天")
+
+    def test_holy_grail_buckets_and_etf_sides_are_separate_signals(self):
+        previous = signal_map({"strategies": {
+            "holy_grail": {"candidates": {"breakout": [{"code": "2330.TW", "score": 3}], "pullback": [{"code": "2330.TW", "score": 2}]}},
+            "active_etf": [{"code": "2330", "net_amount": 100, "side": "buy"}, {"code": "2330", "net_amount": -50, "side": "sell"}],
+            "macd_turn_red": [{"code": "2603.TW", "histogram": 0.1, "macd_label": "第1天"}],
+        }}, "2026-06-15")
+        self.assertEqual(len(previous), 5)
+        current = signal_map({"strategies": {
+            "holy_grail": {"candidates": {"breakout": [{"code": "2330.TW", "score": 3}]}},
+            "active_etf": [{"code": "2330", "net_amount": 100, "side": "buy"}],
+            "macd_turn_red": [{"code": "2603.TW", "histogram": 0.2, "macd_label": "第2天"}],
+        }}, "2026-06-16")
+        delta = diff_signals(previous, current)
+        self.assertEqual([(entry["code"], entry["bucket"]) for entry in delta["holy_grail"]["removed"]], [("2330", "pullback")])
+        self.assertEqual([(entry["code"], entry["bucket"]) for entry in delta["active_etf"]["removed"]], [("2330", "sell")])
+        self.assertNotIn("added", {name for name, entries in delta["holy_grail"].items() if entries})
+        self.assertEqual(delta["macd_turn_red"]["changed"][0]["previousBucket"], "第1天")
+
+    def test_publish_recomputes_changed_day_and_its_successor(self):
+        self.write_day("2026-06-15", {"momentum": [{"code": "2330.TW", "score": 3}]})
+        self.write_day("2026-06-16", {"momentum": [{"code": "2330.TW", "score": 3}, {"code": "2317.TW", "score": 1}]})
+        self.write_day("2026-06-17", {"momentum": [{"code": "2317.TW", "score": 2}]})
+        self.assertEqual(publish_deltas(self.data_dir, self.delta_dir)["written"], 3)
+        self.assertEqual(load_delta("2026-06-15", self.delta_dir)["strategies"], {})
+        self.assertEqual(load_delta_manifest(self.delta_dir)["2026-06-17"]["counts"], {"momentum": [0, 1, 1]})
+        self.assertEqual(publish_deltas(self.data_dir, self.delta_dir)["written"], 0)
+
+        self.write_day("2026-06-16", {"momentum": []})
+        stats = publish_deltas(self.data_dir, self.delta_dir)
+        self.assertEqual(stats["written"], 2)
+        self.assertEqual(load_delta_manifest(self.delta_dir)["2026-06-17"]["counts"], {"momentum": [1, 0, 0]})
+
+        os.remove(os.path.join(self.data_dir, "2026-06-16.json"))
+        stats = publish_deltas(self.data_dir, self.delta_dir)
+        self.assertEqual((stats["written"], stats["removed"]), (1, 1))
+        delta = load_delta("2026-06-17", self.delta_dir)
+        self.assertEqual(delta["previous"], "2026-06-15")
+        self.assertEqual(delta["strategies"]["momentum"]["added"][0]["code"], "2317")
+        self.assertIsNone(load_delta("2026-06-16", self.delta_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
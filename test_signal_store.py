@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from json_output import write_json
+from signal_store import appearances, import_archive, open_signal_store, streaks
+
+
+def make_record(date_text, momentum=(), etf_buys=(), etf_sells=()):
+    return {
+        "date": date_text,
+        "strategies": {
+            "momentum": [{"code": f"{code}.TW", "name": code, "price": 100, "score": 5} for code in momentum],
+            "active_etf": [{"code": code, "side": "buy", "net_amount": 1000} for code in etf_buys]
+            + [{"code": code, "side": "sell", "net_amount": -1000} for code in etf_sells],
+            "macd_turn_red": [{"code": "2330.TW", "histogram": 0.5, "macd_label": "翻紅第一天", "date": date_text}],
+        },
+    }
+
+
+RECORDS = [
+    make_record("2026-06-15", momentum=["2330"], etf_buys=["2317", "2454"]),
+    make_record("2026-06-16", momentum=["2330", "2603"], etf_buys=["2317"], etf_sells=["2454"]),
+    make_record("2026-06-17", etf_buys=["2317", "2454"]),
+    make_record("2026-06-18", momentum=["2330"], etf_buys=["2317", "2454"]),
+]
+
+
+class SignalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        for record in RECORDS:
+            write_json(os.path.join(self.data_dir, f"{record['date']}.json"), record, report=False)
+        self.conn = open_signal_store(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_import_is_incremental(self):
+        self.assertEqual(import_archive(self.conn, self.data_dir)["imported"], 4)
+        self.assertEqual(import_archive(self.conn, self.data_dir)["imported"], 0)
+
+        write_json(os.path.join(self.data_dir, "2026-06-18.json"), make_record("2026-06-18"), report=False)
+        os.remove(os.path.join(self.data_dir, "2026-06-15.json"))
+        stats = import_archive(self.conn, self.data_dir)
+        self.assertEqual((stats["imported"], stats["removed"]), (1, 1))
+        total = self.conn.execute("SELECT COUNT(*) FROM signals WHERE strategy = 'momentum'").fetchone()[0]
+        self.assertEqual(total, 2)
+
+    def test_appearances_over_recent_trading_days(self):
+        import_archive(self.conn, self.data_dir)
+        result = appearances(self.conn, "2330.TW", ["momentum", "macd_turn_red"], days=3)
+        self.assertEqual(result["dates"], 3)
+        self.assertEqual(result["byStrategy"], {"momentum": 2, "macd_turn_red": 3})
+        self.assertEqual(result["rows"][0]["record_date"], "2026-06-16")
+
+    def test_streaks_find_consecutive_days(self):
+        import_archive(self.conn, self.data_dir)
+        rows = streaks(self.conn, "active_etf", bucket="buy", min_days=3)
+        self.assertEqual(rows, [{"code": "2317", "start": "2026-06-15", "end": "2026-06-18", "days": 4}])
+        rows = streaks(self.conn, "active_etf", bucket="buy", min_days=2)
+        self.assertIn({"code": "2454", "start": "2026-06-17", "end": "2026-06-18", "days": 2}, rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from single_flight import SingleFlight
+from yf_limiter import get_limiter, yf_history
+
+
+def run_together(count, func):
+    results = []
+    errors = []
+
+    def target():
+        try:
+            results.append(func())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class FakeTicker:
+    def __init__(self, ticker, calls):
+        self.ticker = ticker
+        self.calls = calls
+
+    def history(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(0.2)
+        return pd.DataFrame({"Close": [100.0, 101.0]})
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"price": 100}
+
+        results, _ = run_together(6, lambda: flights.do("2330.TW", fetch))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 5)
+        self.assertEqual(flights.stats, {"leaders": 1, "coalesced": 5})
+        self.assertEqual(flights.calls, {})
+
+        flights.do("2330.TW", fetch)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flights = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ConnectionError("reset")
+
+        _, errors = run_together(3, lambda: flights.do("url", fail))
+        self.assertEqual([type(error) for error in errors], [ConnectionError] * 3)
+        self.assertEqual(flights.do("url", lambda: "ok"), ("ok", False))
+
+    def test_yf_history_coalesces_and_copies_frames(self):
+        calls = []
+        before = get_limiter().snapshot()["coalesced"]
+        frames, _ = run_together(4, lambda: yf_history(FakeTicker("2330.TW", calls), period="2y"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(get_limiter().snapshot()["coalesced"] - before, 3)
+        frames[0]["Close"] = 0.0
+        self.assertEqual(frames[1]["Close"].tolist(), [100.0, 101.0])
+
+        yf_history(FakeTicker("2330.TW", calls), period="1y")
+        self.assertEqual(calls[-1], {"period": "1y"})
+
+
+if __name__ == "__main__":
+    unittest.main()
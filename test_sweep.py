@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from holy_grail import dataframe_to_bars, detect_breakout, moving_average_map
+from main import strategy_doji_rise, strategy_macd_turn_red, strategy_momentum
+from sweep import IndicatorCache, SIGNAL_BUILDERS, expand_grid, run_sweep
+
+
+def random_walk(seed, periods=320):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.cumprod(1 + rng.normal(0.001, 0.02, periods))
+    opens = closes * (1 + rng.normal(0, 0.004, periods))
+    index = pd.bdate_range("2024-01-01", periods=periods)
+    return pd.DataFrame({
+        "Open": opens,
+        "High": np.maximum(opens, closes) * 1.01,
+        "Low": np.minimum(opens, closes) * 0.99,
+        "Close": closes,
+        "Volume": rng.integers(400_000, 12_000_000, periods).astype(float),
+    }, index=index)
+
+
+def scalar_signal(strategy, window, params):
+    latest = window.iloc[-1]; prev = window.iloc[-2]
+    if strategy == "momentum":
+        return strategy_momentum(window, "1234.TW", "TW", latest, prev, {"rev_yoy": None, "growth": None, "pe": 999}, params) is not None
+    if strategy == "doji_rise":
+        return strategy_doji_rise(window, "1234.TW", "TW", latest, params) is not None
+    if strategy == "macd_turn_red":
+        result = strategy_macd_turn_red(window, params)
+        return result is not None and result["macd_day"] == 1
+    bars = dataframe_to_bars(window)
+    ma = moving_average_map(bars)
+    trend_ok = bool(ma["ma20"] and ma["ma60"] and ma["ma120"] and bars[-1]["close"] > ma["ma20"] > ma["ma60"] > ma["ma120"])
+    return bool(trend_ok and detect_breakout(bars, params["volume_factor"], params["max_change"]))
+
+
+class SweepTest(unittest.TestCase):
+    def test_vectorized_signals_match_scalar_strategies(self):
+        df = random_walk(7)
+        for strategy, builder in SIGNAL_BUILDERS.items():
+            params = expand_grid(strategy)[0]
+            signal, _ = builder(IndicatorCache(df), params)
+            for end in range(205, len(df) + 1, 3):
+                with self.subTest(strategy=strategy, end=end):
+                    self.assertEqual(bool(signal.iloc[end - 1]), scalar_signal(strategy, df.iloc[:end], params))
+
+    def test_indicator_cache_reuses_shared_windows(self):
+        cache = IndicatorCache(random_walk(1))
+        for params in expand_grid("macd_turn_red", {"fast": [21], "slow": [55], "signal": [9, 89]}):
+            SIGNAL_BUILDERS["macd_turn_red"](cache, params)
+        self.assertEqual(cache.hits, 1)
+        for params in expand_grid("momentum", {"vol_factor": [1.2, 1.5, 2.0]}):
+            SIGNAL_BUILDERS["momentum"](cache, params)
+        self.assertEqual(cache.hits, 1 + 2 * 2)
+
+    def test_run_sweep_outputs_row_per_grid_point(self):
+        panel = {f"{index:04d}.TW": random_walk(index) for index in range(4)}
+        grid = {"lookback_short": [40, 60], "vol_factor": [1.2, 2.0]}
+        table = run_sweep(panel, "momentum", grid, horizons=(5,), workers=1)
+        self.assertEqual(len(table), 4)
+        self.assertTrue({"signals", "hit_5d", "mean_5d", "confirmed"} <= set(table.columns))
+        by_lookback = table.groupby("lookback_short")["signals"].first()
+        self.assertGreaterEqual(by_lookback[40], by_lookback[60])
+        self.assertTrue((table["confirmed"] <= table["signals"]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from http_client import http_get
+from main import fetch_underlying_closes, get_tw_stock_list, parse_active_cbs
+from market_provider import install_provider
+from synthetic_market import TW_LIMIT, SyntheticMarket
+from yf_limiter import yf_attr, yf_history
+
+
+class FakeTicker:
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+
+class SyntheticMarketTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.market = SyntheticMarket(seed=11, symbols=400, bars=500, end_date="2026-06-18")
+
+    def tearDown(self):
+        install_provider(None)
+
+    def test_same_seed_gives_same_market(self):
+        other = SyntheticMarket(seed=11, symbols=400, bars=500, end_date="2026-06-18")
+        symbol = next(iter(self.market.symbols.values()))
+        self.assertEqual(other.symbols, self.market.symbols)
+        pd.testing.assert_frame_equal(other.history(symbol, period="max"), self.market.history(symbol, period="max"))
+        different = SyntheticMarket(seed=12, symbols=400, bars=500, end_date="2026-06-18")
+        self.assertNotEqual(different.symbols, self.market.symbols)
+
+    def test_bars_cover_limit_ups_illiquid_names_splits_and_listings(self):
+        frames = [self.market.full_history(symbol) for symbol in self.market.symbols.values()]
+        self.assertEqual(max(frame.index[-1] for frame in frames).strftime("%Y-%m-%d"), "2026-06-18")
+        changes = []
+        for frame in frames:
+            # 停牌後復牌那天跨了好幾個交易日，不受單日漲跌幅限制。
+            consecutive = np.diff(self.market.calendar.get_indexer(frame.index.tz_localize(None))) == 1
+            changes.append(frame["Close"].pct_change().to_numpy()[1:][consecutive])
+        changes = np.concatenate(changes)
+        self.assertLessEqual(changes.max(), TW_LIMIT + 0.001)
+        self.assertGreater((changes > 0.095).sum(), 100)
+        zero_volume = [frame for frame in frames if (frame["Volume"] == 0).mean() > 0.2]
+        self.assertGreater(len(zero_volume), 10)
+        self.assertTrue(any((frame["Stock Splits"] > 0).any() for frame in frames))
+        self.assertTrue(any(len(frame) < 300 for frame in frames))
+        for frame in frames[:50]:
+            self.assertTrue((frame["High"] >= frame[["Open", "Close"]].max(axis=1) - 0.011).all())
+            self.assertTrue((frame["Low"] <= frame[["Open", "Close"]].min(axis=1) + 0.011).all())
+
+    def test_history_slicing_matches_yfinance_arguments(self):
+        code, symbol = next(iter(self.market.symbols.items()))
+        wrong = f"{code}.TWO" if symbol.endswith(".TW") else f"{code}.TW"
+        self.assertTrue(self.market.history(wrong, period="2y").empty)
+        window = self.market.history(symbol, start=datetime(2026, 5, 1), end=datetime(2026, 6, 1), auto_adjust=False)
+        self.assertIn("Adj Close", window.columns)
+        self.assertGreaterEqual(window.index[0].strftime("%Y-%m-%d"), "2026-05-01")
+        self.assertLessEqual(window.index[-1].strftime("%Y-%m-%d"), "2026-05-29")
+        self.assertGreater(len(self.market.history("^TWII", period="1y")), 200)
+
+    def test_provider_replaces_every_fetch_path(self):
+        install_provider(self.market)
+        stocks = get_tw_stock_list()
+        self.assertEqual(len(stocks), 400)
+        frame = yf_history(FakeTicker(stocks[0]["code"]), period="2y")
+        self.assertEqual(len(frame), len(self.market.history(stocks[0]["code"], period="2y")))
+        self.assertIn("Total Revenue", yf_attr(FakeTicker(stocks[0]["code"]), "quarterly_income_stmt").index)
+
+        cbs = parse_active_cbs(http_get("https://www.tpex.org.tw/openapi/v1/bond_ISSBD5_data").json())
+        self.assertGreater(len(cbs), 20)
+        self.assertTrue(all(cb["stock_id"] in self.market.codes for cb in cbs))
+        closes = fetch_underlying_closes()
+        self.assertGreater(len(closes), 350)
+        quote = http_get("https://www.tpex.org.tw/www/zh-tw/bond/cbDayQry", params={"code": cbs[0]["cb_id"]}).json()
+        self.assertEqual(quote["tables"][0]["data"][-1][0], "115/06/18")
+        self.assertEqual(http_get("https://example.com/unknown").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+
+from json_output import write_json
+from ticker_index import publish_ticker_index, shard_file
+
+
+def make_record(date_text, momentum, score=5):
+    return {"date": date_text, "strategies": {"momentum": [{"code": f"{code}.TW", "score": score} for code in momentum]}}
+
+
+class TickerIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, "data")
+        self.index_dir = os.path.join(self.tmp.name, "history", "tickers")
+        self.write(make_record("2026-06-15", ["2330", "2317"]))
+        self.write(make_record("2026-06-16", ["2330"]))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, record):
+        write_json(os.path.join(self.data_dir, f"{record['date']}.json"), record, report=False)
+
+    def shard(self, prefix):
+        path = shard_file(self.index_dir, prefix)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def test_index_groups_entries_by_code_prefix(self):
+        stats = publish_ticker_index(self.data_dir, self.index_dir)
+        self.assertEqual(stats["changed"], 2)
+        self.assertEqual(self.shard("23"), {
+            "2317": [["2026-06-15", "momentum", 5, None]],
+            "2330": [["2026-06-15", "momentum", 5, None], ["2026-06-16", "momentum", 5, None]],
+        })
+
+    def test_incremental_update_only_touches_affected_shards(self):
+        publish_ticker_index(self.data_dir, self.index_dir)
+        self.write(make_record("2026-06-17", ["6669"], score=8))
+        stats = publish_ticker_index(self.data_dir, self.index_dir)
+        self.assertEqual((stats["changed"], stats["shards"]), (1, 1))
+        self.assertEqual(self.shard("66"), {"6669": [["2026-06-17", "momentum", 8, None]]})
+
+        self.write(make_record("2026-06-16", ["6669"], score=9))
+        os.remove(os.path.join(self.data_dir, "2026-06-15.json"))
+        publish_ticker_index(self.data_dir, self.index_dir)
+        self.assertIsNone(self.shard("23"))
+        self.assertEqual([row[0] for row in self.shard("66")["6669"]], ["2026-06-16", "2026-06-17"])
+        self.assertEqual(publish_ticker_index(self.data_dir, self.index_dir)["shards"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
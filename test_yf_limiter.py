@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+from yf_limiter import ERROR, THROTTLED, TIMEOUT, AimdLimiter, classify_error
+
+
+class YFRateLimitError(Exception):
+    pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AimdLimiterTest(unittest.TestCase):
+    def test_classify_error(self):
+        self.assertEqual(classify_error(YFRateLimitError("Too Many Requests. Rate limited.")), THROTTLED)
+        self.assertEqual(classify_error(TimeoutError()), TIMEOUT)
+        self.assertEqual(classify_error(RuntimeError("Read timed out")), TIMEOUT)
+        self.assertEqual(classify_error(KeyError("Close")), ERROR)
+
+    def test_additive_increase_and_multiplicative_decrease(self):
+        clock = FakeClock()
+        limiter = AimdLimiter(initial=4, min_window=2, max_window=6, cooldown=2.0, clock=clock)
+        for _ in range(40):
+            limiter.call(lambda: None)
+        self.assertEqual(limiter.snapshot()["window"], 6)
+
+        def throttled():
+            raise YFRateLimitError("Too Many Requests")
+
+        for _ in range(3):
+            with self.assertRaises(YFRateLimitError):
+                limiter.call(throttled)
+        stats = limiter.snapshot()
+        self.assertEqual((stats["window"], stats["throttled"]), (3, 3))
+
+        clock.now = 5.0
+        with self.assertRaises(YFRateLimitError):
+            limiter.call(throttled)
+        self.assertEqual(limiter.snapshot()["window"], 2)
+
+        with self.assertRaises(KeyError):
+            limiter.call(lambda: {}["Close"])
+        stats = limiter.snapshot()
+        self.assertEqual((stats["window"], stats["errors"], stats["minWindow"], stats["peakWindow"]), (2, 1, 2, 6))
+
+    def test_slow_responses_do_not_grow_window(self):
+        clock = FakeClock()
+        limiter = AimdLimiter(initial=3, latency_target=1.0, clock=clock)
+
+        def slow():
+            clock.now += 2.0
+
+        for _ in range(10):
+            limiter.call(slow)
+        self.assertEqual((limiter.snapshot()["window"], limiter.snapshot()["slow"]), (3, 10))
+
+    def test_window_caps_in_flight_calls(self):
+        limiter = AimdLimiter(initial=2, max_window=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+        threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(limiter.snapshot()["calls"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+
+from history_store import DATA_DIR, MANIFEST_VERSION, SHARD_DIR, scan_changes
+from json_output import write_json
+from signals import extract_signals
+
+
+TICKER_DIR = os.path.join(SHARD_DIR, "tickers")
+PREFIX_LENGTH = 2
+
+
+def code_prefix(code):
+    return str(code)[:PREFIX_LENGTH]
+
+
+def compact_score(value):
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def day_entries(record, date_text):
+    entries = {}
+    for signal in extract_signals({**record, "date": date_text}):
+        entries.setdefault(signal["code"], []).append([date_text, signal["strategy"], compact_score(signal["score"]), signal["bucket"]])
+    return entries
+
+
+def shard_file(index_dir, prefix):
+    return os.path.join(index_dir, f"{prefix}.json")
+
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def load_index_manifest(index_dir=TICKER_DIR):
+    manifest = read_json(os.path.join(index_dir, "manifest.json"), {})
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("prefixLength") != PREFIX_LENGTH:
+        return {}
+    return manifest.get("days") or {}
+
+
+def publish_ticker_index(data_dir=DATA_DIR, index_dir=TICKER_DIR):
+    old_days = load_index_manifest(index_dir)
+    if not old_days and os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    days = {}
+    additions = {}
+    changed = set()
+    for date_text, info, record in scan_changes(data_dir, old_days):
+        if record is None:
+            days[date_text] = info
+            continue
+        entries = day_entries(record, date_text)
+        for code, rows in entries.items():
+            additions.setdefault(code_prefix(code), {}).setdefault(code, []).extend(rows)
+        days[date_text] = {**info, "prefixes": sorted({code_prefix(code) for code in entries})}
+        changed.add(date_text)
+
+    stale = changed | (set(old_days) - set(days))
+    affected = set(additions)
+    for date_text in stale:
+        affected.update(old_days.get(date_text, {}).get("prefixes", []))
+
+    # 只重寫受影響的代號前綴分片：先移除變動日期的舊項目，再併入新項目。
+    for prefix in affected:
+        path = shard_file(index_dir, prefix)
+        shard = read_json(path, {})
+        for code in list(shard):
+            shard[code] = [row for row in shard[code] if row[0] not in stale]
+        for code, rows in additions.get(prefix, {}).items():
+            shard.setdefault(code, []).extend(rows)
+        shard = {code: sorted(rows, key=lambda row: (row[0], row[1])) for code, rows in sorted(shard.items()) if rows}
+        if shard:
+            write_json(path, shard, report=False)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    write_json(os.path.join(index_dir, "manifest.json"), {"version": MANIFEST_VERSION, "prefixLength": PREFIX_LENGTH, "days": days}, report=False)
+    return {"days": len(days), "changed": len(stale), "shards": len(affected)}
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+
+from cassette import cassette_key, play
+from market_provider import get_provider
+from single_flight import SingleFlight
+
+
+THROTTLED = "throttled"
+TIMEOUT = "timeout"
+ERROR = "error"
+OK = "ok"
+
+
+def classify_error(exc):
+    name = type(exc).__name__
+    text = str(exc)
+    if name == "YFRateLimitError" or "429" in text or "Too Many Requests" in text:
+        return THROTTLED
+    if isinstance(exc, TimeoutError) or "Timeout" in name or "timed out" in text.lower():
+        return TIMEOUT
+    return ERROR
+
+
+def backoff_seconds(attempt, base=1.0, cap=30.0):
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AimdLimiter:
+    def __init__(self, initial=8, min_window=2, max_window=32, latency_target=3.0, decrease=0.5, cooldown=2.0, clock=time.monotonic):
+        self.window = float(initial)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.clock = clock
+        self.in_flight = 0
+        self.last_decrease = None
+        self.condition = threading.Condition()
+        self.stats = {
+            "calls": 0, "throttled": 0, "timeouts": 0, "errors": 0, "slow": 0, "failed": 0,
+            "coalesced": 0, "peakWindow": int(initial), "minWindow": int(initial), "waitSeconds": 0.0,
+        }
+
+    def acquire(self):
+        start = self.clock()
+        with self.condition:
+            while self.in_flight >= int(self.window):
+                self.condition.wait()
+            self.in_flight += 1
+            self.stats["waitSeconds"] += self.clock() - start
+
+    def back_off(self):
+        now = self.clock()
+        # 同一波被擋下的請求只減半一次，避免窗口瞬間掉到底。
+        if self.last_decrease is None or now - self.last_decrease >= self.cooldown:
+            self.window = max(self.min_window, self.window * self.decrease)
+            self.last_decrease = now
+
+    def release(self, outcome, latency=0.0):
+        with self.condition:
+            self.in_flight -= 1
+            self.stats["calls"] += 1
+            if outcome == OK and latency <= self.latency_target:
+                # 每個健康回應加 1/window，大約每跑完一整個窗口才加 1。
+                self.window = min(self.max_window, self.window + 1 / self.window)
+            elif outcome == OK:
+                self.stats["slow"] += 1
+            elif outcome == THROTTLED:
+                self.stats["throttled"] += 1
+                self.back_off()
+            elif outcome == TIMEOUT:
+                self.stats["timeouts"] += 1
+                self.back_off()
+            else:
+                self.stats["errors"] += 1
+            self.stats["peakWindow"] = max(self.stats["peakWindow"], int(self.window))
+            self.stats["minWindow"] = min(self.stats["minWindow"], int(self.window))
+            self.condition.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        self.acquire()
+        start = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            self.release(classify_error(exc), self.clock() - start)
+            raise
+        self.release(OK, self.clock() - start)
+        return result
+
+    def count(self, key):
+        with self.condition:
+            self.stats[key] += 1
+
+    def count_failure(self):
+        self.count("failed")
+
+    def snapshot(self):
+        with self.condition:
+            return {**self.stats, "window": int(self.window), "inFlight": self.in_flight, "waitSeconds": round(self.stats["waitSeconds"], 1)}
+
+
+_limiter = AimdLimiter()
+_flights = SingleFlight()
+
+
+def get_limiter():
+    return _limiter
+
+
+def yf_attr(ticker, name):
+    # info、quarterly_income_stmt 等屬性取值時才會連線，同樣經過限流器與 cassette。
+    if (provider := get_provider()) is not None:
+        return provider.attr(ticker.ticker, name)
+    return _limiter.call(play, cassette_key("yf", ticker.ticker, name), lambda: getattr(ticker, name))
+
+
+def yf_history(ticker, **kwargs):
+    # 所有 yfinance 下載都走同一個限流器，主掃描、聖杯雷達、CBAS 同時跑時共用一個窗口。
+    # 同一檔同一區間同時被要求時只下載一次；等待者拿到複本，各自加欄位不會互相影響。
+    if (provider := get_provider()) is not None:
+        return provider.history(ticker.ticker, **kwargs)
+    key = (ticker.ticker, tuple(sorted(kwargs.items())))
+    record_key = cassette_key("yf", ticker.ticker, "history", *(part for item in key[1] for part in item))
+    df, shared = _flights.do(key, lambda: _limiter.call(play, record_key, lambda: ticker.history(**kwargs)), share=lambda df: df.copy())
+    if shared:
+        _limiter.count("coalesced")
+    return df
+
+
+def format_limiter_stats(stats=None):
+    stats = stats or _limiter.snapshot()
+    return (
+        f"yfinance 請求 {stats['calls']} 次，並行窗口 {stats['window']} (區間 {stats['minWindow']}~{stats['peakWindow']})，"
+        f"限流 {stats['throttled']}、逾時 {stats['timeouts']}、錯誤 {stats['errors']}，合併 {stats['coalesced']} 次，放棄 {stats['failed']} 檔"
+    )